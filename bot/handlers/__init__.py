@@ -11,18 +11,20 @@ from loguru import logger
 from bot.handlers.start import start_handler
 from bot.handlers.parse import parse_handler, parse_url_handler
 from bot.handlers.history import (
-    history_handler, export_csv_handler, show_recent_results, 
-    show_result_details
+    history_handler, export_handler, export_all_csv_handler, show_recent_results,
+    show_result_details, show_all_results, clear_history_handler,
+    confirm_clear_history_handler, cancel_action_handler
 )
 from bot.handlers.settings import (
     settings_handler, update_settings_handler,
     handle_rate_limit_input, handle_depth_input, handle_confidence_input
 )
 from bot.handlers.help import help_handler
+from bot.handlers.find import find_handler, inline_find_handler
 from bot.handlers.validate import (
     validate_handler, manual_validation_handler,
     validate_correct_callback, validate_incorrect_callback,
-    manual_check_handler
+    skip_validation_callback, manual_check_handler
 )
 from bot.states import ParseStates, SettingsStates, ValidationStates
 
@@ -37,6 +39,7 @@ def register_handlers(dp: Dispatcher):
     dp.message.register(settings_handler, Command("settings"))
     dp.message.register(help_handler, Command("help"))
     dp.message.register(validate_handler, Command("validate"))
+    dp.message.register(find_handler, Command("find"))
     
     # Обработчики состояний
     dp.message.register(parse_url_handler, ParseStates.waiting_for_url)
@@ -46,12 +49,23 @@ def register_handlers(dp: Dispatcher):
     dp.message.register(manual_validation_handler, ValidationStates.waiting_for_manual_input)
     
     # Callback обработчики
-    dp.callback_query.register(export_csv_handler, lambda c: c.data.startswith("export_csv"))
+    dp.callback_query.register(
+        export_handler, lambda c: c.data.startswith(("export_csv", "export_jsonl", "export_parquet"))
+    )
+    dp.callback_query.register(export_all_csv_handler, lambda c: c.data == "export_all_csv")
     dp.callback_query.register(update_settings_handler, lambda c: c.data.startswith("settings_"))
     dp.callback_query.register(show_recent_results, lambda c: c.data == "show_recent")
     dp.callback_query.register(show_result_details, lambda c: c.data.startswith("show_result_"))
+    dp.callback_query.register(show_all_results, lambda c: c.data.startswith(("show_all_", "results_")))
+    dp.callback_query.register(clear_history_handler, lambda c: c.data == "clear_history")
+    dp.callback_query.register(confirm_clear_history_handler, lambda c: c.data == "confirm_clear_history")
+    dp.callback_query.register(cancel_action_handler, lambda c: c.data == "cancel_action")
     dp.callback_query.register(validate_correct_callback, lambda c: c.data.startswith("validate_correct_"))
     dp.callback_query.register(validate_incorrect_callback, lambda c: c.data.startswith("validate_incorrect_"))
+    dp.callback_query.register(skip_validation_callback, lambda c: c.data.startswith("skip_validation_"))
     dp.callback_query.register(manual_check_handler, lambda c: c.data.startswith("manual_check_"))
     
+    # Inline режим (@bot Иванов), если он включен у бота в BotFather
+    dp.inline_query.register(inline_find_handler)
+    
     logger.info("All handlers registered")
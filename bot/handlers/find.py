@@ -0,0 +1,83 @@
+"""
+Обработчики поиска по собранным записям
+"""
+
+import html
+from typing import Any, Dict
+from aiogram.types import (
+    Message, InlineQuery, InlineQueryResultArticle, InputTextMessageContent
+)
+from aiogram.fsm.context import FSMContext
+from loguru import logger
+
+from database.operations import find_staff
+
+# Результатов в ответе на /find и в inline режиме
+FIND_LIMIT = 10
+INLINE_LIMIT = 20
+
+
+def format_person(record: Dict[str, Any]) -> str:
+    """Карточка человека для сообщения (поля со страниц экранируются для HTML)"""
+    text = f"<b>{html.escape(record.get('fio') or 'Неизвестно')}</b>\n"
+    if record.get('position'):
+        text += f"Должность: {html.escape(record['position'])}\n"
+    if record.get('email'):
+        text += f"Email: {html.escape(record['email'])}\n"
+    text += f"Источник: {html.escape(record.get('source_url') or record.get('domain') or '')}\n"
+    return text
+
+
+async def find_handler(message: Message, state: FSMContext):
+    """Обработчик команды /find <ФИО или email>"""
+    parts = message.text.split(maxsplit=1)
+    query = parts[1].strip() if len(parts) > 1 else ""
+    
+    if len(query) < 3:
+        await message.answer(
+            "🔎 <b>Поиск по собранным записям</b>\n\n"
+            "Использование: <code>/find Иванов</code>, <code>/find ivanov@university.ru</code>\n"
+            "Можно искать по части ФИО, латинскому написанию, адресу или должности.",
+            parse_mode="HTML"
+        )
+        return
+    
+    records = await find_staff(query, FIND_LIMIT)
+    logger.debug(f"Поиск {query!r}: {len(records)} результатов")
+    # Запрос пользователя выводится в HTML сообщении
+    query = html.escape(query)
+    
+    if not records:
+        await message.answer(
+            f"🔎 По запросу <b>{query}</b> ничего не найдено.\n\n"
+            "Поиск идет по результатам уже выполненных парсингов.",
+            parse_mode="HTML"
+        )
+        return
+    
+    text = f"🔎 <b>Найдено по запросу «{query}»:</b> {len(records)}\n\n"
+    text += "\n".join(format_person(record) for record in records)
+    await message.answer(text, parse_mode="HTML", disable_web_page_preview=True)
+
+
+async def inline_find_handler(inline_query: InlineQuery):
+    """Inline режим: @bot Иванов"""
+    query = inline_query.query.strip()
+    records = await find_staff(query, INLINE_LIMIT) if len(query) >= 3 else []
+    
+    results = [
+        InlineQueryResultArticle(
+            id=str(record['id']),
+            title=record.get('fio') or record.get('email') or 'Неизвестно',
+            description=" · ".join(
+                value for value in (record.get('position'), record.get('email'), record.get('domain')) if value
+            ),
+            input_message_content=InputTextMessageContent(
+                message_text=format_person(record),
+                parse_mode="HTML",
+                disable_web_page_preview=True
+            )
+        )
+        for record in records
+    ]
+    await inline_query.answer(results, cache_time=60, is_personal=False)
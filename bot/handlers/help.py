@@ -16,6 +16,7 @@ async def help_handler(message: Message, state: FSMContext):
 • /start - главное меню
 • /parse [URL] - парсинг указанного URL
 • /history - история парсинга
+• /find [ФИО или email] - поиск по всем собранным записям
 • /settings - настройки парсера
 • /help - эта справка
 
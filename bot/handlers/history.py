@@ -2,76 +2,125 @@
 Обработчики истории и экспорта
 """
 
-import csv
-import io
+import html
+import os
 from datetime import datetime
-from typing import List, Dict, Any
-from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup
+from typing import List, Dict, Any, Optional
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, FSInputFile
 from aiogram.fsm.context import FSMContext
 from loguru import logger
 
-from bot.keyboards import get_history_keyboard, get_pagination_keyboard
-# from database.operations import get_parsing_results, get_staff_records, log_export  # Удалено
+from bot.keyboards import get_confirmation_keyboard, get_history_keyboard, get_pagination_keyboard
+from database.operations import (
+    get_parsing_results, get_parsing_result, get_staff_records, count_staff_records, log_export
+)
+from database.store import get_result_store
+from utils.export import ExportError, PYARROW_AVAILABLE, export_records
+
+# Записей на странице при просмотре результата
+RECORDS_PER_PAGE = 10
 
 
 async def history_handler(message: Message, state: FSMContext):
     """Обработчик команды /history"""
     user = message.from_user
     
-    # Простое сообщение без БД
+    try:
+        parsings = await get_parsing_results(user.id, limit=5)
+    except Exception as e:
+        logger.error(f"Ошибка чтения истории пользователя {user.id}: {e}")
+        parsings = []
+    
+    text = "📋 <b>История парсинга</b>\n\n"
+    if parsings:
+        for parsing in parsings:
+            text += f"<b>#{parsing['id']}</b> {html.escape(parsing['domain'])} — {parsing['records_count']} записей ({parsing['created_at']})\n"
+        text += "\nОткройте результат, чтобы посмотреть записи или выгрузить их."
+    else:
+        text += "История пуста.\n\nИспользуйте команду /parse для парсинга новых URL."
+    
     await message.answer(
-        "📋 <b>История парсинга</b>\n\n"
-        "Функция истории временно недоступна.\n"
-        "Результаты парсинга показываются сразу после обработки.\n\n"
-        "Используйте команду /parse для парсинга новых URL.",
-        reply_markup=get_history_keyboard(),
+        text,
+        reply_markup=get_recent_results_keyboard(parsings) if parsings else get_history_keyboard(),
         parse_mode="HTML"
     )
 
 
-async def export_csv_handler(callback_query: CallbackQuery, state: FSMContext):
-    """Обработчик экспорта в CSV"""
-    await callback_query.answer("Функция экспорта временно недоступна", show_alert=True)
-
-
-def create_csv_file(records: List[Dict[str, Any]]) -> io.BytesIO:
-    """Создание CSV файла"""
-    csv_buffer = io.StringIO()
+async def export_handler(callback_query: CallbackQuery, state: FSMContext):
+    """Обработчик экспорта (export_<формат>_<id> — задание, export_<формат> — последнее задание)"""
+    user = callback_query.from_user
+    parts = callback_query.data.split('_')
+    export_format = parts[1]
     
-    # Заголовки CSV
-    fieldnames = [
-        'fio', 'position', 'email', 'phone', 'department',
-        'source_url', 'confidence', 'is_validated', 'is_correct'
-    ]
+    if len(parts) > 2 and parts[2].isdigit():
+        parsing = await get_parsing_result(int(parts[2]), user.id)
+    else:
+        latest = await get_parsing_results(user.id, limit=1)
+        parsing = latest[0] if latest else None
     
-    writer = csv.DictWriter(csv_buffer, fieldnames=fieldnames)
-    writer.writeheader()
+    if not parsing:
+        await callback_query.answer("Результат не найден", show_alert=True)
+        return
     
-    # Записываем данные
-    for record in records:
-        writer.writerow({
-            'fio': record.get('fio', ''),
-            'position': record.get('position', ''),
-            'email': record.get('email', ''),
-            'phone': record.get('phone', ''),
-            'department': record.get('department', ''),
-            'source_url': record.get('source_url', ''),
-            'confidence': record.get('confidence', 0.0),
-            'is_validated': record.get('is_validated', False),
-            'is_correct': record.get('is_correct', '')
-        })
+    await send_export(
+        callback_query, export_format, parsing['id'],
+        filename=f"staff_{parsing['id']}", caption=f"📁 {parsing['domain']}"
+    )
+
+
+async def export_all_csv_handler(callback_query: CallbackQuery, state: FSMContext):
+    """Экспорт записей всех заданий пользователя"""
+    await send_export(callback_query, 'csv', None, filename="staff_all", caption="📁 Все результаты")
+
+
+async def send_export(
+    callback_query: CallbackQuery,
+    export_format: str,
+    parsing_id: Optional[int],
+    filename: str,
+    caption: str
+):
+    """Потоковая выгрузка записей из хранилища во временный файл и отправка файла с диска"""
+    user = callback_query.from_user
+    await callback_query.answer("Готовлю файл...")
     
-    # Конвертируем в BytesIO для отправки
-    csv_bytes = io.BytesIO()
-    csv_bytes.write(csv_buffer.getvalue().encode('utf-8-sig'))  # UTF-8 с BOM для Excel
-    csv_bytes.seek(0)
+    try:
+        records = get_result_store().iter_records(user.id, parsing_id)
+        path, count = await export_records(records, export_format)
+    except ExportError as e:
+        await callback_query.message.answer(f"❌ {e}")
+        return
+    except Exception as e:
+        logger.error(f"Ошибка выгрузки для пользователя {user.id}: {e}")
+        await callback_query.message.answer("❌ Не удалось подготовить файл выгрузки")
+        return
     
-    return csv_bytes
+    try:
+        if not count:
+            await callback_query.message.answer("В результате нет записей")
+            return
+        await callback_query.message.answer_document(
+            FSInputFile(path, filename=f"{filename}{os.path.splitext(path)[1]}"),
+            caption=f"{caption}: {count} записей"
+        )
+        await log_export(user.id, parsing_id, export_format, count)
+    finally:
+        os.remove(path)
 
 
 async def show_recent_results(callback_query: CallbackQuery, state: FSMContext):
     """Показ последних результатов"""
-    await callback_query.answer("Функция истории временно недоступна", show_alert=True)
+    parsings = await get_parsing_results(callback_query.from_user.id, limit=5)
+    if not parsings:
+        await callback_query.answer("История пуста", show_alert=True)
+        return
+    
+    await callback_query.message.edit_text(
+        "📊 <b>Последние результаты</b>",
+        reply_markup=get_recent_results_keyboard(parsings),
+        parse_mode="HTML"
+    )
+    await callback_query.answer()
 
 
 def get_recent_results_keyboard(results: List[Dict[str, Any]]) -> InlineKeyboardMarkup:
@@ -102,7 +151,81 @@ def get_recent_results_keyboard(results: List[Dict[str, Any]]) -> InlineKeyboard
 
 async def show_result_details(callback_query: CallbackQuery, state: FSMContext):
     """Показ деталей результата"""
-    await callback_query.answer("Функция истории временно недоступна", show_alert=True)
+    parsing_id = int(callback_query.data.rsplit('_', 1)[1])
+    parsing = await get_parsing_result(parsing_id, callback_query.from_user.id)
+    if not parsing:
+        await callback_query.answer("Результат не найден", show_alert=True)
+        return
+    
+    stats = parsing['stats']
+    text = f"📋 <b>Результат #{parsing['id']}</b>\n\n"
+    text += f"URL: {html.escape(parsing['url'])}\n"
+    text += f"Дата: {parsing['created_at']}\n"
+    text += f"📊 Найдено записей: {parsing['records_count']}\n"
+    text += f"Страниц обработано: {stats.get('pages_parsed', 0)}\n"
+    
+    await callback_query.message.edit_text(
+        text,
+        reply_markup=get_result_details_keyboard(parsing_id),
+        parse_mode="HTML"
+    )
+    await callback_query.answer()
+
+
+async def show_all_results(callback_query: CallbackQuery, state: FSMContext):
+    """Постраничный просмотр записей результата (show_all_<id> и results_<id>_<страница>)"""
+    parts = callback_query.data.split('_')
+    if callback_query.data.startswith("show_all_"):
+        parsing_id, page = int(parts[2]), 1
+    else:
+        parsing_id, page = int(parts[1]), int(parts[2])
+    
+    if not await get_parsing_result(parsing_id, callback_query.from_user.id):
+        await callback_query.answer("Результат не найден", show_alert=True)
+        return
+    
+    total = await count_staff_records(parsing_id)
+    total_pages = max(1, (total + RECORDS_PER_PAGE - 1) // RECORDS_PER_PAGE)
+    page = max(1, min(page, total_pages))
+    records = await get_staff_records(parsing_id, RECORDS_PER_PAGE, (page - 1) * RECORDS_PER_PAGE)
+    
+    text = f"📋 <b>Результат #{parsing_id}</b> — записи {(page - 1) * RECORDS_PER_PAGE + 1}-{(page - 1) * RECORDS_PER_PAGE + len(records)} из {total}\n\n"
+    for i, record in enumerate(records, (page - 1) * RECORDS_PER_PAGE + 1):
+        text += f"<b>{i}. {html.escape(record['fio'] or 'Неизвестно')}</b>\n"
+        text += f"Должность: {html.escape(record['position'] or 'Не указана')}\n"
+        text += f"Email: {html.escape(record['email'] or 'Не указан')}\n"
+        text += f"Достоверность: {record['confidence']:.2f}\n\n"
+    
+    await callback_query.message.edit_text(
+        text,
+        reply_markup=get_pagination_keyboard(page, total_pages, prefix=f"results_{parsing_id}"),
+        parse_mode="HTML"
+    )
+    await callback_query.answer()
+
+
+async def clear_history_handler(callback_query: CallbackQuery, state: FSMContext):
+    """Запрос подтверждения перед удалением истории"""
+    await callback_query.message.edit_text(
+        "🗑 Удалить всю историю парсинга и сохраненные записи? Это действие нельзя отменить.",
+        reply_markup=get_confirmation_keyboard("clear_history")
+    )
+    await callback_query.answer()
+
+
+async def confirm_clear_history_handler(callback_query: CallbackQuery, state: FSMContext):
+    """Удаление истории пользователя после подтверждения"""
+    user = callback_query.from_user
+    removed = await get_result_store().clear_history(user.id)
+    logger.info(f"Пользователь {user.id} удалил историю: {removed} результатов")
+    await callback_query.message.edit_text(f"🗑 История очищена. Удалено результатов: {removed}")
+    await callback_query.answer()
+
+
+async def cancel_action_handler(callback_query: CallbackQuery, state: FSMContext):
+    """Отмена действия, требующего подтверждения"""
+    await callback_query.message.edit_text("Действие отменено")
+    await callback_query.answer()
 
 
 def get_result_details_keyboard(result_id: int) -> InlineKeyboardMarkup:
@@ -116,6 +239,15 @@ def get_result_details_keyboard(result_id: int) -> InlineKeyboardMarkup:
         text="📁 Экспорт CSV",
         callback_data=f"export_csv_{result_id}"
     ))
+    builder.add(InlineKeyboardButton(
+        text="📁 Экспорт JSONL",
+        callback_data=f"export_jsonl_{result_id}"
+    ))
+    if PYARROW_AVAILABLE:
+        builder.add(InlineKeyboardButton(
+            text="📁 Экспорт Parquet",
+            callback_data=f"export_parquet_{result_id}"
+        ))
     builder.add(InlineKeyboardButton(
         text="🔍 Проверить вручную",
         callback_data=f"manual_check_{result_id}"
@@ -3,15 +3,19 @@
 """
 
 import asyncio
+import html
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup
 from aiogram.fsm.context import FSMContext
 from loguru import logger
 import re
+from urllib.parse import urlparse
 
 from bot.states import ParseStates
-from bot.keyboards import get_parse_keyboard, get_staff_item_keyboard, get_confirmation_keyboard
+from bot.keyboards import get_parse_keyboard, get_staff_item_keyboard, get_confirmation_keyboard, get_results_keyboard
+from database.operations import get_user_settings, save_parsing_result
 from parser.main import UniversityParser
-# from database.operations import save_parsing_result, get_user_settings  # Удалено
+from parser.robots import get_robots_service
+from parser.scheduler import get_host_scheduler
 
 
 async def parse_handler(message: Message, state: FSMContext):
@@ -76,23 +80,20 @@ async def start_parsing(message: Message, state: FSMContext, url: str):
     """Запуск процесса парсинга"""
     user = message.from_user
     
-    # Настройки по умолчанию (без БД)
-    settings = {
-        'rate_limit_delay': 2.0,
-        'max_depth': 2,
-        'js_render_timeout': 30,
-        'parsing_timeout': 120,
-        'confidence_threshold': 0.6,
-        'js_render_enabled': True
-    }
+    settings = await get_user_settings(user.id)
+    
+    # Запросы других пользователей к тому же сайту идут через общую очередь
+    host_queue = get_host_scheduler().queue_depth().get(urlparse(url).netloc, {})
+    queue_text = f"🚦 Очередь к сайту: {host_queue['queued']} запросов\n" if host_queue.get('queued') else ""
     
     # Отправляем сообщение о начале парсинга
     parsing_msg = await message.answer(
         f"🚀 <b>Начинаю парсинг...</b>\n\n"
-        f"URL: {url}\n"
+        f"URL: {html.escape(url)}\n"
+        f"{queue_text}"
         f"⏱ Ожидаемое время: {settings.get('parsing_timeout', 120)} сек\n"
         f"🔍 Глубина: {settings.get('max_depth', 2)} уровней\n"
-        f"🌐 JS рендеринг: {'Включен' if settings.get('js_render', True) else 'Отключен'}\n\n"
+        f"🌐 JS рендеринг: {'Включен' if settings.get('js_render_enabled', True) else 'Отключен'}\n\n"
         f"⏳ Пожалуйста, подождите...",
         parse_mode="HTML"
     )
@@ -104,21 +105,28 @@ async def start_parsing(message: Message, state: FSMContext, url: str):
             max_depth=settings.get('max_depth', 2),
             js_render_timeout=settings.get('js_render_timeout', 30),
             parsing_timeout=settings.get('parsing_timeout', 120),
-            confidence_threshold=settings.get('confidence_threshold', 0.6)
+            confidence_threshold=settings.get('confidence_threshold', 0.6),
+            enrich_profiles=settings.get('enrich_profiles', False),
+            dom_backend=settings.get('dom_backend', 'lxml')
         )
         
         # Запускаем парсинг
         results = await parser.parse_url(url)
         
-        # Просто показываем результаты (без сохранения в БД)
-        await show_parsing_results(parsing_msg, results)
+        # Сохраняем результат: история, просмотр всех записей и экспорт читают его из хранилища
+        # Кандидаты до фильтрации позволяют применить другой порог без повторного обхода
+        parsing_id = await save_parsing_result(
+            user.id, url, results, parser.get_crawl_stats(),
+            candidates=parser.get_candidates(), threshold=parser.confidence_threshold
+        )
+        await show_parsing_results(parsing_msg, results, parser.get_crawl_stats(), parsing_id)
         
     except Exception as e:
         logger.error(f"Ошибка парсинга для пользователя {user.id}: {e}")
         await parsing_msg.edit_text(
             f"❌ <b>Ошибка парсинга</b>\n\n"
-            f"Произошла ошибка при парсинге URL: {url}\n\n"
-            f"<b>Ошибка:</b> {str(e)}\n\n"
+            f"Произошла ошибка при парсинге URL: {html.escape(url)}\n\n"
+            f"<b>Ошибка:</b> {html.escape(str(e))}\n\n"
             f"Попробуйте другой URL или обратитесь к администратору.",
             parse_mode="HTML"
         )
@@ -127,8 +135,27 @@ async def start_parsing(message: Message, state: FSMContext, url: str):
         await state.clear()
 
 
-async def show_parsing_results(message: Message, results: list):
+def format_partial_warning(stats: dict) -> str:
+    """Предупреждение о страницах, которые не удалось загрузить или загружены не полностью"""
+    failed = stats.get('failed_pages') or {}
+    truncated = stats.get('truncated_pages', 0)
+    if not failed and not truncated:
+        return ""
+    
+    text = ""
+    if failed:
+        text += f"⚠️ <b>Неполный результат:</b> не загружено страниц: {len(failed)}\n"
+    if stats.get('circuit_open_hosts'):
+        text += f"Сайт временно недоступен: {html.escape(', '.join(stats['circuit_open_hosts']))}\n"
+    if truncated:
+        text += f"⚠️ Слишком большие страницы обработаны частично: {truncated}\n"
+    return text + "\n"
+
+
+async def show_parsing_results(message: Message, results: list, stats: dict = None, parsing_id: int = None):
     """Показ результатов парсинга"""
+    partial_warning = format_partial_warning(stats or {})
+    
     if not results:
         await message.edit_text(
             "🔍 <b>Результаты парсинга</b>\n\n"
@@ -137,6 +164,7 @@ async def show_parsing_results(message: Message, results: list):
             "• Страница не содержит информации о сотрудниках\n"
             "• Необходим JS рендеринг (попробуйте включить в настройках)\n"
             "• Сайт использует нестандартную структуру\n\n"
+            f"{partial_warning}"
             "Попробуйте другой URL или измените настройки парсинга.",
             parse_mode="HTML"
         )
@@ -152,12 +180,13 @@ async def show_parsing_results(message: Message, results: list):
     text += f"• Высокая достоверность: {len(high_confidence)}\n"
     text += f"• Средняя достоверность: {len(medium_confidence)}\n"
     text += f"• Низкая достоверность: {len(low_confidence)}\n\n"
+    text += partial_warning
     
     # Показываем первые несколько результатов
     for i, result in enumerate(results[:5]):
-        text += f"<b>{i+1}. {result.get('fio', 'Неизвестно')}</b>\n"
-        text += f"Должность: {result.get('position', 'Не указана')}\n"
-        text += f"Email: {result.get('email', 'Не указан')}\n"
+        text += f"<b>{i+1}. {html.escape(result.get('fio') or 'Неизвестно')}</b>\n"
+        text += f"Должность: {html.escape(result.get('position') or 'Не указана')}\n"
+        text += f"Email: {html.escape(result.get('email') or 'Не указан')}\n"
         text += f"Достоверность: {result.get('confidence', 0):.2f}\n\n"
     
     if len(results) > 5:
@@ -168,7 +197,7 @@ async def show_parsing_results(message: Message, results: list):
     await message.edit_text(
         text,
         parse_mode="HTML",
-        reply_markup=get_results_keyboard()
+        reply_markup=get_results_keyboard(parsing_id)
     )
 
 
@@ -185,43 +214,9 @@ def is_valid_url(url: str) -> bool:
 
 
 async def check_robots_txt(url: str) -> bool:
-    """Проверка robots.txt"""
+    """Проверка robots.txt (правила кэшируются по хостам и используются парсером)"""
     try:
-        import requests
-        from urllib.parse import urljoin, urlparse
-        
-        parsed_url = urlparse(url)
-        robots_url = f"{parsed_url.scheme}://{parsed_url.netloc}/robots.txt"
-        
-        response = requests.get(robots_url, timeout=10)
-        if response.status_code == 200:
-            robots_content = response.text.lower()
-            # Простая проверка на запрет для всех ботов
-            if "user-agent: *" in robots_content and "disallow: /" in robots_content:
-                return False
-        
-        return True
+        return await get_robots_service().can_fetch(url)
     except Exception as e:
         logger.warning(f"Не удалось проверить robots.txt: {e}")
         return True  # Если не можем проверить, разрешаем
-
-
-def get_results_keyboard(parsing_id: int) -> InlineKeyboardMarkup:
-    """Клавиатура для результатов парсинга"""
-    builder = InlineKeyboardBuilder()
-    
-    builder.add(InlineKeyboardButton(
-        text="📋 Показать все",
-        callback_data=f"show_all_{parsing_id}"
-    ))
-    builder.add(InlineKeyboardButton(
-        text="📁 Экспорт CSV",
-        callback_data=f"export_csv_{parsing_id}"
-    ))
-    builder.add(InlineKeyboardButton(
-        text="🔍 Проверить вручную",
-        callback_data=f"manual_check_{parsing_id}"
-    ))
-    
-    builder.adjust(1)
-    return builder.as_markup()
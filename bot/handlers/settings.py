@@ -2,31 +2,46 @@
 Обработчики настроек
 """
 
+from typing import Any, Dict
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from loguru import logger
 
-from bot.keyboards import get_settings_keyboard
+from bot.handlers.parse import show_parsing_results
+from bot.keyboards import get_settings_keyboard, get_apply_threshold_keyboard
 from bot.states import SettingsStates
-# from database.operations import get_user_settings, update_user_settings  # Удалено
+from database.operations import (
+    get_user_settings, update_user_settings, get_parsing_results, get_parsing_result,
+    get_staff_records, refilter_parsing_result
+)
+from parser.candidates import MIN_CANDIDATE_CONFIDENCE
+
+# Допустимые значения вводимых настроек
+RATE_LIMIT_RANGE = (0.5, 60.0)
+DEPTH_RANGE = (1, 5)
+CONFIDENCE_RANGE = (MIN_CANDIDATE_CONFIDENCE, 1.0)
+
+
+def format_settings(settings: Dict[str, Any]) -> str:
+    """Текст текущих настроек"""
+    text = "⚙️ <b>Настройки парсера</b>\n\n"
+    text += f"⏱ <b>Rate Limit:</b> {settings['rate_limit_delay']} сек\n"
+    text += f"🔍 <b>Глубина парсинга:</b> {settings['max_depth']} уровней\n"
+    text += f"🌐 <b>JS рендеринг:</b> {'Включен' if settings['js_render_enabled'] else 'Отключен'}\n"
+    text += f"⏰ <b>Таймаут JS:</b> {settings['js_render_timeout']} сек\n"
+    text += f"🎯 <b>Confidence threshold:</b> {settings['confidence_threshold']}\n"
+    text += f"👤 <b>Профили сотрудников:</b> {'Загружаются' if settings['enrich_profiles'] else 'Не загружаются'}\n"
+    text += f"⏳ <b>Общий таймаут:</b> {settings['parsing_timeout']} сек\n\n"
+    text += "Новый порог можно применить к последнему результату без повторного парсинга."
+    return text
 
 
 async def settings_handler(message: Message, state: FSMContext):
     """Обработчик команды /settings"""
-    user = message.from_user
-    
-    # Настройки по умолчанию (без БД)
-    text = "⚙️ <b>Настройки парсера</b>\n\n"
-    text += f"⏱ <b>Rate Limit:</b> 2.0 сек\n"
-    text += f"🔍 <b>Глубина парсинга:</b> 2 уровней\n"
-    text += f"🌐 <b>JS рендеринг:</b> Включен\n"
-    text += f"⏰ <b>Таймаут JS:</b> 30 сек\n"
-    text += f"🎯 <b>Confidence threshold:</b> 0.6\n"
-    text += f"⏳ <b>Общий таймаут:</b> 120 сек\n\n"
-    text += "Настройки временно недоступны (без БД)."
+    settings = await get_user_settings(message.from_user.id)
     
     await message.answer(
-        text,
+        format_settings(settings),
         reply_markup=get_settings_keyboard(),
         parse_mode="HTML"
     )
@@ -34,22 +49,138 @@ async def settings_handler(message: Message, state: FSMContext):
 
 async def update_settings_handler(callback_query: CallbackQuery, state: FSMContext):
     """Обработчик обновления настроек"""
-    await callback_query.answer("Настройки временно недоступны (без БД)", show_alert=True)
+    action = callback_query.data[len("settings_"):]
+    
+    if action == "apply_last":
+        await apply_to_last_result(callback_query)
+        return
+    
+    if action == "show":
+        settings = await get_user_settings(callback_query.from_user.id)
+        await callback_query.message.edit_text(
+            format_settings(settings), reply_markup=get_settings_keyboard(), parse_mode="HTML"
+        )
+        await callback_query.answer()
+        return
+    
+    if action == "enrich_profiles":
+        await toggle_enrich_profiles(callback_query)
+        return
+    
+    if action == "js_render":
+        await callback_query.answer(
+            "JS рендеринг включается автоматически для страниц, которым он нужен", show_alert=True
+        )
+        return
+    
+    prompts = {
+        "rate_limit": (
+            SettingsStates.waiting_for_rate_limit,
+            f"⏱ Отправьте задержку между запросами в секундах ({RATE_LIMIT_RANGE[0]}–{RATE_LIMIT_RANGE[1]:g}):"
+        ),
+        "depth": (
+            SettingsStates.waiting_for_depth,
+            f"🔍 Отправьте глубину парсинга ({DEPTH_RANGE[0]}–{DEPTH_RANGE[1]}):"
+        ),
+        "confidence": (
+            SettingsStates.waiting_for_confidence,
+            f"🎯 Отправьте порог достоверности ({CONFIDENCE_RANGE[0]}–{CONFIDENCE_RANGE[1]}):"
+        ),
+    }
+    if action not in prompts:
+        await callback_query.answer("Неизвестная настройка", show_alert=True)
+        return
+    
+    next_state, prompt = prompts[action]
+    await state.set_state(next_state)
+    await callback_query.message.answer(prompt)
+    await callback_query.answer()
+
+
+async def toggle_enrich_profiles(callback_query: CallbackQuery):
+    """Включение и отключение дозаполнения записей со страниц профилей"""
+    user_id = callback_query.from_user.id
+    settings = await get_user_settings(user_id)
+    settings = await update_user_settings(user_id, enrich_profiles=not settings['enrich_profiles'])
+    
+    await callback_query.message.edit_text(
+        format_settings(settings), reply_markup=get_settings_keyboard(), parse_mode="HTML"
+    )
+    await callback_query.answer(
+        "Записи будут дополняться со страниц профилей (больше запросов к сайту)"
+        if settings['enrich_profiles'] else "Страницы профилей не загружаются"
+    )
+
+
+def parse_number(text: str, bounds: tuple, cast=float):
+    """Число из сообщения в допустимых границах (None — неверный ввод)"""
+    try:
+        value = cast(text.strip().replace(',', '.'))
+    except ValueError:
+        return None
+    return value if bounds[0] <= value <= bounds[1] else None
 
 
 async def handle_rate_limit_input(message: Message, state: FSMContext):
     """Обработка ввода rate limit"""
-    await message.answer("Настройки временно недоступны (без БД)")
+    value = parse_number(message.text, RATE_LIMIT_RANGE)
+    if value is None:
+        await message.answer(f"❌ Введите число от {RATE_LIMIT_RANGE[0]} до {RATE_LIMIT_RANGE[1]:g}")
+        return
+    
+    await update_user_settings(message.from_user.id, rate_limit_delay=value)
+    await message.answer(f"✅ Rate Limit: {value} сек")
     await state.clear()
 
 
 async def handle_depth_input(message: Message, state: FSMContext):
     """Обработка ввода глубины парсинга"""
-    await message.answer("Настройки временно недоступны (без БД)")
+    value = parse_number(message.text, DEPTH_RANGE, int)
+    if value is None:
+        await message.answer(f"❌ Введите целое число от {DEPTH_RANGE[0]} до {DEPTH_RANGE[1]}")
+        return
+    
+    await update_user_settings(message.from_user.id, max_depth=value)
+    await message.answer(f"✅ Глубина парсинга: {value}")
     await state.clear()
 
 
 async def handle_confidence_input(message: Message, state: FSMContext):
     """Обработка ввода confidence threshold"""
-    await message.answer("Настройки временно недоступны (без БД)")
+    value = parse_number(message.text, CONFIDENCE_RANGE)
+    if value is None:
+        await message.answer(f"❌ Введите число от {CONFIDENCE_RANGE[0]} до {CONFIDENCE_RANGE[1]}")
+        return
+    
+    await update_user_settings(message.from_user.id, confidence_threshold=value)
+    await message.answer(
+        f"✅ Confidence threshold: {value}\n\n"
+        "Порог применяется к новым парсингам. Применить его к последнему результату?",
+        reply_markup=get_apply_threshold_keyboard()
+    )
     await state.clear()
+
+
+async def apply_to_last_result(callback_query: CallbackQuery):
+    """Пересборка последнего результата по текущему порогу из сохраненных кандидатов"""
+    user = callback_query.from_user
+    latest = await get_parsing_results(user.id, limit=1)
+    if not latest:
+        await callback_query.answer("История пуста", show_alert=True)
+        return
+    
+    parsing_id = latest[0]['id']
+    threshold = (await get_user_settings(user.id))['confidence_threshold']
+    count = await refilter_parsing_result(parsing_id, user.id, threshold)
+    if count is None:
+        await callback_query.answer(
+            "Для этого результата нет сохраненных кандидатов, нужен повторный парсинг", show_alert=True
+        )
+        return
+    
+    logger.info(f"Пользователь {user.id}: задание {parsing_id} пересобрано с порогом {threshold}")
+    await callback_query.answer(f"Порог {threshold} применен: {count} записей")
+    
+    parsing = await get_parsing_result(parsing_id, user.id)
+    records = await get_staff_records(parsing_id)
+    await show_parsing_results(callback_query.message, records, parsing['stats'], parsing_id)
@@ -2,12 +2,14 @@
 Обработчики валидации данных
 """
 
+import html
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from loguru import logger
 
 from bot.states import ValidationStates
-# from database.operations import validate_staff_record, get_staff_records  # Удалено
+from database.operations import validate_staff_record, get_parsing_result
+from database.store import get_result_store
 
 
 async def validate_handler(message: Message, state: FSMContext):
@@ -49,10 +51,10 @@ async def manual_validation_handler(message: Message, state: FSMContext):
         if validation_result['is_valid']:
             await message.answer(
                 f"✅ <b>Данные валидны!</b>\n\n"
-                f"<b>ФИО:</b> {fio}\n"
-                f"<b>Email:</b> {email}\n"
-                f"<b>Должность:</b> {position}\n"
-                f"<b>URL:</b> {url}\n"
+                f"<b>ФИО:</b> {html.escape(fio)}\n"
+                f"<b>Email:</b> {html.escape(email)}\n"
+                f"<b>Должность:</b> {html.escape(position)}\n"
+                f"<b>URL:</b> {html.escape(url)}\n"
                 f"<b>Confidence:</b> {validation_result['confidence']:.2f}",
                 parse_mode="HTML"
             )
@@ -114,17 +116,71 @@ def validate_manual_data(fio: str, email: str, position: str, url: str) -> dict:
 
 async def validate_correct_callback(callback_query: CallbackQuery, state: FSMContext):
     """Обработчик кнопки 'Корректно'"""
-    await callback_query.answer("Валидация временно недоступна (без БД)", show_alert=True)
+    await _mark_record(callback_query, is_correct=True)
 
 
 async def validate_incorrect_callback(callback_query: CallbackQuery, state: FSMContext):
     """Обработчик кнопки 'Неверно'"""
-    await callback_query.answer("Валидация временно недоступна (без БД)", show_alert=True)
+    await _mark_record(callback_query, is_correct=False)
+
+
+async def skip_validation_callback(callback_query: CallbackQuery, state: FSMContext):
+    """Обработчик кнопки 'Пропустить'"""
+    record_id = int(callback_query.data.rsplit('_', 1)[1])
+    record = await get_result_store().get_record(record_id, callback_query.from_user.id)
+    if not record:
+        await callback_query.answer("Запись не найдена", show_alert=True)
+        return
+    
+    await show_next_record(callback_query, record['parsing_id'], after_id=record_id)
 
 
 async def manual_check_handler(callback_query: CallbackQuery, state: FSMContext):
     """Обработчик кнопки 'Проверить вручную'"""
-    await callback_query.answer("Валидация временно недоступна (без БД)", show_alert=True)
+    parsing_id = int(callback_query.data.rsplit('_', 1)[1])
+    if not await get_parsing_result(parsing_id, callback_query.from_user.id):
+        await callback_query.answer("Результат не найден", show_alert=True)
+        return
+    
+    await show_next_record(callback_query, parsing_id)
+
+
+async def _mark_record(callback_query: CallbackQuery, is_correct: bool):
+    """Сохранение отметки и переход к следующей непроверенной записи"""
+    user = callback_query.from_user
+    record_id = int(callback_query.data.rsplit('_', 1)[1])
+    
+    record = await get_result_store().get_record(record_id, user.id)
+    if not record or not await validate_staff_record(record_id, user.id, is_correct):
+        await callback_query.answer("Запись не найдена", show_alert=True)
+        return
+    
+    await show_next_record(callback_query, record['parsing_id'], after_id=record_id)
+
+
+async def show_next_record(callback_query: CallbackQuery, parsing_id: int, after_id: int = 0):
+    """Показ следующей непроверенной записи результата"""
+    record = await get_result_store().next_unvalidated(parsing_id, after_id)
+    if not record:
+        await callback_query.message.edit_text(
+            f"✅ <b>Проверка результата #{parsing_id} завершена</b>\n\n"
+            "Непроверенных записей не осталось.",
+            parse_mode="HTML"
+        )
+        await callback_query.answer()
+        return
+    
+    await callback_query.message.edit_text(
+        f"🔍 <b>Проверка записи</b>\n\n"
+        f"<b>ФИО:</b> {html.escape(record['fio'] or 'Неизвестно')}\n"
+        f"<b>Должность:</b> {html.escape(record['position'] or 'Не указана')}\n"
+        f"<b>Email:</b> {html.escape(record['email'] or 'Не указан')}\n"
+        f"<b>Источник:</b> {html.escape(record['source_url'] or '')}\n"
+        f"<b>Confidence:</b> {record['confidence']:.2f}",
+        reply_markup=get_validation_keyboard(record['id']),
+        parse_mode="HTML"
+    )
+    await callback_query.answer()
 
 
 def get_validation_keyboard(record_id: int):
@@ -90,12 +90,37 @@ def get_settings_keyboard() -> InlineKeyboardMarkup:
         text="🎯 Confidence Threshold",
         callback_data="settings_confidence"
     ))
+    builder.add(InlineKeyboardButton(
+        text="👤 Профили сотрудников",
+        callback_data="settings_enrich_profiles"
+    ))
+    builder.add(InlineKeyboardButton(
+        text="🔁 Применить к последнему результату",
+        callback_data="settings_apply_last"
+    ))
     builder.add(InlineKeyboardButton(
         text="🔙 Назад",
         callback_data="back_to_main"
     ))
     
-    builder.adjust(2)
+    builder.adjust(2, 2, 1, 1, 1)
+    return builder.as_markup()
+
+
+def get_apply_threshold_keyboard() -> InlineKeyboardMarkup:
+    """Предложение применить новый порог к последнему результату"""
+    builder = InlineKeyboardBuilder()
+    
+    builder.add(InlineKeyboardButton(
+        text="🔁 Применить к последнему результату",
+        callback_data="settings_apply_last"
+    ))
+    builder.add(InlineKeyboardButton(
+        text="⚙️ Настройки",
+        callback_data="settings_show"
+    ))
+    
+    builder.adjust(1)
     return builder.as_markup()
 
 
@@ -169,18 +194,23 @@ def get_confirmation_keyboard(action: str, item_id: int = None) -> InlineKeyboar
     return builder.as_markup()
 
 
-def get_results_keyboard() -> InlineKeyboardMarkup:
-    """Клавиатура для результатов парсинга"""
+def get_results_keyboard(parsing_id: int = None) -> InlineKeyboardMarkup:
+    """Клавиатура для результатов парсинга (без parsing_id — результат не сохранен)"""
     builder = InlineKeyboardBuilder()
     
-    builder.add(InlineKeyboardButton(
-        text="📁 Экспорт CSV",
-        callback_data="export_csv"
-    ))
-    builder.add(InlineKeyboardButton(
-        text="🔍 Проверить вручную",
-        callback_data="manual_check"
-    ))
+    if parsing_id:
+        builder.add(InlineKeyboardButton(
+            text="📋 Показать все",
+            callback_data=f"show_all_{parsing_id}"
+        ))
+        builder.add(InlineKeyboardButton(
+            text="📁 Экспорт CSV",
+            callback_data=f"export_csv_{parsing_id}"
+        ))
+        builder.add(InlineKeyboardButton(
+            text="🔍 Проверить вручную",
+            callback_data=f"manual_check_{parsing_id}"
+        ))
     builder.add(InlineKeyboardButton(
         text="🔙 Назад",
         callback_data="back_to_main"
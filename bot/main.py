@@ -11,6 +11,7 @@ from loguru import logger
 
 from bot.handlers import register_handlers
 from bot.middleware import register_middleware
+from database.operations import init_database, close_database
 
 
 async def start_bot():
@@ -20,8 +21,8 @@ async def start_bot():
     if not token:
         raise ValueError("TELEGRAM_TOKEN не найден в переменных окружения")
     
-    # Инициализируем базу данных
-    # await init_database()  # Удалено
+    # Инициализируем хранилище результатов
+    await init_database()
     
     # Создаем бота и диспетчер
     bot = Bot(token=token)
@@ -87,4 +88,5 @@ async def start_bot():
 async def stop_bot():
     """Остановка бота"""
     logger.info("Остановка бота...")
-    # Здесь можно добавить логику очистки ресурсов
+    # Дописываем очередь записей и закрываем хранилище
+    await close_database()
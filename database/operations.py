@@ -0,0 +1,106 @@
+"""
+Операции с хранилищем результатов для обработчиков бота
+"""
+
+from typing import Any, Dict, List, Optional
+from loguru import logger
+
+from database.store import DEFAULT_USER_SETTINGS, ResultStore, get_result_store
+
+
+async def init_database(path: Optional[str] = None) -> ResultStore:
+    """Открытие общего хранилища (вызывается при запуске бота)"""
+    store = get_result_store(path) if path else get_result_store()
+    await store.open()
+    return store
+
+
+async def close_database():
+    """Запись очереди и закрытие хранилища"""
+    await get_result_store().close()
+
+
+async def save_parsing_result(
+    user_id: int,
+    url: str,
+    results: List[Dict[str, Any]],
+    stats: Optional[Dict[str, Any]] = None,
+    candidates: Optional[List[Dict[str, Any]]] = None,
+    threshold: Optional[float] = None
+) -> Optional[int]:
+    """Сохранение результата парсинга (и кандидатов до фильтрации); None, если хранилище недоступно"""
+    try:
+        return await get_result_store().save_parsing(user_id, url, results, stats, candidates, threshold)
+    except Exception as e:
+        logger.error(f"Не удалось сохранить результат парсинга {url}: {e}")
+        return None
+
+
+async def get_parsing_results(user_id: int, limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
+    """Последние задания пользователя"""
+    return await get_result_store().get_parsings(user_id, limit, offset)
+
+
+async def get_parsing_result(parsing_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+    """Задание пользователя по id"""
+    return await get_result_store().get_parsing(parsing_id, user_id)
+
+
+async def get_staff_records(parsing_id: int, limit: int = -1, offset: int = 0) -> List[Dict[str, Any]]:
+    """Записи задания (страница или все)"""
+    return await get_result_store().get_records(parsing_id, limit, offset)
+
+
+async def count_staff_records(parsing_id: int) -> int:
+    """Число записей задания"""
+    return await get_result_store().count_records(parsing_id)
+
+
+async def validate_staff_record(record_id: int, user_id: int, is_correct: bool) -> bool:
+    """Отметка ручной проверки записи"""
+    return await get_result_store().set_validation(record_id, user_id, is_correct)
+
+
+async def refilter_parsing_result(
+    parsing_id: int,
+    user_id: int,
+    threshold: float,
+    rescore: bool = False
+) -> Optional[int]:
+    """Применение нового порога к сохраненному заданию без повторного обхода"""
+    try:
+        return await get_result_store().refilter_parsing(parsing_id, user_id, threshold, rescore)
+    except Exception as e:
+        logger.error(f"Не удалось пересобрать задание {parsing_id}: {e}")
+        return None
+
+
+async def get_user_settings(user_id: int) -> Dict[str, Any]:
+    """Настройки парсинга пользователя (по умолчанию, если хранилище недоступно)"""
+    try:
+        return await get_result_store().get_user_settings(user_id)
+    except Exception as e:
+        logger.warning(f"Не удалось прочитать настройки пользователя {user_id}: {e}")
+        return dict(DEFAULT_USER_SETTINGS)
+
+
+async def update_user_settings(user_id: int, **changes) -> Dict[str, Any]:
+    """Изменение настроек парсинга пользователя"""
+    return await get_result_store().update_user_settings(user_id, **changes)
+
+
+async def find_staff(query: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """Поиск сотрудников по ФИО (кириллицей или латиницей), адресу или должности во всех обходах"""
+    try:
+        return await get_result_store().search(query, limit)
+    except Exception as e:
+        logger.error(f"Ошибка поиска по запросу {query!r}: {e}")
+        return []
+
+
+async def log_export(user_id: int, parsing_id: Optional[int], export_format: str, records_count: int):
+    """Учет выгрузки"""
+    try:
+        await get_result_store().log_export(user_id, parsing_id, export_format, records_count)
+    except Exception as e:
+        logger.warning(f"Не удалось записать выгрузку: {e}")
@@ -0,0 +1,157 @@
+"""
+Поиск по собранным записям: триграммный индекс FTS5 по ФИО, транслиту ФИО, адресу и должности
+"""
+
+import re
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional, Tuple
+
+from parser.names import transliterate
+
+
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS staff_search USING fts5(
+    fio, fio_latin, email, position, tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS staff_search_insert AFTER INSERT ON staff_records BEGIN
+    INSERT INTO staff_search (rowid, fio, fio_latin, email, position)
+    VALUES (new.id, search_text(new.fio), translit(new.fio), search_text(new.email), search_text(new.position));
+END;
+CREATE TRIGGER IF NOT EXISTS staff_search_delete AFTER DELETE ON staff_records BEGIN
+    DELETE FROM staff_search WHERE rowid = old.id;
+END;
+"""
+
+# Заполнение индекса для записей, сохраненных до его появления
+REBUILD_SEARCH = """
+INSERT INTO staff_search (rowid, fio, fio_latin, email, position)
+SELECT id, search_text(fio), translit(fio), search_text(email), search_text(position)
+FROM staff_records WHERE id NOT IN (SELECT rowid FROM staff_search)
+"""
+
+# Триграммный индекс ищет подстроки не короче трех символов
+MIN_TOKEN_LENGTH = 3
+
+# Записей, из которых выбираются лучшие совпадения (последние по времени сохранения)
+EXACT_CANDIDATES = 200
+FUZZY_CANDIDATES = 300
+
+# Минимальное сходство слова запроса со словом записи при нечетком поиске
+MIN_WORD_SIMILARITY = 0.75
+
+TOKEN_RE = re.compile(r'[\w@.+-]+')
+
+
+def search_text(text: Optional[str]) -> str:
+    """Текст для индекса: нижний регистр, ё -> е, одиночные пробелы"""
+    return ' '.join((text or '').lower().replace('ё', 'е').split())
+
+
+def translit(text: Optional[str]) -> str:
+    """Латинское написание для индекса"""
+    return search_text(transliterate(text or ''))
+
+
+def query_tokens(query: str) -> List[str]:
+    """Слова запроса, по которым возможен поиск в триграммном индексе"""
+    return [token for token in TOKEN_RE.findall(search_text(query)) if len(token) >= MIN_TOKEN_LENGTH]
+
+
+def _phrase(text: str) -> str:
+    """Строка FTS5 в кавычках"""
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _variants(token: str) -> List[str]:
+    """Слово запроса и его транслит (кириллический запрос находит латинские адреса)"""
+    latin = translit(token)
+    return [token] if latin == token else [token, latin]
+
+
+def match_query(tokens: List[str]) -> str:
+    """Точный запрос: каждое слово как подстрока в любом столбце (префиксы тоже совпадают)"""
+    return ' AND '.join(
+        '(' + ' OR '.join(_phrase(variant) for variant in _variants(token)) + ')'
+        for token in tokens
+    )
+
+
+def _segments(token: str) -> List[str]:
+    """Части слова, одна из которых остается целой при одной опечатке"""
+    if len(token) < 2 * MIN_TOKEN_LENGTH:
+        return [token[:MIN_TOKEN_LENGTH], token[-MIN_TOKEN_LENGTH:]]
+    middle = len(token) // 2
+    return [token[:middle], token[middle:]]
+
+
+def fuzzy_query(tokens: List[str]) -> str:
+    """Запрос кандидатов с опечатками: для каждого слова — любая из его частей"""
+    parts = []
+    for token in tokens:
+        segments = {segment for variant in _variants(token) for segment in _segments(variant)}
+        parts.append('(' + ' OR '.join(_phrase(segment) for segment in sorted(segments)) + ')')
+    return ' AND '.join(parts)
+
+
+def _record_words(record: Dict[str, Any]) -> List[str]:
+    """Слова записи для сравнения с запросом"""
+    words = TOKEN_RE.findall(search_text(record.get('fio')))
+    words += [translit(word) for word in words]
+    words += TOKEN_RE.findall(search_text(record.get('position')))
+    email = search_text(record.get('email'))
+    if email:
+        words += [email, email.split('@')[0]]
+    return words
+
+
+def _word_score(token: str, word: str, fuzzy: bool) -> float:
+    """Совпадение слова запроса со словом записи: 1 — равны, 0.9 — начало слова, иначе сходство"""
+    if word == token:
+        return 1.0
+    if word.startswith(token):
+        return 0.9
+    if not fuzzy:
+        return 0.5 if token in word else 0.0
+    # Разные алфавиты и верхняя оценка сходства по длинам отсекают заведомо непохожие слова
+    if token.isascii() != word.isascii():
+        return 0.0
+    if 2 * min(len(token), len(word)) / (len(token) + len(word)) < MIN_WORD_SIMILARITY:
+        return 0.0
+    return min(SequenceMatcher(None, token, word).ratio(), 0.89)
+
+
+def similarity(tokens: List[str], record: Dict[str, Any], fuzzy: bool = True) -> float:
+    """Худшее по словам запроса совпадение с ближайшим словом записи (0 — слово не найдено)
+    
+    Без fuzzy слова сравниваются только на равенство, начало и вхождение
+    (для строк точного поиска, где каждое слово запроса уже найдено).
+    """
+    words = _record_words(record)
+    if not words:
+        return 0.0
+    return min(
+        max(_word_score(variant, word, fuzzy) for variant in _variants(token) for word in words)
+        for token in tokens
+    )
+
+
+def person_key(record: Dict[str, Any]) -> Tuple[str, str]:
+    """Один человек в разных обходах: по адресу, без адреса — по ФИО и домену"""
+    if record.get('email'):
+        return 'email', record['email'].lower()
+    return 'fio', f"{search_text(record.get('fio'))}|{record.get('domain')}"
+
+
+def unique_people(records: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    """Первая (лучшая) запись на человека, не больше limit"""
+    seen = set()
+    people = []
+    for record in records:
+        key = person_key(record)
+        if key in seen:
+            continue
+        seen.add(key)
+        people.append(record)
+        if len(people) >= limit:
+            break
+    return people
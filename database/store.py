@@ -0,0 +1,564 @@
+"""
+Хранилище результатов парсинга: SQLite в режиме WAL с пакетной записью записей
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+from urllib.parse import urlparse
+from loguru import logger
+
+import aiosqlite
+
+from database.search import (
+    EXACT_CANDIDATES, FUZZY_CANDIDATES, MIN_WORD_SIMILARITY, REBUILD_SEARCH, SEARCH_SCHEMA,
+    fuzzy_query, match_query, query_tokens, search_text, similarity, translit, unique_people
+)
+from parser.candidates import filter_candidates, pack_candidates, rescore_candidates, unpack_candidates
+
+DEFAULT_DB_PATH = 'data/results.db'
+
+# Записи накапливаются и пишутся одной транзакцией
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS parsing_results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    records_count INTEGER NOT NULL DEFAULT 0,
+    stats TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS staff_records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    parsing_id INTEGER NOT NULL REFERENCES parsing_results(id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL,
+    domain TEXT NOT NULL,
+    fio TEXT,
+    position TEXT,
+    email TEXT,
+    phone TEXT,
+    department TEXT,
+    source_url TEXT,
+    profile_url TEXT,
+    confidence REAL NOT NULL DEFAULT 0,
+    is_validated INTEGER NOT NULL DEFAULT 0,
+    is_correct INTEGER
+);
+CREATE TABLE IF NOT EXISTS exports (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    parsing_id INTEGER,
+    format TEXT NOT NULL,
+    records_count INTEGER NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS parsing_candidates (
+    parsing_id INTEGER PRIMARY KEY REFERENCES parsing_results(id) ON DELETE CASCADE,
+    threshold REAL NOT NULL,
+    candidates_count INTEGER NOT NULL,
+    candidates BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS user_settings (
+    user_id INTEGER PRIMARY KEY,
+    settings TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_parsing_results_user ON parsing_results(user_id, id);
+CREATE INDEX IF NOT EXISTS idx_parsing_results_domain ON parsing_results(domain);
+CREATE INDEX IF NOT EXISTS idx_staff_records_parsing ON staff_records(parsing_id, id);
+CREATE INDEX IF NOT EXISTS idx_staff_records_user ON staff_records(user_id);
+CREATE INDEX IF NOT EXISTS idx_staff_records_domain ON staff_records(domain);
+CREATE INDEX IF NOT EXISTS idx_staff_records_email ON staff_records(email);
+"""
+
+# Настройки парсинга пользователя по умолчанию
+DEFAULT_USER_SETTINGS = {
+    'rate_limit_delay': 2.0,
+    'max_depth': 2,
+    'js_render_timeout': 30,
+    'parsing_timeout': 120,
+    'confidence_threshold': 0.6,
+    'js_render_enabled': True,
+    # Дозаполнение из страниц профилей — дополнительные запросы к сайту, включается пользователем
+    'enrich_profiles': False
+}
+
+RECORD_COLUMNS = [
+    'parsing_id', 'user_id', 'domain', 'fio', 'position', 'email', 'phone',
+    'department', 'source_url', 'profile_url', 'confidence'
+]
+
+# Ошибки из-за самих данных: такой пакет пишется построчно
+DATA_ERRORS = (sqlite3.IntegrityError, sqlite3.InterfaceError, sqlite3.ProgrammingError)
+
+INSERT_RECORD = (
+    f"INSERT INTO staff_records ({', '.join(RECORD_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in RECORD_COLUMNS)})"
+)
+
+
+def _record_row(parsing_id: int, user_id: int, record: Dict[str, Any]) -> tuple:
+    """Строка staff_records из записи парсера"""
+    source = record.get('source') or record.get('source_url')
+    return (
+        parsing_id,
+        user_id,
+        urlparse(source or '').netloc.lower(),
+        record.get('fio'),
+        record.get('position'),
+        (record.get('email') or '').lower() or None,
+        record.get('phone'),
+        record.get('department'),
+        source,
+        record.get('profile_url'),
+        float(record.get('confidence') or 0.0),
+    )
+
+
+class ResultStore:
+    """Результаты парсинга по пользователям (история, постраничный просмотр, экспорт, валидация)
+    
+    Строка задания пишется сразу (ее id нужен для кнопок), записи сотрудников
+    ставятся в очередь и пишутся фоновой задачей пакетами через executemany
+    в одной транзакции. Чтение записей сначала дописывает очередь, поэтому
+    результат задания доступен сразу после сохранения.
+    """
+    
+    def __init__(
+        self,
+        path: str = DEFAULT_DB_PATH,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._db: Optional[aiosqlite.Connection] = None
+        self._pending: List[tuple] = []
+        self._write_lock = asyncio.Lock()
+        self._has_pending = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+        # Строки, которые не удалось записать (журнал — рядом с базой)
+        self.quarantine_path = None if path == ':memory:' else f"{path}.quarantine.jsonl"
+        self.quarantined = 0
+        # Поиск недоступен, если SQLite собран без FTS5
+        self.search_enabled = False
+    
+    async def open(self):
+        """Открытие базы, режим WAL и создание схемы"""
+        if self._db is not None:
+            return
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        
+        self._db = await aiosqlite.connect(self.path)
+        self._db.row_factory = aiosqlite.Row
+        await self._db.execute("PRAGMA journal_mode=WAL")
+        # В режиме WAL synchronous=NORMAL не теряет согласованность и не ждет fsync на каждую транзакцию
+        await self._db.execute("PRAGMA synchronous=NORMAL")
+        await self._db.execute("PRAGMA foreign_keys=ON")
+        await self._db.executescript(SCHEMA)
+        await self._db.commit()
+        await self._open_search()
+        
+        self._writer = asyncio.create_task(self._write_loop())
+        logger.info(f"Хранилище результатов открыто: {self.path}")
+    
+    async def _open_search(self):
+        """Поисковый индекс: функции нормализации, таблица FTS5 и триггеры"""
+        # Функции используются триггерами индекса при каждой вставке записей
+        await self._db.create_function('search_text', 1, search_text, deterministic=True)
+        await self._db.create_function('translit', 1, translit, deterministic=True)
+        try:
+            await self._db.executescript(SEARCH_SCHEMA)
+            cursor = await self._db.execute(
+                "SELECT (SELECT COUNT(*) FROM staff_records) - (SELECT COUNT(*) FROM staff_search)"
+            )
+            missing = (await cursor.fetchone())[0]
+            if missing:
+                logger.info(f"Индексирование для поиска {missing} сохраненных записей")
+                await self._db.execute(REBUILD_SEARCH)
+            await self._db.commit()
+            self.search_enabled = True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Поиск по записям недоступен (SQLite без FTS5 trigram): {e}")
+    
+    async def close(self):
+        """Запись очереди и закрытие базы"""
+        if self._db is None:
+            return
+        if self._writer:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+        await self.flush()
+        await self._db.close()
+        self._db = None
+    
+    async def _write_loop(self):
+        """Фоновая запись очереди: пакет набирается не дольше flush_interval"""
+        while True:
+            await self._has_pending.wait()
+            if len(self._pending) < self.batch_size:
+                await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Ошибка пакетной записи результатов: {e}")
+                await asyncio.sleep(self.flush_interval)
+    
+    async def flush(self):
+        """Запись накопленных записей пакетами по batch_size
+        
+        Если пакет не записался из-за данных (нарушение ограничений,
+        неподдерживаемый тип значения), транзакция откатывается и пакет
+        пишется построчно: записываются все корректные строки, остальные
+        попадают в карантин. При ошибке базы (блокировка, диск) транзакция
+        откатывается, а пакет остается в очереди для следующей попытки.
+        """
+        async with self._write_lock:
+            while self._pending:
+                batch = self._pending[:self.batch_size]
+                try:
+                    await self._db.executemany(INSERT_RECORD, batch)
+                    await self._db.commit()
+                except DATA_ERRORS as e:
+                    await self._db.rollback()
+                    logger.warning(f"Пакет из {len(batch)} записей не записан ({e}), запись построчно")
+                    await self._insert_rows(batch)
+                except Exception:
+                    await self._db.rollback()
+                    raise
+                del self._pending[:len(batch)]
+            self._has_pending.clear()
+    
+    async def _insert_rows(self, batch: List[tuple]):
+        """Построчная запись пакета: ошибочные строки откладываются в карантин"""
+        for row in batch:
+            try:
+                await self._db.execute(INSERT_RECORD, row)
+            except DATA_ERRORS as e:
+                self._quarantine(row, e)
+        await self._db.commit()
+    
+    def _quarantine(self, row: tuple, error: Exception):
+        """Строка, которую нельзя записать: в журнал карантина рядом с базой"""
+        self.quarantined += 1
+        logger.error(f"Запись не сохранена и помещена в карантин: {error}")
+        if not self.quarantine_path:
+            return
+        entry = {'error': str(error), 'record': dict(zip(RECORD_COLUMNS, row))}
+        try:
+            with open(self.quarantine_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + '\n')
+        except OSError as e:
+            logger.error(f"Не удалось записать карантин {self.quarantine_path}: {e}")
+    
+    async def save_parsing(
+        self,
+        user_id: int,
+        url: str,
+        records: List[Dict[str, Any]],
+        stats: Optional[Dict[str, Any]] = None,
+        candidates: Optional[List[Dict[str, Any]]] = None,
+        threshold: Optional[float] = None
+    ) -> int:
+        """Сохранение задания; записи пишутся фоновой задачей. Возвращает id задания
+        
+        candidates — записи обхода до фильтрации по порогу threshold; по ним
+        refilter_parsing пересобирает результат без повторного обхода.
+        """
+        async with self._write_lock:
+            cursor = await self._db.execute(
+                "INSERT INTO parsing_results (user_id, url, domain, records_count, stats, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    user_id, url, urlparse(url).netloc.lower(), len(records),
+                    json.dumps(stats or {}, ensure_ascii=False, default=str),
+                    datetime.now().isoformat(timespec='seconds'),
+                )
+            )
+            parsing_id = cursor.lastrowid
+            if candidates:
+                await self._save_candidates(parsing_id, candidates, threshold or 0.0)
+            await self._db.commit()
+        
+        self._pending.extend(_record_row(parsing_id, user_id, record) for record in records)
+        if self._pending:
+            self._has_pending.set()
+        return parsing_id
+    
+    async def _save_candidates(self, parsing_id: int, candidates: List[Dict[str, Any]], threshold: float):
+        """Запись кандидатов задания (в транзакции вызывающего кода)"""
+        await self._db.execute(
+            "INSERT OR REPLACE INTO parsing_candidates (parsing_id, threshold, candidates_count, candidates) "
+            "VALUES (?, ?, ?, ?)",
+            (parsing_id, threshold, len(candidates), pack_candidates(candidates))
+        )
+    
+    async def get_candidates(self, parsing_id: int) -> Optional[List[Dict[str, Any]]]:
+        """Кандидаты задания до фильтрации; None, если они не сохранены"""
+        cursor = await self._db.execute(
+            "SELECT candidates FROM parsing_candidates WHERE parsing_id = ?", (parsing_id,)
+        )
+        row = await cursor.fetchone()
+        return unpack_candidates(row['candidates']) if row else None
+    
+    async def refilter_parsing(
+        self,
+        parsing_id: int,
+        user_id: int,
+        threshold: float,
+        rescore: bool = False
+    ) -> Optional[int]:
+        """Пересборка записей задания по новому порогу из сохраненных кандидатов
+        
+        С rescore оценки кандидатов сначала пересчитываются текущим валидатором
+        (без DNS запросов) и сохраняются. Изменяются только записи, которые
+        выпали или добавились (id и отметки проверки остальных сохраняются).
+        Возвращает новое число записей или None, если задание не найдено или
+        кандидаты не сохранены.
+        """
+        if await self.get_parsing(parsing_id, user_id) is None:
+            return None
+        candidates = await self.get_candidates(parsing_id)
+        if candidates is None:
+            return None
+        if rescore:
+            rescore_candidates(candidates)
+        # Кандидаты уникальны по адресу, а без адреса — по ФИО
+        rows = {}
+        for record in filter_candidates(candidates, threshold):
+            row = _record_row(parsing_id, user_id, record)
+            rows[(row[5], row[3])] = row
+        
+        await self.flush()
+        async with self._write_lock:
+            cursor = await self._db.execute(
+                "SELECT id, email, fio, confidence FROM staff_records WHERE parsing_id = ?", (parsing_id,)
+            )
+            removed, rescored = [], []
+            for current in await cursor.fetchall():
+                row = rows.pop((current['email'], current['fio']), None)
+                if row is None:
+                    removed.append((current['id'],))
+                elif row[-1] != current['confidence']:
+                    rescored.append((row[-1], current['id']))
+            
+            await self._db.executemany("DELETE FROM staff_records WHERE id = ?", removed)
+            await self._db.executemany(INSERT_RECORD, list(rows.values()))
+            await self._db.executemany("UPDATE staff_records SET confidence = ? WHERE id = ?", rescored)
+            cursor = await self._db.execute("SELECT COUNT(*) FROM staff_records WHERE parsing_id = ?", (parsing_id,))
+            count = (await cursor.fetchone())[0]
+            await self._db.execute("UPDATE parsing_results SET records_count = ? WHERE id = ?", (count, parsing_id))
+            if rescore:
+                await self._save_candidates(parsing_id, candidates, threshold)
+            else:
+                await self._db.execute(
+                    "UPDATE parsing_candidates SET threshold = ? WHERE parsing_id = ?", (threshold, parsing_id)
+                )
+            await self._db.commit()
+        
+        logger.debug(
+            f"Задание {parsing_id} пересобрано с порогом {threshold}: {count} из {len(candidates)} "
+            f"(удалено {len(removed)}, добавлено {len(rows)})"
+        )
+        return count
+    
+    async def get_user_settings(self, user_id: int) -> Dict[str, Any]:
+        """Настройки парсинга пользователя (недостающие — по умолчанию)"""
+        cursor = await self._db.execute("SELECT settings FROM user_settings WHERE user_id = ?", (user_id,))
+        row = await cursor.fetchone()
+        return {**DEFAULT_USER_SETTINGS, **(json.loads(row['settings']) if row else {})}
+    
+    async def update_user_settings(self, user_id: int, **changes) -> Dict[str, Any]:
+        """Изменение настроек пользователя; возвращает все настройки"""
+        settings = {**await self.get_user_settings(user_id), **changes}
+        async with self._write_lock:
+            await self._db.execute(
+                "INSERT OR REPLACE INTO user_settings (user_id, settings) VALUES (?, ?)",
+                (user_id, json.dumps(settings))
+            )
+            await self._db.commit()
+        return settings
+    
+    async def get_parsings(self, user_id: int, limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
+        """Задания пользователя, новые первыми"""
+        cursor = await self._db.execute(
+            "SELECT id, url, domain, records_count, created_at FROM parsing_results "
+            "WHERE user_id = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+            (user_id, limit, offset)
+        )
+        return [dict(row) for row in await cursor.fetchall()]
+    
+    async def get_parsing(self, parsing_id: int, user_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Задание по id (если указан user_id — только задание этого пользователя)"""
+        query = "SELECT * FROM parsing_results WHERE id = ?"
+        params: List[Any] = [parsing_id]
+        if user_id is not None:
+            query += " AND user_id = ?"
+            params.append(user_id)
+        
+        cursor = await self._db.execute(query, params)
+        row = await cursor.fetchone()
+        if row is None:
+            return None
+        parsing = dict(row)
+        parsing['stats'] = json.loads(parsing['stats'] or '{}')
+        return parsing
+    
+    async def count_records(self, parsing_id: int) -> int:
+        """Число записей задания"""
+        await self.flush()
+        cursor = await self._db.execute("SELECT COUNT(*) FROM staff_records WHERE parsing_id = ?", (parsing_id,))
+        return (await cursor.fetchone())[0]
+    
+    async def get_records(self, parsing_id: int, limit: int = -1, offset: int = 0) -> List[Dict[str, Any]]:
+        """Записи задания в порядке сохранения (limit=-1 — все)"""
+        await self.flush()
+        cursor = await self._db.execute(
+            "SELECT * FROM staff_records WHERE parsing_id = ? ORDER BY id LIMIT ? OFFSET ?",
+            (parsing_id, limit, offset)
+        )
+        return [dict(row) for row in await cursor.fetchall()]
+    
+    async def iter_records(
+        self,
+        user_id: int,
+        parsing_id: Optional[int] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Записи задания (или всех заданий пользователя) порциями по первичному ключу"""
+        await self.flush()
+        query = "SELECT * FROM staff_records WHERE user_id = ?"
+        params: List[Any] = [user_id]
+        if parsing_id is not None:
+            query += " AND parsing_id = ?"
+            params.append(parsing_id)
+        query += " AND id > ? ORDER BY id LIMIT ?"
+        
+        last_id = 0
+        while True:
+            cursor = await self._db.execute(query, (*params, last_id, batch_size))
+            rows = await cursor.fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield dict(row)
+            last_id = rows[-1]['id']
+    
+    async def get_record(self, record_id: int, user_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Запись по id (если указан user_id — только запись этого пользователя)"""
+        await self.flush()
+        query = "SELECT * FROM staff_records WHERE id = ?"
+        params: List[Any] = [record_id]
+        if user_id is not None:
+            query += " AND user_id = ?"
+            params.append(user_id)
+        cursor = await self._db.execute(query, params)
+        row = await cursor.fetchone()
+        return dict(row) if row else None
+    
+    async def next_unvalidated(self, parsing_id: int, after_id: int = 0) -> Optional[Dict[str, Any]]:
+        """Следующая непроверенная запись задания"""
+        await self.flush()
+        cursor = await self._db.execute(
+            "SELECT * FROM staff_records WHERE parsing_id = ? AND id > ? AND is_validated = 0 ORDER BY id LIMIT 1",
+            (parsing_id, after_id)
+        )
+        row = await cursor.fetchone()
+        return dict(row) if row else None
+    
+    async def set_validation(self, record_id: int, user_id: int, is_correct: bool) -> bool:
+        """Отметка ручной проверки записи; False, если запись не найдена"""
+        await self.flush()
+        async with self._write_lock:
+            cursor = await self._db.execute(
+                "UPDATE staff_records SET is_validated = 1, is_correct = ? WHERE id = ? AND user_id = ?",
+                (int(is_correct), record_id, user_id)
+            )
+            await self._db.commit()
+        return cursor.rowcount > 0
+    
+    async def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Поиск людей по всем сохраненным обходам: ФИО, транслит ФИО, адрес, должность
+        
+        Сначала ищутся подстроки (совпадают и начала слов), если людей меньше
+        limit — кандидаты с опечатками: записи, содержащие половину каждого
+        слова запроса. Из последних совпадений первыми идут записи, где слова
+        запроса совпадают со словами целиком, затем по началу и по сходству.
+        Один человек из разных обходов возвращается один раз.
+        """
+        tokens = query_tokens(query)
+        if not tokens or not self.search_enabled:
+            return []
+        
+        await self.flush()
+        rows = self._by_similarity(tokens, await self._search_rows(match_query(tokens), EXACT_CANDIDATES), fuzzy=False)
+        people = unique_people(rows, limit)
+        if len(people) >= limit:
+            return people
+        
+        candidates = self._by_similarity(tokens, await self._search_rows(fuzzy_query(tokens), FUZZY_CANDIDATES))
+        fuzzy = [row for row in candidates if row['_similarity'] >= MIN_WORD_SIMILARITY]
+        return unique_people(rows + fuzzy, limit)
+    
+    @staticmethod
+    def _by_similarity(tokens: List[str], rows: List[Dict[str, Any]], fuzzy: bool = True) -> List[Dict[str, Any]]:
+        """Строки по убыванию совпадения слов (при равенстве — новые первыми)"""
+        for row in rows:
+            row['_similarity'] = similarity(tokens, row, fuzzy)
+        return sorted(rows, key=lambda row: -row['_similarity'])
+    
+    async def _search_rows(self, match: str, limit: int) -> List[Dict[str, Any]]:
+        """Последние записи по запросу FTS5
+        
+        Индекс обходится по rowid в обратном порядке и останавливается на limit:
+        сортировка по bm25 оценивала бы все совпадения (сотни миллисекунд для
+        распространенной фамилии на миллионе записей).
+        """
+        cursor = await self._db.execute(
+            "SELECT * FROM staff_records WHERE id IN ("
+            "SELECT rowid FROM staff_search WHERE staff_search MATCH ? ORDER BY rowid DESC LIMIT ?"
+            ") ORDER BY id DESC",
+            (match, limit)
+        )
+        return [dict(row) for row in await cursor.fetchall()]
+    
+    async def log_export(self, user_id: int, parsing_id: Optional[int], export_format: str, records_count: int):
+        """Учет выгрузки"""
+        async with self._write_lock:
+            await self._db.execute(
+                "INSERT INTO exports (user_id, parsing_id, format, records_count, created_at) VALUES (?, ?, ?, ?, ?)",
+                (user_id, parsing_id, export_format, records_count, datetime.now().isoformat(timespec='seconds'))
+            )
+            await self._db.commit()
+    
+    async def clear_history(self, user_id: int) -> int:
+        """Удаление заданий и записей пользователя; возвращает число удаленных заданий"""
+        await self.flush()
+        async with self._write_lock:
+            await self._db.execute("DELETE FROM staff_records WHERE user_id = ?", (user_id,))
+            cursor = await self._db.execute("DELETE FROM parsing_results WHERE user_id = ?", (user_id,))
+            await self._db.commit()
+        return cursor.rowcount
+
+
+_store = None
+
+
+def get_result_store(path: str = DEFAULT_DB_PATH) -> ResultStore:
+    """Общее для процесса хранилище результатов (открывается через open())"""
+    global _store
+    if _store is None:
+        _store = ResultStore(path)
+    return _store
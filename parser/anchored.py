@@ -0,0 +1,126 @@
+"""
+Поиск записей о сотрудниках от адресов email вверх по дереву
+"""
+
+from typing import List, Dict, Any, Tuple
+from urllib.parse import unquote
+
+from parser.classifier import EMAIL_RE, FIO_RE
+from parser.dom import DomDocument
+
+
+# Выше этих элементов подъем не идет
+STOP_TAGS = {'body', 'html'}
+
+# Меньше записей — страница не похожа на список с адресами
+MIN_ANCHORED_RECORDS = 2
+
+
+def _email_hits(doc: DomDocument) -> List[Tuple[str, Any]]:
+    """Все вхождения адресов: (адрес, элемент), mailto раньше текста
+    
+    Общий адрес кафедры у нескольких людей дает вхождение в каждой записи.
+    """
+    hits: List[Tuple[str, Any]] = []
+    
+    for node in doc.select('a[href^="mailto:"]'):
+        match = EMAIL_RE.search(unquote(doc.attr(node, 'href')))
+        if match:
+            hits.append((match.group(0).lower(), node))
+    
+    for node in doc.text_owners('@'):
+        for email in EMAIL_RE.findall(doc.text(node)):
+            hits.append((email.lower(), node))
+    
+    return hits
+
+
+def _name_count(doc: DomDocument, node: Any) -> int:
+    """Число разных кандидатов в ФИО в тексте элемента"""
+    return len(set(FIO_RE.findall(doc.text(node, separator=' '))))
+
+
+def _sibling_key(doc: DomDocument, node: Any) -> Tuple[str, str]:
+    """Признак однотипных соседей: тег и класс"""
+    return doc.tag(node), ' '.join(sorted(doc.attr(node, 'class').split()))
+
+
+def find_record_blocks(doc: DomDocument) -> List[Any]:
+    """Блоки записей: наименьший предок адреса, содержащий ровно одно ФИО
+    
+    Подъем от каждого вхождения адреса прекращается на предке с несколькими
+    разными ФИО, а не адресами: в карточке бывают личный адрес и адрес
+    кафедры. Число ФИО считается один раз на элемент, поэтому текст общих
+    предков читается однократно. Однотипные соседи найденных блоков с одним
+    ФИО добавляются как записи без адреса. Блоки не вложены друг в друга.
+    """
+    hits = _email_hits(doc)
+    if len(hits) < MIN_ANCHORED_RECORDS:
+        return []
+    
+    # id(элемента) -> число ФИО в нем
+    names_inside: Dict[int, int] = {}
+    
+    def names(node: Any) -> int:
+        if id(node) not in names_inside:
+            names_inside[id(node)] = _name_count(doc, node)
+        return names_inside[id(node)]
+    
+    # Элементы на пути от адресов вверх: такие соседи не считаются записями без адреса
+    anchored = set()
+    blocks = []
+    block_ids = set()
+    seen_nodes = set()
+    
+    for _, node in hits:
+        if id(node) in seen_nodes:
+            continue
+        seen_nodes.add(id(node))
+        
+        current = node
+        while current is not None and doc.tag(current) not in STOP_TAGS:
+            anchored.add(id(current))
+            count = names(current)
+            if count > 1:
+                break
+            if count == 1:
+                # Обертки из одного элемента относятся к той же записи
+                parent = doc.parent(current)
+                while (
+                    parent is not None and doc.tag(parent) not in STOP_TAGS
+                    and len(doc.children(parent)) == 1
+                ):
+                    anchored.add(id(parent))
+                    current, parent = parent, doc.parent(parent)
+                if id(current) not in block_ids:
+                    block_ids.add(id(current))
+                    blocks.append(current)
+                break
+            current = doc.parent(current)
+    
+    if len(blocks) < MIN_ANCHORED_RECORDS:
+        return []
+    
+    # Однотипные соседи подтверждают шаблон списка, в том числе для записей без адреса
+    records = []
+    record_ids = set()
+    # id(родителя) -> [родитель, признаки блоков-записей среди его детей]
+    parents: Dict[int, List[Any]] = {}
+    for block in blocks:
+        parent = doc.parent(block)
+        if parent is not None:
+            parents.setdefault(id(parent), [parent, set()])[1].add(_sibling_key(doc, block))
+    
+    for parent, keys in parents.values():
+        for child in doc.children(parent):
+            if id(child) in record_ids:
+                continue
+            if id(child) in block_ids or (
+                _sibling_key(doc, child) in keys
+                and id(child) not in anchored
+                and names(child) == 1
+            ):
+                record_ids.add(id(child))
+                records.append(child)
+    
+    return records
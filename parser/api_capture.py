@@ -0,0 +1,227 @@
+"""
+Перехват JSON API ответов при рендеринге и извлечение из них сотрудников
+"""
+
+import asyncio
+import time
+from typing import List, Dict, Any, Optional, Tuple
+from urllib.parse import urlparse, urldefrag
+from loguru import logger
+
+from utils.json_state import JsonStateFile
+
+
+# Синонимы полей (ключи сравниваются без регистра, '_' и '-')
+FIO_KEYS = ['fio', 'fullname', 'name', 'displayname', 'personname', 'employeename']
+LAST_NAME_KEYS = ['lastname', 'surname', 'familyname', 'familia', 'family']
+FIRST_NAME_KEYS = ['firstname', 'givenname', 'imya', 'forename']
+MIDDLE_NAME_KEYS = ['middlename', 'patronymic', 'secondname', 'otchestvo']
+EMAIL_KEYS = ['email', 'mail', 'email1', 'emails', 'contactemail', 'workemail']
+POSITION_KEYS = [
+    'position', 'positions', 'post', 'posts', 'jobtitle', 'job', 'dolzhnost',
+    'role', 'rank', 'title', 'appointment'
+]
+PHONE_KEYS = ['phone', 'phones', 'telephone', 'tel', 'workphone']
+
+# Максимальный размер JSON ответа, который имеет смысл разбирать
+MAX_JSON_BYTES = 5 * 1024 * 1024
+
+
+def _normalize_key(key: str) -> str:
+    return str(key).lower().replace('_', '').replace('-', '')
+
+
+def _find_value(item: Dict[str, Any], keys: List[str]) -> Any:
+    """Значение первого найденного поля из списка синонимов"""
+    normalized = {_normalize_key(k): v for k, v in item.items()}
+    for key in keys:
+        value = normalized.get(key)
+        if value not in (None, '', [], {}):
+            return value
+    return None
+
+
+def _as_text(value: Any) -> Optional[str]:
+    """Приведение значения поля к строке (списки и вложенные объекты)"""
+    if value is None:
+        return None
+    if isinstance(value, list):
+        parts = [_as_text(v) for v in value]
+        parts = [p for p in parts if p]
+        return ', '.join(parts) if parts else None
+    if isinstance(value, dict):
+        return _as_text(_find_value(value, ['name', 'title', 'value', 'email', 'number']))
+    text = str(value).strip()
+    return text or None
+
+
+def map_api_item(item: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    """Преобразование объекта API в поля записи о сотруднике"""
+    fio = _as_text(_find_value(item, FIO_KEYS))
+    if not fio:
+        parts = [
+            _as_text(_find_value(item, LAST_NAME_KEYS)),
+            _as_text(_find_value(item, FIRST_NAME_KEYS)),
+            _as_text(_find_value(item, MIDDLE_NAME_KEYS)),
+        ]
+        fio = ' '.join(p for p in parts if p) or None
+    
+    email = _as_text(_find_value(item, EMAIL_KEYS))
+    if email:
+        email = email.split(',')[0].replace('mailto:', '').strip()
+    
+    return {
+        'fio': fio,
+        'email': email,
+        'position': _as_text(_find_value(item, POSITION_KEYS)),
+        'phone': _as_text(_find_value(item, PHONE_KEYS)),
+    }
+
+
+def looks_like_people_list(value: Any, min_items: int = 2) -> bool:
+    """Массив объектов, большинство из которых похожи на людей"""
+    if not isinstance(value, list) or len(value) < min_items:
+        return False
+    
+    dicts = [v for v in value if isinstance(v, dict)]
+    if len(dicts) < max(min_items, len(value) // 2):
+        return False
+    
+    sample = dicts[:20]
+    people = 0
+    for item in sample:
+        mapped = map_api_item(item)
+        if mapped['fio'] and (mapped['email'] or mapped['position']):
+            people += 1
+    
+    return people >= max(1, len(sample) // 2)
+
+
+def find_people_lists(data: Any, max_depth: int = 5) -> List[List[Dict[str, Any]]]:
+    """Поиск списков людей в произвольной JSON структуре"""
+    found = []
+    
+    def walk(value: Any, depth: int):
+        if depth > max_depth:
+            return
+        if looks_like_people_list(value):
+            found.append([v for v in value if isinstance(v, dict)])
+            return
+        if isinstance(value, dict):
+            for child in value.values():
+                walk(child, depth + 1)
+        elif isinstance(value, list):
+            for child in value[:50]:
+                walk(child, depth + 1)
+    
+    walk(data, 0)
+    return found
+
+
+class JsonResponseCollector:
+    """Сбор JSON ответов XHR/fetch запросов страницы"""
+    
+    def __init__(self, max_bytes: int = MAX_JSON_BYTES):
+        self.max_bytes = max_bytes
+        self.responses: List[Tuple[str, str, Any]] = []
+        self._pending = set()
+    
+    def attach(self, page):
+        """Подписка на ответы страницы"""
+        page.on('response', self._on_response)
+    
+    def _on_response(self, response):
+        request = response.request
+        if request.resource_type not in ('xhr', 'fetch'):
+            return
+        if 'json' not in response.headers.get('content-type', ''):
+            return
+        try:
+            if int(response.headers.get('content-length', 0)) > self.max_bytes:
+                return
+        except ValueError:
+            pass
+        
+        task = asyncio.ensure_future(self._read(response))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+    
+    async def _read(self, response):
+        try:
+            data = await response.json()
+            self.responses.append((response.url, response.request.method, data))
+        except Exception as e:
+            logger.debug(f"Не удалось прочитать JSON ответ {response.url}: {e}")
+    
+    async def collect(self) -> List[Tuple[str, str, Any]]:
+        """Ожидание чтения всех начатых ответов"""
+        if self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+        return self.responses
+
+
+class ApiEndpointStore:
+    """Запомненные JSON API со списками сотрудников по доменам"""
+    
+    def __init__(self, path: str = 'data/api_endpoints.json', max_failures: int = 3):
+        self.state = JsonStateFile(path)
+        self.max_failures = max_failures
+        self.domains = self.state.load()
+    
+    @staticmethod
+    def _page_key(page_url: str) -> Tuple[str, str]:
+        url, _ = urldefrag(page_url)
+        return urlparse(url).netloc, url
+    
+    def lookup(self, page_url: str) -> List[str]:
+        """Известные endpoint'ы страницы (пустой список — нет)"""
+        domain, key = self._page_key(page_url)
+        entry = self.domains.get(domain, {}).get(key)
+        if not entry:
+            return []
+        # Записи старого формата хранили один endpoint
+        return entry.get('endpoints') or [entry['endpoint']]
+    
+    def remember(self, page_url: str, endpoints: List[str], records: int):
+        """Запомнить все endpoint'ы, вместе отдавшие список сотрудников страницы
+        
+        Пагинация и догрузка списка дают несколько запросов (?page=1, ?page=2, ...):
+        прямой запрос страницы повторяет их все.
+        """
+        domain, key = self._page_key(page_url)
+        self.domains.setdefault(domain, {})[key] = {
+            'endpoints': list(dict.fromkeys(endpoints)),
+            'records': records,
+            'failures': 0,
+            'updated_at': time.time()
+        }
+    
+    def forget(self, page_url: str):
+        """Удалить endpoint'ы страницы"""
+        domain, key = self._page_key(page_url)
+        self.domains.get(domain, {}).pop(key, None)
+    
+    def report_failure(self, page_url: str):
+        """Учет неудачного прямого запроса; после нескольких — забываем endpoint"""
+        domain, key = self._page_key(page_url)
+        entry = self.domains.get(domain, {}).get(key)
+        if not entry:
+            return
+        entry['failures'] += 1
+        if entry['failures'] >= self.max_failures:
+            logger.info(f"Забываем API endpoint'ы {self.lookup(page_url)} для {page_url}")
+            del self.domains[domain][key]
+    
+    def save(self):
+        """Сохранение на диск"""
+        self.state.save(self.domains)
+
+
+_stores: Dict[str, ApiEndpointStore] = {}
+
+
+def get_api_endpoint_store(path: str = 'data/api_endpoints.json') -> ApiEndpointStore:
+    """Общее для процесса хранилище endpoint'ов (одно на файл)"""
+    if path not in _stores:
+        _stores[path] = ApiEndpointStore(path)
+    return _stores[path]
@@ -3,33 +3,129 @@
 """
 
 import asyncio
+import contextlib
 import time
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Awaitable
 from urllib.parse import urljoin, urlparse
 from loguru import logger
 
 import requests
-from bs4 import BeautifulSoup
 from playwright.async_api import async_playwright
 
+from parser.render import (
+    RenderProfile, install_request_interception, new_render_stats, wait_for_dom_ready,
+    extract_candidate_blocks, expand_listing, payload_chars, PAGE_HTML_SCRIPT
+)
+from parser.candidates import count_records
+from parser.boilerplate import TemplateDetector, strip_non_content
+from parser.charset import get_charset_detector
+from parser.dom import DomDocument, as_document, get_dom_backend
+from parser.fetch import (
+    DEFAULT_MAX_RESPONSE_BYTES, HTML_CONTENT_TYPES, JSON_CONTENT_TYPES, ResponseRejected, fetch_limited
+)
+from parser.api_capture import JsonResponseCollector, find_people_lists, get_api_endpoint_store
+from parser.names import get_name_service
+from parser.pagination import find_pagination_links
+from parser.resilience import RetryPolicy, CircuitOpenError, get_circuit_breaker
+from parser.render_policy import get_render_decision_store, DECISION_HTML, DECISION_RENDER
+from parser.scheduler import HostLimiter, get_host_scheduler
+from parser.robots import get_robots_service
+from parser.sitemap import SKIPPED_EXTENSIONS, get_sitemap_discovery
+
 
 class BaseParser(ABC):
     """Базовый класс для парсеров"""
     
+    # CSS селекторы контейнеров с данными о сотрудниках (для извлечения в браузере)
+    container_selectors: List[str] = []
+    
     def __init__(
         self,
         rate_limit_delay: float = 2.0,
         max_depth: int = 2,
         js_render_timeout: int = 30,
         parsing_timeout: int = 120,
-        confidence_threshold: float = 0.6
+        confidence_threshold: float = 0.6,
+        speculative_render: bool = True,
+        min_page_results: int = 3,
+        learn_render_decision: bool = True,
+        render_profile: Optional[RenderProfile] = None,
+        in_browser_extraction: bool = True,
+        capture_api: bool = True,
+        max_pagination_pages: int = 20,
+        max_load_more_steps: int = 10,
+        max_host_concurrency: int = 4,
+        max_concurrent_renders: int = 2,
+        enrich_profiles: bool = False,
+        max_profile_pages: int = 200,
+        use_sitemaps: bool = True,
+        max_sitemap_pages: int = 10,
+        respect_robots: bool = True,
+        max_crawl_delay: float = 30.0,
+        shared_scheduler: bool = True,
+        max_retries: int = 3,
+        circuit_breaker: bool = True,
+        dom_backend: str = 'lxml',
+        max_response_bytes: int = DEFAULT_MAX_RESPONSE_BYTES,
+        remove_boilerplate: bool = True
     ):
         self.rate_limit_delay = rate_limit_delay
         self.max_depth = max_depth
         self.js_render_timeout = js_render_timeout
         self.parsing_timeout = parsing_timeout
         self.confidence_threshold = confidence_threshold
+        self.speculative_render = speculative_render
+        self.min_page_results = min_page_results
+        self.learn_render_decision = learn_render_decision
+        self.render_profile = render_profile or RenderProfile()
+        self.in_browser_extraction = in_browser_extraction
+        self.capture_api = capture_api
+        self.max_pagination_pages = max_pagination_pages
+        self.max_load_more_steps = max_load_more_steps
+        self.enrich_profiles = enrich_profiles
+        self.max_profile_pages = max_profile_pages
+        self.max_sitemap_pages = max_sitemap_pages
+        self.max_crawl_delay = max_crawl_delay
+        self.max_response_bytes = max_response_bytes
+        # Вежливость по хостам (в задаче и общая для всех задач процесса)
+        # и ограничение числа одновременных браузеров
+        self.host_limiter = HostLimiter(
+            rate_limit_delay, max_host_concurrency,
+            get_host_scheduler() if shared_scheduler else None, job_id=id(self)
+        )
+        self._render_slots = asyncio.Semaphore(max_concurrent_renders)
+        # Браузер и контекст открываются один раз на задачу
+        self._playwright = None
+        self._browser = None
+        self._browser_context = None
+        self._browser_lock = asyncio.Lock()
+        # Найденные страницы пагинации по URL страницы
+        self._pagination_links: Dict[str, List[str]] = {}
+        # Хосты, страницы которых по эвристикам рендерятся через JS
+        self._js_driven_hosts = set()
+        # Обучаемые решения о рендеринге и статистика обхода
+        self.render_decisions = get_render_decision_store() if learn_render_decision else None
+        # Запомненные JSON API со списками сотрудников
+        self.api_endpoints = get_api_endpoint_store() if capture_api else None
+        # Страницы сотрудников из sitemap (кэш по доменам)
+        self.sitemaps = get_sitemap_discovery() if use_sitemaps else None
+        # Правила robots.txt (кэш по хостам общий для процесса)
+        self.robots = get_robots_service() if respect_robots else None
+        self._crawl_delay_hosts = set()
+        # Повторы при временных сбоях и отключение недоступных хостов
+        self.retry_policy = RetryPolicy(max_attempts=max_retries)
+        self.breaker = get_circuit_breaker() if circuit_breaker else None
+        # Последняя ошибка загрузки по URL страницы (для отчета о неполных результатах)
+        self._page_errors: Dict[str, str] = {}
+        self.crawl_stats = self._new_crawl_stats()
+        # Записи последнего обхода после дедупликации, без фильтра по confidence_threshold
+        self.candidates: List[Dict[str, Any]] = []
+        # Кодировки страниц по хостам и разбор HTML (lxml или BeautifulSoup)
+        self.charsets = get_charset_detector()
+        self.dom = get_dom_backend(dom_backend)
+        # Повторяющиеся на страницах обхода блоки (меню, подвал, боковые панели)
+        self.templates = TemplateDetector() if remove_boilerplate else None
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
@@ -41,41 +137,146 @@ class BaseParser(ABC):
         
         start_time = time.time()
         results = []
+        self.crawl_stats = self._new_crawl_stats()
+        self.candidates = []
+        self._page_errors = {}
         
         try:
             # Получаем страницы для парсинга
             pages_to_parse = await self._get_pages_to_parse(url)
             
-            for page_url in pages_to_parse:
-                if time.time() - start_time > self.parsing_timeout:
-                    logger.warning(f"Превышен таймаут парсинга: {self.parsing_timeout} сек")
-                    break
-                
-                # Парсим страницу
-                page_results = await self._parse_page(page_url)
-                results.extend(page_results)
-                
-                # Соблюдаем rate limit
-                await asyncio.sleep(self.rate_limit_delay)
+            # Парсим страницы параллельно (rate limit соблюдает host_limiter)
+            results = await self._crawl(pages_to_parse, start_time)
             
-            # Дедупликация и валидация результатов
-            results = await self._deduplicate_and_validate(results)
+            # Дедупликация, дозаполнение из профилей и фильтрация
+            results = self._deduplicate(results)
+            if self.enrich_profiles:
+                await self._enrich_records(results, start_time)
+            # Кандидаты до фильтрации: смена порога не требует повторного обхода
+            self.candidates = results
+            results = self._filter_by_confidence(results)
             
             logger.info(f"Парсинг завершен. Найдено {len(results)} записей")
+            if self.crawl_stats['failed_pages']:
+                logger.warning(
+                    f"Неполный результат: не загружено {len(self.crawl_stats['failed_pages'])} страниц, "
+                    f"недоступные хосты: {self.crawl_stats['circuit_open_hosts']}"
+                )
+            # Кэши имен общие для процесса: доля попаданий накопительная
+            self.crawl_stats['name_cache'] = get_name_service().cache_stats()
+            logger.info(f"Статистика обхода: {self.crawl_stats}")
             return results
             
         except Exception as e:
             logger.error(f"Ошибка при парсинге {url}: {e}")
             raise
+        
+        finally:
+            await self.close_browser()
+            if self.render_decisions:
+                self.render_decisions.save()
+            if self.api_endpoints:
+                self.api_endpoints.save()
+            if self.host_limiter.scheduler:
+                self.host_limiter.scheduler.save()
+    
+    def _new_crawl_stats(self) -> Dict[str, Any]:
+        """Пустая статистика обхода"""
+        return {
+            'pages_parsed': 0,
+            'html_only': 0,
+            'rendered': 0,
+            'render_decisions': {},
+            'render_pages': {},
+            'render_bytes_saved': 0,
+            'api_direct': 0,
+            'api_captured': 0,
+            'pagination_pages': 0,
+            'load_more_steps': 0,
+            'profiles_fetched': 0,
+            'profiles_enriched': 0,
+            'sitemap_pages': 0,
+            'robots_blocked': 0,
+            'retries': 0,
+            'failed_pages': {},
+            'circuit_open_hosts': [],
+            'truncated_pages': 0,
+            'rejected_responses': 0,
+            'template_blocks_removed': 0,
+            'email_anchored_pages': 0,
+            'staff_tables': 0,
+            'name_cache': {}
+        }
+    
+    def get_crawl_stats(self) -> Dict[str, Any]:
+        """Статистика последнего обхода"""
+        return self.crawl_stats
+    
+    def get_candidates(self) -> List[Dict[str, Any]]:
+        """Кандидаты последнего обхода до фильтрации по порогу"""
+        return self.candidates
+    
+    async def _crawl(self, seed_pages: List[str], start_time: float) -> List[Dict[str, Any]]:
+        """Параллельный обход страниц с догрузкой найденной пагинации"""
+        results = []
+        seen = set(seed_pages)
+        pagination_budget = self.max_pagination_pages
+        pending = {asyncio.create_task(self._parse_page(page_url)): page_url for page_url in seed_pages}
+        
+        try:
+            while pending:
+                remaining = self.parsing_timeout - (time.time() - start_time)
+                if remaining <= 0:
+                    logger.warning(f"Превышен таймаут парсинга: {self.parsing_timeout} сек")
+                    break
+                
+                done, _ = await asyncio.wait(
+                    pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+                
+                for task in done:
+                    page_url = pending.pop(task)
+                    results.extend(task.result())
+                    
+                    # Соседние страницы списка обходим в рамках бюджета
+                    for sibling in self._pagination_links.pop(page_url, []):
+                        if sibling in seen or pagination_budget <= 0:
+                            continue
+                        seen.add(sibling)
+                        pagination_budget -= 1
+                        self.crawl_stats['pagination_pages'] += 1
+                        pending[asyncio.create_task(self._parse_page(sibling))] = sibling
+        finally:
+            for task in pending:
+                await self._cancel_task(task)
+        
+        return results
+    
+    def _discover_pagination(self, anchors: List[Any], url: str):
+        """Запоминание ссылок на соседние страницы списка"""
+        if self.max_pagination_pages <= 0:
+            return
+        
+        links = find_pagination_links(anchors, url, self.max_pagination_pages)
+        if links:
+            known = self._pagination_links.setdefault(url, [])
+            known.extend(link for link in links if link not in known)
     
     async def _get_pages_to_parse(self, url: str) -> List[str]:
         """Получение списка страниц для парсинга"""
         pages = [url]
         
         try:
+            # Для корня сайта сразу берем страницы сотрудников из sitemap
+            if self.sitemaps and self._is_site_root(url):
+                sitemap_pages = await self._find_sitemap_pages(url)
+                pages.extend(sitemap_pages)
+                self.crawl_stats['sitemap_pages'] = len(sitemap_pages)
+            
             # Пробуем найти дополнительные страницы
-            if self.max_depth > 1:
+            if self.max_depth > 1 and await self._allowed_by_robots(url):
                 additional_pages = await self._find_additional_pages(url)
+                additional_pages = [p for p in additional_pages if p not in pages]
                 pages.extend(additional_pages[:self.max_depth - 1])
             
             return pages
@@ -83,16 +284,62 @@ class BaseParser(ABC):
             logger.warning(f"Не удалось найти дополнительные страницы: {e}")
             return pages
     
+    @staticmethod
+    def _is_site_root(url: str) -> bool:
+        """URL указывает на главную страницу сайта"""
+        parsed = urlparse(url)
+        return parsed.path in ('', '/') and not parsed.query
+    
+    async def _find_sitemap_pages(self, base_url: str) -> List[str]:
+        """Страницы сотрудников из sitemap сайта"""
+        try:
+            # Директивы Sitemap: берем из уже загруженного robots.txt
+            sitemap_urls = None
+            if self.robots:
+                sitemap_urls = (await self.robots.get_rules(base_url, self.host_limiter)).sitemaps
+            
+            urls = await self.sitemaps.discover(self.session, base_url, sitemap_urls, self.host_limiter.slot)
+            return [u for u in urls if u != base_url][:self.max_sitemap_pages]
+        except Exception as e:
+            logger.warning(f"Ошибка при поиске страниц в sitemap: {e}")
+            return []
+    
+    async def _allowed_by_robots(self, url: str) -> bool:
+        """Проверка URL по robots.txt; Crawl-delay хоста передается в host_limiter"""
+        if not self.robots:
+            return True
+        
+        try:
+            rules = await self.robots.get_rules(url, self.host_limiter)
+        except Exception as e:
+            logger.warning(f"Ошибка проверки robots.txt для {url}: {e}")
+            return True
+        
+        host = urlparse(url).netloc
+        if host not in self._crawl_delay_hosts:
+            self._crawl_delay_hosts.add(host)
+            delay = rules.crawl_delay(self.robots.user_agent)
+            if delay:
+                if delay > self.max_crawl_delay:
+                    logger.warning(f"Crawl-delay {delay} сек для {host} ограничен до {self.max_crawl_delay} сек")
+                self.host_limiter.set_min_interval(url, min(delay, self.max_crawl_delay))
+        
+        if rules.can_fetch(url, self.robots.user_agent):
+            return True
+        
+        logger.info(f"Страница запрещена в robots.txt: {url}")
+        self.crawl_stats['robots_blocked'] += 1
+        return False
+    
     async def _find_additional_pages(self, base_url: str) -> List[str]:
         """Поиск дополнительных страниц для парсинга"""
         additional_pages = []
         
         try:
             # Получаем HTML страницы
-            response = self.session.get(base_url, timeout=30)
-            response.raise_for_status()
+            content = await self._fetch_html(base_url)
             
-            soup = BeautifulSoup(response.content, 'html.parser')
+            doc = self.dom.parse(content)
             
             # Ищем ссылки на страницы сотрудников
             staff_keywords = [
@@ -101,9 +348,8 @@ class BaseParser(ABC):
                 'about/structure', 'structure', 'team'
             ]
             
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                text = link.get_text().lower()
+            for href, text in doc.links():
+                text = text.lower()
                 
                 # Проверяем, содержит ли ссылка ключевые слова
                 if any(keyword in text or keyword in href.lower() for keyword in staff_keywords):
@@ -111,6 +357,11 @@ class BaseParser(ABC):
                     if self._is_valid_internal_url(full_url, base_url):
                         additional_pages.append(full_url)
             
+            # Стартовая страница задает шаблон сайта для остальных страниц обхода
+            if self.templates:
+                strip_non_content(doc)
+                self.templates.observe(doc, base_url)
+            
             return list(set(additional_pages))  # Убираем дубликаты
             
         except Exception as e:
@@ -126,7 +377,7 @@ class BaseParser(ABC):
             return (
                 parsed_url.netloc == parsed_base.netloc and
                 parsed_url.scheme in ['http', 'https'] and
-                not any(ext in url.lower() for ext in ['.pdf', '.doc', '.docx', '.jpg', '.png', '.gif'])
+                not parsed_url.path.lower().endswith(SKIPPED_EXTENSIONS)
             )
         except:
             return False
@@ -135,86 +386,633 @@ class BaseParser(ABC):
         """Парсинг отдельной страницы"""
         logger.info(f"Парсинг страницы: {url}")
         
+        if not await self._allowed_by_robots(url):
+            return []
+        self.crawl_stats['pages_parsed'] += 1
+        
+        results = await self._parse_page_content(url)
+        
+        # Страница без результатов из-за ошибок загрузки попадает в отчет
+        error = self._page_errors.pop(url, None)
+        if not results and error:
+            self.crawl_stats['failed_pages'][url] = error
+        return results
+    
+    async def _parse_page_content(self, url: str) -> List[Dict[str, Any]]:
+        """Выбор способа загрузки страницы и извлечение данных"""
         try:
+            # Известный JSON API заменяет и HTML, и рендеринг одним запросом
+            api_results = await self._parse_known_api(url)
+            if api_results:
+                self.crawl_stats['api_direct'] += 1
+                return api_results
+            
+            # Выученное для домена решение позволяет сразу выбрать нужный путь
+            decision = self._get_render_decision(url)
+            if decision == DECISION_RENDER:
+                self.crawl_stats['rendered'] += 1
+                return await self._parse_js_page(url)
+            if decision == DECISION_HTML:
+                self.crawl_stats['html_only'] += 1
+                return await self._parse_html_page(url)
+            
+            if self.speculative_render:
+                return await self._parse_page_speculative(url)
+            
             # Сначала пробуем простой HTML парсинг
             results = await self._parse_html_page(url)
             
-            # Если результатов мало, пробуем JS рендеринг
-            if len(results) < 3:
-                logger.info(f"Мало результатов HTML парсинга ({len(results)}), пробуем JS рендеринг")
+            # Если записей мало (фрагменты без ФИО не в счет), пробуем JS рендеринг
+            record_count = count_records(results)
+            if record_count < self.min_page_results:
+                logger.info(f"Мало результатов HTML парсинга ({record_count}), пробуем JS рендеринг")
                 js_results = await self._parse_js_page(url)
-                results.extend(js_results)
+                merged = self._merge_page_results(results, js_results)
+                self._record_render_observation(url, results, merged)
+                return merged
             
+            self._record_render_observation(url, results, results)
             return results
             
         except Exception as e:
             logger.error(f"Ошибка при парсинге страницы {url}: {e}")
+            self._note_page_error(url, e)
             return []
     
+    async def _parse_page_speculative(self, url: str) -> List[Dict[str, Any]]:
+        """Параллельный HTML парсинг и JS рендеринг, побеждает первый хороший результат"""
+        host = urlparse(url).netloc
+        render_task = None
+        
+        # Для хостов, уже признанных JS-сайтами, рендер стартует сразу
+        if host in self._js_driven_hosts:
+            render_task = asyncio.create_task(self._parse_js_page(url))
+        
+        try:
+            html_results = []
+            try:
+                content = await self._fetch_html(url)
+                doc = self.dom.parse(content)
+                self._discover_pagination(doc.page_anchors(), url)
+                
+                if render_task is None and self._looks_js_driven(doc):
+                    logger.info(f"Страница похожа на JS-приложение, запускаем рендеринг параллельно: {url}")
+                    self._js_driven_hosts.add(host)
+                    render_task = asyncio.create_task(self._parse_js_page(url))
+                
+                html_results = await self._extract_staff_data(doc, url)
+            except Exception as e:
+                logger.error(f"Ошибка HTML парсинга {url}: {e}")
+                self._note_page_error(url, e)
+                if isinstance(e, CircuitOpenError):
+                    return []
+            
+            if render_task is None:
+                record_count = count_records(html_results)
+                if record_count >= self.min_page_results:
+                    self._record_render_observation(url, html_results, html_results)
+                    return html_results
+                logger.info(f"Мало результатов HTML парсинга ({record_count}), пробуем JS рендеринг")
+                render_task = asyncio.create_task(self._parse_js_page(url))
+            elif self._meets_quality_bar(html_results):
+                logger.info(f"HTML результат достаточен, отменяем JS рендеринг: {url}")
+                await self._cancel_task(render_task)
+                self._record_render_observation(url, html_results, html_results)
+                return html_results
+            
+            js_results = await render_task
+            merged = self._merge_page_results(html_results, js_results)
+            self._record_render_observation(url, html_results, merged)
+            return merged
+            
+        finally:
+            if render_task is not None and not render_task.done():
+                await self._cancel_task(render_task)
+    
+    def _get_render_decision(self, url: str) -> Optional[str]:
+        """Выученное решение о рендеринге (None — определить заново)"""
+        if not self.render_decisions:
+            return None
+        
+        snapshot = self.render_decisions.snapshot(url)
+        self.crawl_stats['render_decisions'][snapshot['pattern']] = snapshot
+        
+        if not snapshot['decision']:
+            return None
+        
+        explore = self.render_decisions.should_explore(url)
+        self.render_decisions.count_decided_page(url)
+        if explore:
+            logger.debug(f"Перепроверка решения о рендеринге для {url}")
+            return None
+        
+        return snapshot['decision']
+    
+    def _record_render_observation(
+        self,
+        url: str,
+        html_results: List[Dict[str, Any]],
+        merged_results: List[Dict[str, Any]]
+    ):
+        """Учет того, добавил ли JS рендеринг записи к HTML результату"""
+        if merged_results is html_results:
+            self.crawl_stats['html_only'] += 1
+        else:
+            self.crawl_stats['rendered'] += 1
+        
+        if self.render_decisions:
+            html_count = count_records(html_results)
+            render_added = max(0, count_records(merged_results) - html_count)
+            self.render_decisions.record(url, html_count, render_added)
+    
+    def _looks_js_driven(self, doc: DomDocument) -> bool:
+        """Эвристика: страница отрисовывается на клиенте через JS"""
+        doc = as_document(doc)
+        text_nodes = doc.body_strings()
+        if text_nodes is None:
+            return True
+        
+        text_length = sum(len(s) for s in text_nodes)
+        
+        # Пустое тело страницы
+        if text_length < 200:
+            return True
+        
+        # Корневой контейнер фреймворка (React, Vue, Next, Nuxt, Angular)
+        framework_root = doc.select(
+            '#root, #app, #__next, #__nuxt, [data-reactroot], [ng-app], [ng-version], app-root'
+        )
+        if framework_root and len(text_nodes) < 50:
+            return True
+        
+        # Слишком мало текстовых узлов
+        return len(text_nodes) < 15
+    
+    def _meets_quality_bar(self, results: List[Dict[str, Any]]) -> bool:
+        """Проверка, что HTML результат достаточно хорош, чтобы не ждать рендеринга"""
+        confident = [
+            r for r in results
+            if r.get('confidence', 0) >= self.confidence_threshold
+        ]
+        return len(confident) >= self.min_page_results
+    
+    def _merge_page_results(
+        self,
+        html_results: List[Dict[str, Any]],
+        js_results: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Объединение результатов HTML и JS парсинга одной страницы"""
+        merged = {}
+        
+        for result in html_results + js_results:
+            key = (result.get('email') or '').lower() or (result.get('fio') or '').lower()
+            if not key:
+                continue
+            
+            existing = merged.get(key)
+            if existing is None or result.get('confidence', 0) > existing.get('confidence', 0):
+                merged[key] = result
+        
+        return list(merged.values())
+    
+    async def _cancel_task(self, task: asyncio.Task):
+        """Отмена задачи с ожиданием освобождения ресурсов"""
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError, Exception):
+            await task
+    
+    async def _with_retries(self, url: str, operation):
+        """Выполнение идемпотентной операции с повторами и учетом состояния хоста
+        
+        Выключатель проверяется один раз перед операцией (пробный запрос
+        полуоткрытого хоста тоже получает свои повторы), а сбой учитывается
+        один раз — когда повторы исчерпаны.
+        """
+        attempts = self.retry_policy.max_attempts
+        if self.breaker:
+            self.breaker.check(url)
+        
+        for attempt in range(attempts):
+            try:
+                result = await operation()
+            except Exception as e:
+                if not self.retry_policy.is_retryable(e):
+                    raise
+                if attempt + 1 >= attempts:
+                    if self.breaker:
+                        self.breaker.record_failure(url)
+                    raise
+                
+                delay = self.retry_policy.backoff(attempt)
+                self.crawl_stats['retries'] += 1
+                logger.info(f"Повтор {attempt + 1}/{attempts - 1} для {url} через {delay:.1f} сек: {e}")
+                await asyncio.sleep(delay)
+                continue
+            
+            if self.breaker:
+                self.breaker.record_success(url)
+            return result
+    
+    def _note_page_error(self, url: str, error: Exception):
+        """Запоминание ошибки загрузки страницы"""
+        self._page_errors[url] = str(error) or type(error).__name__
+        if isinstance(error, CircuitOpenError) and error.host not in self.crawl_stats['circuit_open_hosts']:
+            self.crawl_stats['circuit_open_hosts'].append(error.host)
+    
+    async def _http_get(self, url: str, **kwargs) -> requests.Response:
+        """GET запрос с повторами при временных сбоях"""
+        return await self._with_retries(url, lambda: self._http_get_once(url, **kwargs))
+    
+    async def _http_get_once(self, url: str, **kwargs) -> requests.Response:
+        """GET запрос через планировщик хостов с передачей ему задержки и статуса ответа
+        
+        Тело читается потоково не больше max_response_bytes, слот хоста
+        занят до конца чтения.
+        """
+        async with self.host_limiter.slot(url):
+            request_start = time.monotonic()
+            try:
+                response = await asyncio.to_thread(
+                    fetch_limited, self.session, url, self.max_response_bytes, **kwargs
+                )
+            except (requests.Timeout, requests.ConnectionError):
+                self.host_limiter.report(url, error=True)
+                raise
+            except ResponseRejected as e:
+                # Сервер ответил нормально, отклонено только содержимое
+                self.host_limiter.report(url, status=200, latency=time.monotonic() - request_start)
+                self.crawl_stats['rejected_responses'] += 1
+                logger.info(str(e))
+                raise
+            
+            self.host_limiter.report(
+                url,
+                status=response.status_code,
+                latency=time.monotonic() - request_start,
+                retry_after=response.headers.get('Retry-After')
+            )
+        
+        # Статусы перегрузки превращаем в ошибку, чтобы запрос был повторен
+        if response.status_code in self.retry_policy.retry_statuses:
+            response.raise_for_status()
+        return response
+    
+    async def _fetch_html(self, url: str) -> str:
+        """Загрузка HTML страницы без блокировки event loop
+        
+        Кодировка определяется один раз (заголовок, <meta charset>, кэш хоста),
+        и в DOM бэкенд передается уже декодированный текст.
+        """
+        response = await self._http_get(url, content_types=HTML_CONTENT_TYPES)
+        response.raise_for_status()
+        if response.truncated:
+            # Обрезанная страница все равно разбирается: списки сотрудников обычно в начале
+            self.crawl_stats['truncated_pages'] += 1
+            logger.warning(f"Страница {url} обрезана до {self.max_response_bytes} байт")
+        text, _ = self.charsets.decode(url, response.content, response.headers.get('Content-Type'))
+        return text
+    
     async def _parse_html_page(self, url: str) -> List[Dict[str, Any]]:
         """Парсинг HTML страницы без JS"""
         try:
-            response = self.session.get(url, timeout=30)
-            response.raise_for_status()
+            content = await self._fetch_html(url)
             
-            soup = BeautifulSoup(response.content, 'html.parser')
-            return await self._extract_staff_data(soup, url)
+            doc = self.dom.parse(content)
+            self._discover_pagination(doc.page_anchors(), url)
+            return await self._extract_staff_data(doc, url)
             
         except Exception as e:
             logger.error(f"Ошибка HTML парсинга {url}: {e}")
+            self._note_page_error(url, e)
             return []
     
     async def _parse_js_page(self, url: str) -> List[Dict[str, Any]]:
         """Парсинг страницы с JS рендерингом"""
         try:
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(headless=True)
-                page = await browser.new_page()
-                
-                # Устанавливаем таймаут
-                page.set_default_timeout(self.js_render_timeout * 1000)
-                
-                # Переходим на страницу
-                await page.goto(url, wait_until='networkidle')
+            render_stats = new_render_stats()
+            self.crawl_stats['render_pages'][url] = render_stats
+            
+            # Число браузеров и нагрузка на хост ограничены
+            async def render():
+                async with self._render_slots, self.host_limiter.slot(url):
+                    return await self._render_page(url, render_stats)
+            
+            results, html, captured = await self._with_retries(url, render)
+            
+            self.crawl_stats['render_bytes_saved'] += render_stats['bytes_saved']
+            logger.debug(
+                f"Рендеринг {url}: заблокировано {render_stats['blocked_requests']} запросов, "
+                f"сэкономлено ~{render_stats['bytes_saved'] // 1024} КБ"
+            )
+            
+            if html is not None:
+                # Парсим полученный HTML
+                doc = self.dom.parse(html)
+                self._discover_pagination(doc.page_anchors(), url)
+                results = await self._extract_staff_data(doc, url)
+            
+            api_results = self._records_from_captured_api(captured, url)
+            if api_results:
+                return self._merge_page_results(api_results, results)
+            return results
+        
+        except Exception as e:
+            logger.error(f"Ошибка JS парсинга {url}: {e}")
+            self._note_page_error(url, e)
+            return []
+    
+    async def _render_page(self, url: str, render_stats: Dict[str, Any], want_html: bool = False):
+        """Рендеринг страницы: записи из областей-кандидатов (или HTML) и перехваченные JSON ответы
+        
+        Области разбираются, пока страница открыта: HTML всей страницы
+        запрашивается вторым вызовом, только если они не дали записей.
+        """
+        results = None
+        html = None
+        
+        context = await self._get_browser_context()
+        page = await context.new_page()
+        try:
+            # Блокируем картинки, шрифты, стили и счетчики
+            await install_request_interception(page, self.render_profile, render_stats)
+            
+            # Записываем JSON ответы XHR/fetch запросов
+            collector = JsonResponseCollector()
+            if self.capture_api:
+                collector.attach(page)
+            
+            # Устанавливаем таймаут
+            page.set_default_timeout(self.js_render_timeout * 1000)
+            
+            # Переходим на страницу и ждем только DOMContentLoaded
+            render_start = time.monotonic()
+            try:
+                response = await page.goto(url, wait_until='domcontentloaded')
+            except Exception:
+                self.host_limiter.report(url, error=True)
+                raise
+            if response is not None:
+                # Время рендеринга несравнимо с HTTP запросами — передаем только статус
+                self.host_limiter.report(
+                    url, status=response.status, retry_after=response.headers.get('retry-after')
+                )
+            
+            # Дальше ждем, пока DOM затихнет или появятся данные сотрудников
+            remaining_ms = int(self.js_render_timeout * 1000 - (time.monotonic() - render_start) * 1000)
+            readiness = await wait_for_dom_ready(page, remaining_ms)
+            render_stats['ready_reason'] = readiness['reason']
+            
+            # Раскрываем "Показать ещё" и бесконечную прокрутку
+            if self.max_load_more_steps > 0:
+                deadline = render_start + self.js_render_timeout
+                steps = await expand_listing(page, self.max_load_more_steps, deadline)
+                render_stats['load_more_steps'] = steps
+                self.crawl_stats['load_more_steps'] += steps
+            
+            render_stats['render_ms'] = int((time.monotonic() - render_start) * 1000)
+            
+            if self.in_browser_extraction and self.container_selectors and not want_html:
+                # Собираем компактные описания кандидатов прямо в браузере
+                payload = await extract_candidate_blocks(page, self.container_selectors)
+                render_stats['extracted_blocks'] = len(payload['blocks']) + len(payload['tables'])
+                render_stats['transfer_chars'] = payload_chars(payload)
+                self._discover_pagination(payload.get('anchors', []), url)
                 
-                # Ждем загрузки контента
-                await page.wait_for_timeout(2000)
+                async def fetch_html() -> str:
+                    page_html = await page.evaluate(PAGE_HTML_SCRIPT)
+                    render_stats['transfer_chars'] += len(page_html)
+                    render_stats['page_html_fetched'] = True
+                    return page_html
                 
+                results = await self._extract_staff_from_blocks(payload, url, fetch_html)
+            else:
                 # Получаем HTML
                 html = await page.content()
-                await browser.close()
-                
-                # Парсим полученный HTML
-                soup = BeautifulSoup(html, 'html.parser')
-                return await self._extract_staff_data(soup, url)
-                
-        except Exception as e:
-            logger.error(f"Ошибка JS парсинга {url}: {e}")
+            
+            captured = await collector.collect()
+        finally:
+            await page.close()
+        
+        return results, html, captured
+    
+    async def _get_browser_context(self):
+        """Общий для задачи контекст браузера (запускается при первом рендеринге)"""
+        async with self._browser_lock:
+            if self._browser_context is None:
+                self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch(headless=True)
+                self._browser_context = await self._browser.new_context(
+                    user_agent=self.session.headers['User-Agent']
+                )
+        return self._browser_context
+    
+    async def close_browser(self):
+        """Закрытие браузера задачи"""
+        async with self._browser_lock:
+            try:
+                if self._browser is not None:
+                    await self._browser.close()
+                if self._playwright is not None:
+                    await self._playwright.stop()
+            except Exception as e:
+                logger.warning(f"Ошибка при закрытии браузера: {e}")
+            finally:
+                self._playwright = None
+                self._browser = None
+                self._browser_context = None
+    
+    async def _parse_known_api(self, url: str) -> List[Dict[str, Any]]:
+        """Прямой запрос к запомненным JSON API страницы без браузера
+        
+        Запрашиваются все endpoint'ы страницы (страницы списка, догрузка).
+        Если хотя бы один запрещен robots.txt, недоступен или не отдал людей,
+        страница обрабатывается обычным путем: частичный результат не подменяет полный.
+        """
+        if not self.api_endpoints:
+            return []
+        
+        endpoints = self.api_endpoints.lookup(url)
+        if not endpoints:
             return []
+        
+        for endpoint in endpoints:
+            if not await self._allowed_by_robots(endpoint):
+                return []
+        
+        results = []
+        for endpoint in endpoints:
+            try:
+                response = await self._http_get(
+                    endpoint, headers={'Accept': 'application/json'},
+                    content_types=JSON_CONTENT_TYPES, allow_truncated=False
+                )
+                response.raise_for_status()
+                
+                endpoint_results = []
+                for items in find_people_lists(response.json()):
+                    endpoint_results.extend(self._records_from_api_items(items, url))
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                logger.warning(f"Ошибка запроса к API {endpoint}: {e}")
+                endpoint_results = []
+            
+            if not endpoint_results:
+                self.api_endpoints.report_failure(url)
+                return []
+            results.extend(endpoint_results)
+        
+        logger.info(f"Данные получены напрямую из API ({len(endpoints)} запросов): {len(results)} записей")
+        return results
+    
+    def _records_from_captured_api(self, captured: List[Any], url: str) -> List[Dict[str, Any]]:
+        """Записи из JSON ответов, перехваченных при рендеринге"""
+        results = []
+        replayable = []
+        complete = True
+        
+        for endpoint, method, data in captured:
+            endpoint_results = []
+            for items in find_people_lists(data):
+                endpoint_results.extend(self._records_from_api_items(items, url))
+            
+            if not endpoint_results:
+                continue
+            
+            logger.info(f"Найден API со списком сотрудников: {endpoint} ({len(endpoint_results)} записей)")
+            self.crawl_stats['api_captured'] += 1
+            results.extend(endpoint_results)
+            
+            # Повторно вызывать без браузера можно только GET запросы
+            if method == 'GET':
+                replayable.append(endpoint)
+            else:
+                complete = False
+        
+        if self.api_endpoints:
+            # Прямой запрос допустим, только если он повторяет все источники людей страницы
+            if replayable and complete:
+                self.api_endpoints.remember(url, replayable, len(results))
+            elif not complete:
+                self.api_endpoints.forget(url)
+        
+        return results
+    
+    def _records_from_api_items(self, items: List[Dict[str, Any]], url: str) -> List[Dict[str, Any]]:
+        """Преобразование объектов JSON API в записи (в базовом парсере не поддерживается)"""
+        return []
     
     @abstractmethod
-    async def _extract_staff_data(self, soup: BeautifulSoup, url: str) -> List[Dict[str, Any]]:
-        """Извлечение данных о сотрудниках из HTML"""
+    async def _extract_staff_data(self, doc: DomDocument, url: str) -> List[Dict[str, Any]]:
+        """Извлечение данных о сотрудниках из разобранной страницы"""
         pass
     
+    def _strip_boilerplate(self, doc: DomDocument, url: str):
+        """Удаление script, style, nav и блоков шаблона сайта перед поиском контейнеров"""
+        if not self.templates:
+            return
+        strip_non_content(doc)
+        self.crawl_stats['template_blocks_removed'] += self.templates.strip(doc, url)
+    
+    async def _extract_staff_from_blocks(
+        self,
+        payload: Dict[str, Any],
+        url: str,
+        fetch_html: Optional[Callable[[], Awaitable[str]]] = None
+    ) -> List[Dict[str, Any]]:
+        """Извлечение данных из компактных описаний блоков, собранных в браузере
+        
+        Записи строятся прямо из текста, адресов и ссылок блоков, без разбора
+        HTML. Если блоки не дали полноценных записей или список обрезан,
+        разбирается HTML всей страницы из fetch_html.
+        """
+        results = self._records_from_blocks(payload, url)
+        if fetch_html and (payload.get('truncated') or not count_records(results)):
+            results = await self._extract_staff_data(self.dom.parse(await fetch_html()), url)
+        return results
+    
+    def _records_from_blocks(self, payload: Dict[str, Any], url: str) -> List[Dict[str, Any]]:
+        """Записи из блоков и таблиц, собранных в браузере (в базовом парсере не поддерживается)"""
+        return []
+    
+    async def _enrich_records(self, records: List[Dict[str, Any]], start_time: float):
+        """Дозаполнение неполных записей со страниц профилей сотрудников"""
+        candidates = [
+            r for r in records
+            if r.get('profile_url') and self._needs_enrichment(r)
+        ][:self.max_profile_pages]
+        
+        remaining = self.parsing_timeout - (time.time() - start_time)
+        if not candidates or remaining <= 0:
+            return
+        
+        logger.info(f"Дозаполнение {len(candidates)} записей со страниц профилей")
+        
+        # Параллельность по хосту ограничивает host_limiter, общий срок — таймаут парсинга
+        tasks = [asyncio.create_task(self._enrich_record(r)) for r in candidates]
+        done, pending = await asyncio.wait(tasks, timeout=remaining)
+        
+        for task in pending:
+            await self._cancel_task(task)
+        if pending:
+            logger.warning(f"Таймаут дозаполнения: не обработано {len(pending)} профилей")
+        
+        self.crawl_stats['profiles_enriched'] += sum(1 for task in done if task.result())
+    
+    def _needs_enrichment(self, record: Dict[str, Any]) -> bool:
+        """Не хватает ли в записи полей, которые бывают на странице профиля"""
+        return not (record.get('email') and record.get('position') and record.get('phone'))
+    
+    async def _enrich_record(self, record: Dict[str, Any]) -> bool:
+        """Загрузка страницы профиля и дозаполнение записи"""
+        url = record['profile_url']
+        if not await self._allowed_by_robots(url):
+            return False
+        self.crawl_stats['profiles_fetched'] += 1
+        
+        try:
+            # Для JS-сайтов используем уже открытый браузер задачи
+            if urlparse(url).netloc in self._js_driven_hosts:
+                async with self._render_slots, self.host_limiter.slot(url):
+                    _, html, _ = await self._render_page(url, new_render_stats(), want_html=True)
+            else:
+                html = await self._fetch_html(url)
+            
+            return self._enrich_from_profile(record, self.dom.parse(html))
+        
+        except Exception as e:
+            logger.debug(f"Не удалось загрузить профиль {url}: {e}")
+            return False
+    
+    def _enrich_from_profile(self, record: Dict[str, Any], doc: DomDocument) -> bool:
+        """Перенос полей со страницы профиля в запись (в базовом парсере не поддерживается)"""
+        return False
+    
     async def _deduplicate_and_validate(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Дедупликация и валидация результатов"""
+        return self._filter_by_confidence(self._deduplicate(results))
+    
+    def _deduplicate(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Дедупликация результатов"""
         # Дедупликация по email
         seen_emails = set()
         unique_results = []
         
         for result in results:
-            email = result.get('email', '').lower()
+            email = (result.get('email') or '').lower()
             if email and email not in seen_emails:
                 seen_emails.add(email)
                 unique_results.append(result)
             elif not email:
                 # Если нет email, проверяем по ФИО
-                fio = result.get('fio', '').lower()
-                if fio not in [r.get('fio', '').lower() for r in unique_results]:
+                fio = (result.get('fio') or '').lower()
+                if fio not in [(r.get('fio') or '').lower() for r in unique_results]:
                     unique_results.append(result)
         
-        # Фильтруем по confidence threshold
+        return unique_results
+    
+    def _filter_by_confidence(self, unique_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Фильтрация по confidence threshold"""
         filtered_results = [
             r for r in unique_results 
             if r.get('confidence', 0) >= self.confidence_threshold
@@ -0,0 +1,123 @@
+"""
+Удаление шаблона сайта (меню, боковые панели, подвал), повторяющегося на страницах обхода
+"""
+
+import hashlib
+from typing import List, Dict, Any, Tuple
+from urllib.parse import urlparse
+from loguru import logger
+
+from parser.dom import DomDocument
+
+
+# Поддеревья, которые никогда не содержат данных о сотрудниках
+NON_CONTENT_SELECTOR = 'script, style, noscript, template, nav'
+
+# Блоки, которые сравниваются между страницами
+BLOCK_TAGS = {'header', 'footer', 'aside', 'section', 'div', 'form', 'table', 'tr', 'ul', 'ol', 'li'}
+
+# Блоки с коротким текстом не запоминаются (пустые обертки, разделители)
+MIN_BLOCK_TEXT = 20
+
+
+def strip_non_content(doc: DomDocument) -> int:
+    """Удаление script, style и nav; возвращает число удаленных элементов"""
+    nodes = doc.select(NON_CONTENT_SELECTOR)
+    doc.remove(nodes)
+    return len(nodes)
+
+
+class TemplateDetector:
+    """Обучаемый на страницах одного обхода детектор повторяющихся блоков
+    
+    Блок — элемент из BLOCK_TAGS, отпечаток — хэш вложенности тегов и
+    нормализованного текста. Блок, встреченный на min_pages разных страницах
+    хоста, считается шаблоном и удаляется до поиска контейнеров. На странице,
+    где блок встретился впервые, он остается, поэтому данные из общего блока
+    (например, карточка заведующего в боковой панели) извлекаются один раз.
+    """
+    
+    def __init__(self, min_pages: int = 2, max_blocks_per_host: int = 50000):
+        self.min_pages = min_pages
+        self.max_blocks_per_host = max_blocks_per_host
+        # Хост -> отпечаток -> [первая страница, число страниц]
+        self._hosts: Dict[str, Dict[str, List[Any]]] = {}
+        # Страницы, уже учтенные для хоста
+        self._pages: Dict[str, set] = {}
+    
+    def _fingerprints(self, doc: DomDocument) -> List[Tuple[Any, str]]:
+        """Блоки страницы и их отпечатки за один обход документа
+        
+        Отпечаток считается снизу вверх: хэш тега, нормализованных строк
+        текста и отпечатков дочерних элементов, поэтому каждая строка и
+        каждый элемент обрабатываются один раз. Строки заголовков таблиц
+        (tr с th) повторяются на всех страницах со списками, но нужны для
+        разбора таблиц по столбцам и в блоки не попадают.
+        """
+        blocks = []
+        # Открытые элементы: [элемент, хэш, длина текста, есть ли дочерний th]
+        stack: List[List[Any]] = []
+        
+        for kind, value, _ in doc.walk():
+            if kind == 'start':
+                stack.append([value, hashlib.sha1(doc.tag(value).encode('utf-8')), 0, False])
+                continue
+            
+            if kind == 'text':
+                text = ' '.join(value.split()).lower() if value else ''
+                if text and stack:
+                    stack[-1][1].update(b'\x01' + text.encode('utf-8'))
+                    # Строки разделяются пробелом, как в тексте элемента
+                    stack[-1][2] += len(text) + 1
+                continue
+            
+            node, digest, length, has_header_cells = stack.pop()
+            tag = doc.tag(node)
+            digest = digest.digest()
+            if stack:
+                stack[-1][1].update(b'\x02' + digest)
+                stack[-1][2] += length
+                stack[-1][3] = stack[-1][3] or tag == 'th'
+            
+            if tag not in BLOCK_TAGS or length - 1 < MIN_BLOCK_TEXT:
+                continue
+            if tag == 'tr' and has_header_cells:
+                continue
+            blocks.append((node, digest.hex()))
+        
+        return blocks
+    
+    def _observe(self, blocks: List[Tuple[Any, str]], url: str):
+        """Учет блоков страницы (каждая страница учитывается один раз)"""
+        host = urlparse(url).netloc
+        pages = self._pages.setdefault(host, set())
+        if url in pages:
+            return
+        pages.add(url)
+        
+        seen = self._hosts.setdefault(host, {})
+        for digest in {digest for _, digest in blocks}:
+            entry = seen.get(digest)
+            if entry is not None:
+                entry[1] += 1
+            elif len(seen) < self.max_blocks_per_host:
+                seen[digest] = [url, 1]
+    
+    def observe(self, doc: DomDocument, url: str):
+        """Учет страницы без удаления (например, стартовой страницы при поиске ссылок)"""
+        self._observe(self._fingerprints(doc), url)
+    
+    def strip(self, doc: DomDocument, url: str) -> int:
+        """Учет страницы и удаление блоков шаблона; возвращает число удаленных блоков"""
+        blocks = self._fingerprints(doc)
+        self._observe(blocks, url)
+        
+        seen = self._hosts[urlparse(url).netloc]
+        template = [
+            node for node, digest in blocks
+            if digest in seen and seen[digest][1] >= self.min_pages and seen[digest][0] != url
+        ]
+        if template:
+            doc.remove(template)
+            logger.debug(f"Удалено блоков шаблона сайта на {url}: {len(template)}")
+        return len(template)
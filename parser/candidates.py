@@ -0,0 +1,63 @@
+"""
+Набор кандидатов обхода: записи после дедупликации и дозаполнения, до фильтрации по порогу
+
+Кандидаты хранятся в компактном виде (столбцы без HTML фрагментов, JSON в zlib),
+поэтому смена порога или пересчет оценок после изменения валидатора выполняются
+локально, без сети и браузера.
+"""
+
+import json
+import zlib
+from typing import Any, Dict, List, Optional
+
+from parser.validators import DataValidator
+
+
+# Записи ниже этой оценки не содержат ни одного распознанного поля и не сохраняются
+MIN_CANDIDATE_CONFIDENCE = 0.1
+
+# Полноценная запись о сотруднике: фрагменты ниже (только должность или только email)
+# хранятся как кандидаты, но не считаются результатом страницы
+MIN_RECORD_CONFIDENCE = 0.3
+
+# Поля кандидата в порядке хранения
+CANDIDATE_FIELDS = [
+    'fio', 'position', 'email', 'phone', 'department', 'source', 'profile_url', 'confidence'
+]
+
+
+def pack_candidates(records: List[Dict[str, Any]]) -> bytes:
+    """Сжатое представление кандидатов: список полей и строки значений"""
+    rows = [[record.get(field) for field in CANDIDATE_FIELDS] for record in records]
+    payload = json.dumps({'fields': CANDIDATE_FIELDS, 'rows': rows}, ensure_ascii=False, separators=(',', ':'))
+    return zlib.compress(payload.encode('utf-8'))
+
+
+def unpack_candidates(data: bytes) -> List[Dict[str, Any]]:
+    """Кандидаты из сжатого представления"""
+    payload = json.loads(zlib.decompress(data).decode('utf-8'))
+    fields = payload['fields']
+    return [dict(zip(fields, row)) for row in payload['rows']]
+
+
+def count_records(records: List[Dict[str, Any]]) -> int:
+    """Число полноценных записей среди кандидатов страницы"""
+    return sum(1 for record in records if (record.get('confidence') or 0) >= MIN_RECORD_CONFIDENCE)
+
+
+def filter_candidates(candidates: List[Dict[str, Any]], threshold: float) -> List[Dict[str, Any]]:
+    """Кандидаты с оценкой не ниже порога (как фильтр в конце обхода)"""
+    return [record for record in candidates if (record.get('confidence') or 0) >= threshold]
+
+
+def rescore_candidates(
+    candidates: List[Dict[str, Any]],
+    validator: Optional[DataValidator] = None
+) -> List[Dict[str, Any]]:
+    """Пересчет оценок текущим валидатором без сетевых проверок доменов"""
+    validator = validator or DataValidator(check_deliverability=False)
+    for record in candidates:
+        record['confidence'] = validator.calculate_confidence(
+            record.get('fio'), record.get('email'), record.get('position'), record.get('source')
+        )
+    return candidates
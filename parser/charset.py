@@ -0,0 +1,158 @@
+"""
+Определение кодировки HTML страниц (windows-1251, KOI8-R, UTF-8) с кэшем по хостам
+"""
+
+import codecs
+import re
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+from loguru import logger
+
+try:
+    from charset_normalizer import from_bytes
+    CHARSET_NORMALIZER_AVAILABLE = True
+except ImportError:
+    CHARSET_NORMALIZER_AVAILABLE = False
+    logger.warning("charset_normalizer not installed. Using built-in Cyrillic charset heuristic.")
+
+
+# Сколько байт начала документа просматривать в поисках <meta charset>
+META_SNIFF_BYTES = 4096
+
+# Сколько байт отдавать статистическому детектору
+DETECTOR_SAMPLE_BYTES = 32 * 1024
+
+HEADER_CHARSET_RE = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+META_CHARSET_RE = re.compile(
+    rb'<meta[^>]+charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE
+)
+
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# Частые строчные буквы русского текста: в верной кодировке их доля высока
+COMMON_CYRILLIC = set('оеаинтсрвлкмдпуяыьгзбчйхжшюцщэфъё')
+
+
+def normalize_charset(name: Optional[str]) -> Optional[str]:
+    """Каноническое имя кодировки или None для неизвестной"""
+    if not name:
+        return None
+    try:
+        return codecs.lookup(name.strip().lower()).name
+    except LookupError:
+        return None
+
+
+def charset_from_header(content_type: Optional[str]) -> Optional[str]:
+    """Кодировка из заголовка Content-Type"""
+    if not content_type:
+        return None
+    match = HEADER_CHARSET_RE.search(content_type)
+    return normalize_charset(match.group(1)) if match else None
+
+
+def sniff_meta_charset(data: bytes) -> Optional[str]:
+    """Кодировка из BOM или <meta charset> / <meta http-equiv> в начале документа"""
+    for bom, encoding in BOMS:
+        if data.startswith(bom):
+            return encoding
+    match = META_CHARSET_RE.search(data[:META_SNIFF_BYTES])
+    return normalize_charset(match.group(1).decode('ascii', 'ignore')) if match else None
+
+
+def _cyrillic_score(text: str) -> float:
+    """Доля частых строчных русских букв среди всех букв"""
+    letters = [ch for ch in text if ch.isalpha()]
+    if not letters:
+        return 0.0
+    return sum(1 for ch in letters if ch in COMMON_CYRILLIC) / len(letters)
+
+
+def detect_charset(data: bytes) -> str:
+    """Статистическое определение кодировки по образцу документа"""
+    sample = data[:DETECTOR_SAMPLE_BYTES]
+    
+    # Корректный UTF-8 почти не встречается случайно
+    try:
+        sample.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError as e:
+        # Обрезанный на границе символа образец тоже считаем UTF-8
+        if e.start >= len(sample) - 3 and len(data) > len(sample):
+            return 'utf-8'
+    
+    if CHARSET_NORMALIZER_AVAILABLE:
+        best = from_bytes(sample, cp_isolation=['cp1251', 'koi8_r', 'utf_8', 'cp866', 'iso8859_5']).best()
+        if best is not None:
+            return normalize_charset(best.encoding) or 'cp1251'
+    
+    # windows-1251 и KOI8-R различаем по доле частых строчных букв
+    scores = {
+        encoding: _cyrillic_score(sample.decode(encoding, 'replace'))
+        for encoding in ('cp1251', 'koi8-r')
+    }
+    return max(scores, key=scores.get)
+
+
+def _try_decode(data: bytes, encoding: Optional[str]) -> Optional[str]:
+    if not encoding:
+        return None
+    try:
+        return data.decode(encoding)
+    except (UnicodeDecodeError, LookupError):
+        return None
+
+
+class CharsetDetector:
+    """Декодирование страниц: заголовок HTTP, <meta charset>, строгий UTF-8, кэш хоста, статистика
+    
+    Однобайтовые кодировки декодируют любые байты без ошибок, поэтому
+    кэшированная для хоста кодировка применяется только к страницам, которые
+    не являются корректным UTF-8: на одном сайте бывают страницы в обеих.
+    """
+    
+    def __init__(self):
+        # Хост -> кодировка, определенная статистически
+        self._hosts: Dict[str, str] = {}
+        self.stats = {'header': 0, 'meta': 0, 'utf8': 0, 'host_cache': 0, 'detected': 0, 'fallback': 0}
+    
+    def decode(self, url: str, data: bytes, content_type: Optional[str] = None) -> Tuple[str, str]:
+        """Текст страницы и использованная кодировка"""
+        host = urlparse(url).netloc
+        
+        for source, encoding in (
+            ('header', charset_from_header(content_type)),
+            ('meta', sniff_meta_charset(data)),
+            ('utf8', 'utf-8'),
+            ('host_cache', self._hosts.get(host)),
+        ):
+            text = _try_decode(data, encoding)
+            if text is not None:
+                self.stats[source] += 1
+                return text, encoding
+        
+        encoding = detect_charset(data)
+        text = _try_decode(data, encoding)
+        if text is not None:
+            self._hosts[host] = encoding
+            self.stats['detected'] += 1
+            logger.debug(f"Кодировка {host}: {encoding}")
+            return text, encoding
+        
+        self.stats['fallback'] += 1
+        return data.decode(encoding, 'replace'), encoding
+
+
+_detector = None
+
+
+def get_charset_detector() -> CharsetDetector:
+    """Общий для процесса детектор (кэш кодировок по хостам)"""
+    global _detector
+    if _detector is None:
+        _detector = CharsetDetector()
+    return _detector
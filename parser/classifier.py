@@ -0,0 +1,229 @@
+"""
+Классификатор контейнеров с данными о сотрудниках по матрице признаков
+"""
+
+import re
+from typing import List, Dict, Any, Optional, Sequence
+
+import numpy as np
+
+from parser.dom import DomDocument
+
+
+STAFF_KEYWORDS = [
+    'профессор', 'доцент', 'преподаватель', 'ассистент',
+    'заведующий', 'заведующая', 'декан', 'заместитель',
+    'старший', 'младший', 'ведущий', 'главный',
+    'научный сотрудник', 'исследователь', 'лаборант',
+    'professor', 'associate', 'assistant', 'lecturer',
+    'head', 'dean', 'director', 'researcher'
+]
+
+KEYWORD_RE = re.compile('|'.join(re.escape(keyword) for keyword in STAFF_KEYWORDS))
+# Для поиска по тексту всей страницы без lower() (смещения совпадений сохраняются)
+KEYWORD_ANY_CASE_RE = re.compile(KEYWORD_RE.pattern, re.IGNORECASE)
+EMAIL_RE = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b')
+CAPITALIZED_RE = re.compile(r'\b[А-ЯЁ][а-яё]+')
+# Фамилия Имя Отчество, Фамилия И. О. или И. О. Фамилия
+FIO_RE = re.compile(
+    r'\b[А-ЯЁ][а-яё]+\s+[А-ЯЁ][а-яё]+\s+[А-ЯЁ][а-яё]+(?:вич|вна|чна|ична|оглы|кызы)\b'
+    r'|\b[А-ЯЁ][а-яё]+\s+[А-ЯЁ]\.\s?[А-ЯЁ]\.'
+    r'|\b[А-ЯЁ]\.\s?[А-ЯЁ]\.\s?[А-ЯЁ][а-яё]+'
+)
+
+# Порядок столбцов матрицы признаков
+FEATURES = [
+    'length',       # log(1 + длина текста)
+    'long_text',    # превышение длины обычной карточки (в логарифмах)
+    'link_density', # доля текста внутри ссылок
+    'emails',       # число адресов (до 3)
+    'capitalized',  # слова с заглавной кириллической буквы (до 6)
+    'fio',          # совпадения с шаблонами ФИО (до 3)
+    'keywords',     # ключевые слова должностей (до 3)
+    'depth',        # глубина в дереве
+    'siblings',     # log(1 + число соседей с тем же тегом)
+]
+
+# Длина текста, до которой блок считается обычной карточкой
+CARD_TEXT_LENGTH = 400
+
+# Признаки, веса которых подбираются по разметке (положение в DOM на ней переобучается)
+TUNED_FEATURES = ['long_text', 'link_density', 'emails', 'capitalized', 'fio', 'keywords']
+
+# Результат fit(columns=TUNED_FEATURES) на размеченных блоках из тестов
+# (TestContainerClassifier.LABELLED_PAGES, оба DOM бэкенда)
+DEFAULT_WEIGHTS = {
+    'length': 0.0,
+    'long_text': -2.11,
+    'link_density': -2.1,
+    'emails': 1.61,
+    'capitalized': -0.33,
+    'fio': 5.61,
+    'keywords': 0.94,
+    'depth': 0.0,
+    'siblings': 0.0,
+}
+DEFAULT_BIAS = -2.42
+
+
+def text_features(text: str) -> List[float]:
+    """Признаки, зависящие только от текста (регистр букв сохраняется)"""
+    return [
+        len(text),
+        len(EMAIL_RE.findall(text)),
+        len(CAPITALIZED_RE.findall(text)),
+        len(FIO_RE.findall(text)),
+        len(KEYWORD_RE.findall(text.lower())),
+    ]
+
+
+def span_counts(pattern: re.Pattern, text: str, spans: np.ndarray) -> np.ndarray:
+    """Число совпадений шаблона внутри каждого интервала (шаблон применяется к тексту один раз)"""
+    matches = np.array([match.span() for match in pattern.finditer(text)], dtype=float).reshape(-1, 2)
+    return span_totals(matches, np.ones(len(matches)), spans)
+
+
+def span_totals(items: np.ndarray, values: np.ndarray, spans: np.ndarray) -> np.ndarray:
+    """Сумма values непересекающихся интервалов items, целиком лежащих в каждом из spans"""
+    totals = np.concatenate([[0.0], np.cumsum(values)])
+    first = np.searchsorted(items[:, 0], spans[:, 0], side='left')
+    last = np.searchsorted(items[:, 1], spans[:, 1], side='right')
+    return np.where(last > first, totals[last] - totals[np.minimum(first, last)], 0.0)
+
+
+class ContainerClassifier:
+    """Линейная модель над признаками блоков: все кандидаты страницы оцениваются одной операцией"""
+    
+    def __init__(
+        self,
+        weights: Optional[Dict[str, float]] = None,
+        bias: float = DEFAULT_BIAS,
+        threshold: float = 0.0
+    ):
+        weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.weights = np.array([weights[name] for name in FEATURES], dtype=float)
+        self.bias = bias
+        self.threshold = threshold
+    
+    @staticmethod
+    def raw_features(doc: DomDocument, nodes: Sequence[Any]) -> np.ndarray:
+        """Необработанные признаки узлов: длина, ссылки, адреса, имена, должности, положение
+        
+        Текст страницы собирается одним обходом, а каждый шаблон применяется
+        к нему один раз: признаки вложенных кандидатов считаются по
+        интервалам узлов, без повторного сбора текста и поиска по нему.
+        """
+        text, spans, links = doc.text_spans(list(nodes))
+        # Сама ссылка в свой текст ссылок не входит (учитываются только вложенные)
+        own_links = set(links)
+        is_link = np.array([doc.tag(node) == 'a' and span in own_links for node, span in zip(nodes, spans)])
+        spans = np.array(spans, dtype=float).reshape(-1, 2)
+        links = np.array(links, dtype=float).reshape(-1, 2)
+        length = spans[:, 1] - spans[:, 0]
+        positions = np.array([doc.position(node) for node in nodes], dtype=float).reshape(-1, 2)
+        
+        return np.column_stack([
+            length,
+            span_counts(EMAIL_RE, text, spans),
+            span_counts(CAPITALIZED_RE, text, spans),
+            span_counts(FIO_RE, text, spans),
+            span_counts(KEYWORD_ANY_CASE_RE, text, spans),
+            span_totals(links, links[:, 1] - links[:, 0], spans) - np.where(is_link, length, 0.0),
+            positions,
+        ]).reshape(len(nodes), 8)
+    
+    @staticmethod
+    def transform(raw: np.ndarray) -> np.ndarray:
+        """Матрица признаков в порядке FEATURES из необработанных значений"""
+        length, emails, capitalized, fio, keywords, link_text, depth, siblings = raw.T
+        log_length = np.log1p(length)
+        return np.column_stack([
+            log_length,
+            np.maximum(0.0, log_length - np.log1p(CARD_TEXT_LENGTH)),
+            np.clip(link_text / np.maximum(length, 1.0), 0.0, 1.0),
+            np.minimum(emails, 3),
+            np.minimum(capitalized, 6),
+            np.minimum(fio, 3),
+            np.minimum(keywords, 3),
+            np.minimum(depth, 30),
+            np.log1p(siblings),
+        ])
+    
+    @staticmethod
+    def block_raw_features(blocks: Sequence[Dict[str, Any]]) -> np.ndarray:
+        """Необработанные признаки блоков, собранных в браузере (text, linkChars, depth, siblings)"""
+        return np.array([
+            text_features(block['text']) + [block['linkChars'], block['depth'], block['siblings']]
+            for block in blocks
+        ], dtype=float).reshape(len(blocks), 8)
+    
+    def classify_blocks(self, blocks: Sequence[Dict[str, Any]]) -> List[int]:
+        """Индексы блоков из браузера, похожих на контейнеры с данными о сотрудниках"""
+        if not blocks:
+            return []
+        mask = self.predict(self.transform(self.block_raw_features(blocks)))
+        return [index for index, keep in enumerate(mask) if keep]
+    
+    def features(self, doc: DomDocument, nodes: Sequence[Any]) -> np.ndarray:
+        """Матрица признаков узлов страницы"""
+        return self.transform(self.raw_features(doc, nodes))
+    
+    def scores(self, features: np.ndarray) -> np.ndarray:
+        """Оценки строк матрицы признаков"""
+        return features @ self.weights + self.bias
+    
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        """Маска строк, похожих на данные о сотрудниках"""
+        return self.scores(features) > self.threshold
+    
+    def classify(self, doc: DomDocument, nodes: Sequence[Any]) -> List[Any]:
+        """Узлы, похожие на контейнеры с данными о сотрудниках (порядок сохраняется)"""
+        if not nodes:
+            return []
+        mask = self.predict(self.features(doc, nodes))
+        return [node for node, keep in zip(nodes, mask) if keep]
+    
+    def is_staff_text(self, text: str) -> bool:
+        """Оценка отдельного текста (без признаков положения в DOM)"""
+        raw = np.array([text_features(text) + [0, 0, 0]], dtype=float)
+        return bool(self.predict(self.transform(raw))[0])
+    
+    def fit(
+        self,
+        features: np.ndarray,
+        labels: Sequence[bool],
+        epochs: int = 2000,
+        learning_rate: float = 0.1,
+        columns: Optional[Sequence[str]] = None
+    ):
+        """Подбор весов логистической регрессией по размеченным блокам
+        
+        columns — признаки, веса которых подбираются (остальные обнуляются):
+        на небольшой разметке положение в DOM легко переобучается.
+        """
+        y = np.asarray(labels, dtype=float)
+        mask = np.array([columns is None or name in columns for name in FEATURES], dtype=float)
+        # Признаки нормируются, чтобы шаг градиента был одинаковым для всех столбцов
+        scale = np.maximum(np.abs(features).max(axis=0), 1e-9)
+        x = features / scale * mask
+        weights = np.zeros(x.shape[1])
+        bias = 0.0
+        
+        for _ in range(epochs):
+            probabilities = 1.0 / (1.0 + np.exp(-(x @ weights + bias)))
+            error = probabilities - y
+            weights -= learning_rate * (x.T @ error) / len(y)
+            bias -= learning_rate * error.mean()
+        
+        self.weights = weights / scale
+        self.bias = bias
+        self.threshold = 0.0
+        return self
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Веса для сохранения в настройках"""
+        return {
+            'weights': dict(zip(FEATURES, self.weights.tolist())),
+            'bias': self.bias,
+            'threshold': self.threshold,
+        }
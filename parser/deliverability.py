@@ -0,0 +1,74 @@
+"""
+Кэш DNS проверки доменов email: принимает ли домен почту
+"""
+
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from email_validator import validate_email, EmailNotValidError
+
+
+class DeliverabilityCache:
+    """Ограниченный LRU кэш результатов DNS проверки по доменам
+    
+    Адреса одного сайта делят домен, поэтому DNS запрашивается один раз на
+    домен. Положительный результат живет ttl секунд, отрицательный —
+    negative_ttl (временный сбой DNS не должен помечать домен навсегда).
+    Хранится не больше max_domains доменов, самые давние вытесняются.
+    """
+    
+    def __init__(self, max_domains: int = 10000, ttl: float = 24 * 3600, negative_ttl: float = 3600):
+        self.max_domains = max_domains
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # Домен -> (принимает ли почту, время истечения)
+        self._domains: 'OrderedDict[str, Tuple[bool, float]]' = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._domains)
+    
+    def get(self, domain: str) -> Optional[bool]:
+        """Известный результат для домена (None — нет или устарел)"""
+        domain = domain.lower()
+        cached = self._domains.get(domain)
+        if cached is None:
+            return None
+        if cached[1] <= time.monotonic():
+            del self._domains[domain]
+            return None
+        self._domains.move_to_end(domain)
+        return cached[0]
+    
+    def put(self, domain: str, deliverable: bool):
+        """Сохранение результата с вытеснением самых давних доменов"""
+        domain = domain.lower()
+        ttl = self.ttl if deliverable else self.negative_ttl
+        self._domains[domain] = (deliverable, time.monotonic() + ttl)
+        self._domains.move_to_end(domain)
+        while len(self._domains) > self.max_domains:
+            self._domains.popitem(last=False)
+    
+    def is_deliverable(self, email: str) -> bool:
+        """Принимает ли домен адреса почту (DNS запрашивается, только если результата нет в кэше)"""
+        domain = email.rsplit('@', 1)[1]
+        deliverable = self.get(domain)
+        if deliverable is None:
+            try:
+                validate_email(email)
+                deliverable = True
+            except EmailNotValidError:
+                deliverable = False
+            self.put(domain, deliverable)
+        return deliverable
+
+
+_cache = None
+
+
+def get_deliverability_cache() -> DeliverabilityCache:
+    """Общий для процесса кэш DNS проверки доменов"""
+    global _cache
+    if _cache is None:
+        _cache = DeliverabilityCache()
+    return _cache
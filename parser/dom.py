@@ -0,0 +1,527 @@
+"""
+DOM бэкенды: BeautifulSoup (совместимость) и lxml/XPath (скорость)
+"""
+
+import re
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import List, Dict, Any, Iterator, Optional, Tuple, Union
+from loguru import logger
+
+from bs4 import BeautifulSoup, Comment, Tag
+import lxml.html
+from lxml import etree
+
+from parser.charset import detect_charset, sniff_meta_charset
+from parser.pagination import Anchor, anchors_from_soup
+
+
+# Ссылка внутри контейнера: (href, текст)
+Link = Tuple[str, str]
+
+# Интервал [начало, конец) в тексте страницы
+TextSpan = Tuple[int, int]
+
+# Содержимое этих тегов не считается текстом страницы (как в BeautifulSoup.get_text)
+NON_TEXT_TAGS = {'script', 'style', 'template'}
+
+XML_DECLARATION_RE = re.compile(r'^\s*<\?xml[^>]*\?>', re.IGNORECASE)
+
+LINK_TEXT_XPATH = etree.XPath('.//a[@href]//text()')
+NON_TEXT_XPATH = etree.XPath('boolean(//script | //style | //template)')
+TEXT_OWNERS_XPATH = etree.XPath(
+    '//*[not(self::script or self::style or self::template)][text()[contains(., $substring)]]'
+)
+
+SELECTOR_TOKEN_RE = re.compile(r'\s*(>)\s*|\s+|([^\s>]+)')
+SIMPLE_SELECTOR_RE = re.compile(
+    r'\.(?P<cls>[\w-]+)'
+    r'|#(?P<id>[\w-]+)'
+    r'|\[(?P<attr>[\w-]+)(?:(?P<op>[*^$~]?=)\s*["\']?(?P<value>[^"\'\]]*)["\']?)?\]'
+)
+
+
+def _compound_to_xpath(compound: str) -> str:
+    """Один составной селектор (тег, .класс, #id, [атрибут]) в шаг XPath"""
+    tag_match = re.match(r'[a-zA-Z][\w-]*|\*', compound)
+    tag = tag_match.group(0).lower() if tag_match else '*'
+    rest = compound[tag_match.end():] if tag_match else compound
+    
+    conditions = []
+    position = 0
+    for match in SIMPLE_SELECTOR_RE.finditer(rest):
+        if match.start() != position:
+            break
+        position = match.end()
+        
+        if match.group('cls'):
+            conditions.append(f"contains(concat(' ', normalize-space(@class), ' '), ' {match.group('cls')} ')")
+        elif match.group('id'):
+            conditions.append(f"@id='{match.group('id')}'")
+        else:
+            attr, op, value = match.group('attr').lower(), match.group('op'), match.group('value')
+            if op is None:
+                conditions.append(f"@{attr}")
+            elif op == '=':
+                conditions.append(f"@{attr}='{value}'")
+            elif op == '*=':
+                conditions.append(f"contains(@{attr}, '{value}')")
+            elif op == '^=':
+                conditions.append(f"starts-with(@{attr}, '{value}')")
+            elif op == '$=':
+                conditions.append(
+                    f"substring(@{attr}, string-length(@{attr}) - {len(value) - 1}) = '{value}'"
+                )
+            else:
+                conditions.append(f"contains(concat(' ', normalize-space(@{attr}), ' '), ' {value} ')")
+    
+    if position != len(rest):
+        raise ValueError(f"Неподдерживаемый CSS селектор: {compound}")
+    
+    return tag + ''.join(f'[{condition}]' for condition in conditions)
+
+
+def css_to_xpath(selector: str) -> str:
+    """Перевод простого CSS селектора в XPath (потомки, '>', списки через запятую)"""
+    paths = []
+    for group in selector.split(','):
+        path = ''
+        axis = '//'
+        for match in SELECTOR_TOKEN_RE.finditer(group.strip()):
+            if match.group(1):
+                axis = '/'
+            elif match.group(2):
+                path += axis + _compound_to_xpath(match.group(2))
+                axis = '//'
+        if path:
+            paths.append(path)
+    return ' | '.join(paths)
+
+
+class DomDocument(ABC):
+    """Разобранная страница: поиск контейнеров, текст, ссылки и mailto"""
+    
+    @abstractmethod
+    def select(self, selector: str) -> List[Any]:
+        """Элементы по CSS селектору в порядке документа"""
+        pass
+    
+    @abstractmethod
+    def text(self, node: Any = None, separator: str = '', strip: bool = False) -> str:
+        """Текст элемента (или всей страницы) без script и style"""
+        pass
+    
+    @abstractmethod
+    def links(self, node: Any = None) -> List[Link]:
+        """Ссылки a[href] внутри элемента"""
+        pass
+    
+    @abstractmethod
+    def mailtos(self, node: Any = None) -> List[str]:
+        """href всех mailto-ссылок внутри элемента"""
+        pass
+    
+    @abstractmethod
+    def link_text_length(self, node: Any) -> int:
+        """Длина текста внутри ссылок элемента"""
+        pass
+    
+    @abstractmethod
+    def outer_html(self, node: Any, limit: int = 500) -> str:
+        """HTML элемента (обрезанный до limit символов)"""
+        pass
+    
+    @abstractmethod
+    def page_anchors(self) -> List[Anchor]:
+        """Короткие ссылки страницы для поиска пагинации"""
+        pass
+    
+    @abstractmethod
+    def body_strings(self) -> Optional[List[str]]:
+        """Непустые строки текста в <body> (None, если тела нет)"""
+        pass
+
+    @abstractmethod
+    def walk(self) -> Iterator[Tuple[str, Any, bool]]:
+        """События обхода документа: ('start' | 'end', элемент, ссылка) и ('text', строка, False)"""
+        pass
+    
+    @abstractmethod
+    def remove(self, nodes: List[Any]):
+        """Удаление элементов вместе с содержимым (вложенные друг в друга допускаются)"""
+        pass
+
+    @abstractmethod
+    def position(self, node: Any) -> Tuple[int, int]:
+        """Глубина элемента и число соседей с тем же тегом"""
+        pass
+
+    @abstractmethod
+    def tag(self, node: Any) -> str:
+        """Имя тега элемента"""
+        pass
+    
+    @abstractmethod
+    def attr(self, node: Any, name: str) -> str:
+        """Значение атрибута (пустая строка, если его нет)"""
+        pass
+    
+    @abstractmethod
+    def parent(self, node: Any) -> Optional[Any]:
+        """Родительский элемент (None для корня)"""
+        pass
+    
+    @abstractmethod
+    def children(self, node: Any) -> List[Any]:
+        """Дочерние элементы"""
+        pass
+    
+    @abstractmethod
+    def text_owners(self, substring: str) -> List[Any]:
+        """Элементы, собственный текст которых содержит substring (кроме script и style)"""
+        pass
+
+    @abstractmethod
+    def text_spans(self, nodes: List[Any]) -> Tuple[str, List[TextSpan], List[TextSpan]]:
+        """Текст страницы за один обход: строки через пробел, интервалы узлов nodes и ссылок a[href]
+        
+        Текст узла — срез text[start:end], он совпадает с text(node, separator=' ').
+        """
+        pass
+
+
+def spans_from_events(
+    events: Iterator[Tuple[str, Any, bool]],
+    nodes: List[Any],
+    separator: str = ' '
+) -> Tuple[str, List[TextSpan], List[TextSpan]]:
+    """Сборка текста и интервалов из событий обхода ('start' | 'end', элемент, ссылка) и ('text', строка, False)
+    
+    Узел начинается с первой строки после своего открытия и заканчивается
+    последней строкой перед закрытием, поэтому каждая строка обрабатывается один раз.
+    """
+    wanted = {id(node): i for i, node in enumerate(nodes)}
+    spans: List[TextSpan] = [(0, 0)] * len(nodes)
+    links: List[TextSpan] = []
+    parts: List[str] = []
+    string_starts: List[int] = []
+    # Номер первой строки каждого открытого элемента
+    opened: List[int] = []
+    offset = 0
+    
+    for kind, value, is_link in events:
+        if kind == 'text':
+            if not value:
+                continue
+            if parts:
+                offset += len(separator)
+            string_starts.append(offset)
+            parts.append(value)
+            offset += len(value)
+        elif kind == 'start':
+            opened.append(len(string_starts))
+        else:
+            first = opened.pop()
+            start = string_starts[first] if first < len(string_starts) else offset
+            span = (start, max(start, offset))
+            if id(value) in wanted:
+                spans[wanted[id(value)]] = span
+            if is_link and span[1] > span[0]:
+                links.append(span)
+    
+    links.sort()
+    return separator.join(parts), spans, links
+
+
+class SoupDocument(DomDocument):
+    """Документ BeautifulSoup"""
+    
+    def __init__(self, soup: Union[BeautifulSoup, Tag]):
+        self.root = soup
+        # id(родителя) -> (родитель, число детей по тегам)
+        self._children_tags: Dict[int, Tuple[Any, Counter]] = {}
+    
+    def select(self, selector: str) -> List[Tag]:
+        return self.root.select(selector)
+    
+    def text(self, node: Any = None, separator: str = '', strip: bool = False) -> str:
+        return (node if node is not None else self.root).get_text(separator, strip=strip)
+    
+    def links(self, node: Any = None) -> List[Link]:
+        node = node if node is not None else self.root
+        return [(a['href'], a.get_text(strip=True)) for a in node.find_all('a', href=True)]
+    
+    def mailtos(self, node: Any = None) -> List[str]:
+        node = node if node is not None else self.root
+        return [a.get('href', '') for a in node.find_all('a', href=re.compile(r'^mailto:'))]
+    
+    def link_text_length(self, node: Any) -> int:
+        return sum(len(a.get_text()) for a in node.find_all('a', href=True))
+    
+    def outer_html(self, node: Any, limit: int = 500) -> str:
+        return str(node)[:limit]
+    
+    def page_anchors(self) -> List[Anchor]:
+        return anchors_from_soup(self.root)
+    
+    def body_strings(self) -> Optional[List[str]]:
+        body = self.root.body
+        return list(body.stripped_strings) if body is not None else None
+    
+    def walk(self) -> Iterator[Tuple[str, Any, bool]]:
+        return self._events()
+    
+    def remove(self, nodes: List[Any]):
+        for node in nodes:
+            if not node.decomposed:
+                node.decompose()
+
+    def position(self, node: Any) -> Tuple[int, int]:
+        depth = sum(1 for _ in node.parents)
+        parent = node.parent
+        if parent is None:
+            return depth, 0
+        if id(parent) not in self._children_tags:
+            tags = Counter(child.name for child in parent.children if isinstance(child, Tag))
+            self._children_tags[id(parent)] = (parent, tags)
+        return depth, self._children_tags[id(parent)][1][node.name] - 1
+    
+    def tag(self, node: Any) -> str:
+        return node.name
+    
+    def attr(self, node: Any, name: str) -> str:
+        value = node.get(name, '')
+        # class и другие многозначные атрибуты BeautifulSoup возвращает списком
+        return ' '.join(value) if isinstance(value, list) else value
+    
+    def parent(self, node: Any) -> Optional[Any]:
+        parent = node.parent
+        return None if parent is None or isinstance(parent, BeautifulSoup) else parent
+    
+    def children(self, node: Any) -> List[Any]:
+        return [child for child in node.children if isinstance(child, Tag)]
+    
+    def text_owners(self, substring: str) -> List[Any]:
+        owners = []
+        seen = set()
+        for string in self.root.find_all(string=lambda text: substring in text):
+            parent = string.parent
+            if isinstance(string, Comment) or parent is None or parent.name in NON_TEXT_TAGS:
+                continue
+            if id(parent) not in seen:
+                seen.add(id(parent))
+                owners.append(parent)
+        return owners
+    
+    def text_spans(self, nodes: List[Any]) -> Tuple[str, List[TextSpan], List[TextSpan]]:
+        return spans_from_events(self._events(), nodes)
+    
+    def _events(self) -> Iterator[Tuple[str, Any, bool]]:
+        """Открытие и закрытие элементов и строки текста в порядке документа (без рекурсии)"""
+        # Те же типы строк, что учитывает get_text (без комментариев и script)
+        types = self.root.interesting_string_types or Tag.MAIN_CONTENT_STRING_TYPES
+        if isinstance(types, type):
+            types = (types,)
+        stack = [(self.root, iter(self.root.children))]
+        yield 'start', self.root, False
+        
+        while stack:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                yield 'end', node, node.name == 'a' and node.has_attr('href')
+            elif isinstance(child, Tag):
+                stack.append((child, iter(child.children)))
+                yield 'start', child, False
+            elif type(child) in types:
+                yield 'text', str(child), False
+
+
+class LxmlDocument(DomDocument):
+    """Документ lxml: селекторы компилируются в XPath"""
+    
+    _xpaths: Dict[str, etree.XPath] = {}
+    
+    def __init__(self, root):
+        self.root = root
+        # id(родителя) -> (родитель, число детей по тегам); родитель хранится, чтобы id не переиспользовался
+        self._children_tags: Dict[int, Tuple[Any, Counter]] = {}
+        # Без script/style текст собирается itertext на стороне libxml2
+        self._has_non_text = NON_TEXT_XPATH(root)
+    
+    @classmethod
+    def _compiled(cls, selector: str) -> etree.XPath:
+        xpath = cls._xpaths.get(selector)
+        if xpath is None:
+            xpath = etree.XPath(css_to_xpath(selector))
+            cls._xpaths[selector] = xpath
+        return xpath
+    
+    def select(self, selector: str) -> List[Any]:
+        return self._compiled(selector)(self.root)
+    
+    def _strings(self, node) -> Iterator[str]:
+        """Текстовые узлы в порядке документа (комментарии и script/style пропускаются)"""
+        if isinstance(node.tag, str) and node.tag not in NON_TEXT_TAGS and node.text:
+            yield node.text
+        for child in node:
+            if isinstance(child.tag, str):
+                yield from self._strings(child)
+            if child.tail:
+                yield child.tail
+    
+    def text(self, node: Any = None, separator: str = '', strip: bool = False) -> str:
+        node = node if node is not None else self.root
+        # itertext пропускает комментарии, но не содержимое script и style
+        strings = self._strings(node) if self._has_non_text else node.itertext()
+        if strip:
+            strings = (s.strip() for s in strings)
+            strings = (s for s in strings if s)
+        return separator.join(strings)
+    
+    def links(self, node: Any = None) -> List[Link]:
+        node = node if node is not None else self.root
+        return [(a.get('href'), self.text(a, strip=True)) for a in node.iterfind('.//a[@href]')]
+    
+    def mailtos(self, node: Any = None) -> List[str]:
+        node = node if node is not None else self.root
+        return node.xpath('.//a[starts-with(@href, "mailto:")]/@href')
+    
+    def link_text_length(self, node: Any) -> int:
+        return sum(len(text) for text in LINK_TEXT_XPATH(node))
+    
+    def outer_html(self, node: Any, limit: int = 500) -> str:
+        return lxml.html.tostring(node, encoding='unicode', with_tail=False)[:limit]
+    
+    def page_anchors(self) -> List[Anchor]:
+        anchors = []
+        
+        for link in self.root.iterfind('.//link[@rel][@href]'):
+            if 'next' in link.get('rel', '').split():
+                anchors.append((link.get('href'), '', 'next'))
+        
+        for a in self.root.iterfind('.//a[@href]'):
+            text = self.text(a, strip=True)
+            if len(text) <= 20:
+                anchors.append((a.get('href'), text, ' '.join(a.get('rel', '').split())))
+        
+        return anchors
+    
+    def body_strings(self) -> Optional[List[str]]:
+        body = self.root.find('body')
+        if body is None:
+            return None
+        return [s.strip() for s in self._strings(body) if s.strip()]
+
+    def walk(self) -> Iterator[Tuple[str, Any, bool]]:
+        return self._events()
+    
+    def remove(self, nodes: List[Any]):
+        for node in nodes:
+            parent = node.getparent()
+            if parent is None:
+                continue
+            # Текст после элемента (tail) остается в документе
+            if node.tail:
+                previous = node.getprevious()
+                if previous is not None:
+                    previous.tail = (previous.tail or '') + node.tail
+                else:
+                    parent.text = (parent.text or '') + node.tail
+            parent.remove(node)
+        self._has_non_text = NON_TEXT_XPATH(self.root)
+    
+    def position(self, node: Any) -> Tuple[int, int]:
+        # Корень lxml — <html>, у BeautifulSoup над ним еще документ
+        depth = sum(1 for _ in node.iterancestors()) + 1
+        parent = node.getparent()
+        if parent is None:
+            return depth, 0
+        if id(parent) not in self._children_tags:
+            self._children_tags[id(parent)] = (parent, Counter(child.tag for child in parent))
+        return depth, self._children_tags[id(parent)][1][node.tag] - 1
+
+    def tag(self, node: Any) -> str:
+        return node.tag
+    
+    def attr(self, node: Any, name: str) -> str:
+        return node.get(name, '')
+    
+    def parent(self, node: Any) -> Optional[Any]:
+        return node.getparent()
+    
+    def children(self, node: Any) -> List[Any]:
+        return [child for child in node if isinstance(child.tag, str)]
+    
+    def text_owners(self, substring: str) -> List[Any]:
+        return TEXT_OWNERS_XPATH(self.root, substring=substring)
+
+    def text_spans(self, nodes: List[Any]) -> Tuple[str, List[TextSpan], List[TextSpan]]:
+        return spans_from_events(self._events(), nodes)
+    
+    def _events(self) -> Iterator[Tuple[str, Any, bool]]:
+        """События обхода для spans_from_events: строки те же, что у _strings"""
+        # Комментарии и инструкции приходят одним событием: их текст пропускается, хвост — нет
+        for event, node in etree.iterwalk(self.root, events=('start', 'end', 'comment', 'pi')):
+            if event == 'start':
+                yield 'start', node, False
+                if node.tag not in NON_TEXT_TAGS:
+                    yield 'text', node.text, False
+                continue
+            
+            if event == 'end':
+                yield 'end', node, node.tag == 'a' and node.get('href') is not None
+            if node is not self.root:
+                yield 'text', node.tail, False
+
+
+class SoupBackend:
+    """BeautifulSoup с html.parser — медленно, но как раньше"""
+    
+    name = 'soup'
+    
+    def parse(self, html: Union[str, bytes]) -> SoupDocument:
+        return SoupDocument(BeautifulSoup(html, 'html.parser'))
+
+
+class LxmlBackend:
+    """Разбор и поиск средствами libxml2"""
+    
+    name = 'lxml'
+    
+    def parse(self, html: Union[str, bytes]) -> LxmlDocument:
+        if isinstance(html, bytes):
+            # Без явной кодировки libxml2 читает байты как latin-1
+            html = html.decode(sniff_meta_charset(html) or detect_charset(html), 'replace')
+        # lxml не принимает строки с объявлением кодировки
+        html = XML_DECLARATION_RE.sub('', html, count=1)
+        # Обычные элементы etree: классы lxml.html заметно замедляют обход дерева
+        try:
+            root = etree.HTML(html)
+        except (etree.ParserError, ValueError) as e:
+            logger.debug(f"Некорректный HTML: {e}")
+            root = None
+        if root is None:
+            root = etree.HTML('<html><body></body></html>')
+        return LxmlDocument(root)
+
+
+DOM_BACKENDS = {
+    SoupBackend.name: SoupBackend,
+    LxmlBackend.name: LxmlBackend,
+}
+
+
+def get_dom_backend(name: str = 'lxml'):
+    """DOM бэкенд по имени"""
+    if name not in DOM_BACKENDS:
+        raise ValueError(f"Неизвестный DOM бэкенд: {name}. Доступны: {', '.join(DOM_BACKENDS)}")
+    return DOM_BACKENDS[name]()
+
+
+def as_document(source: Union[DomDocument, BeautifulSoup, Tag]) -> DomDocument:
+    """Документ из уже разобранной страницы (BeautifulSoup передается как есть)"""
+    if isinstance(source, DomDocument):
+        return source
+    return SoupDocument(source)
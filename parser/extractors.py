@@ -7,83 +7,48 @@ from typing import Optional, List
 from bs4 import BeautifulSoup, Tag
 from loguru import logger
 
+from parser.names import get_name_service
+
 try:
     import spacy
-    from natasha import NamesExtractor
     SPACY_AVAILABLE = True
 except ImportError:
     SPACY_AVAILABLE = False
-    logger.warning("spacy and natasha not installed. NER functions unavailable.")
+    logger.warning("spacy not installed. NER functions unavailable.")
 
 
 class StaffDataExtractor:
     """Класс для извлечения данных о сотрудниках"""
     
     def __init__(self):
-        self.names_extractor = None
         self.nlp = None
+        # ФИО обрабатываются общим сервисом с кэшем (NER natasha загружается один раз)
+        self.names = get_name_service()
         
         # Инициализируем NER если доступен
         if SPACY_AVAILABLE:
             try:
-                self.names_extractor = NamesExtractor()
                 # Пробуем загрузить русскую модель spacy
-                try:
-                    self.nlp = spacy.load("ru_core_news_sm")
-                except OSError:
-                    logger.warning("Русская модель spacy не найдена. Используем только regex.")
+                self.nlp = spacy.load("ru_core_news_sm")
+            except OSError:
+                logger.warning("Русская модель spacy не найдена. Используем только regex.")
             except Exception as e:
                 logger.warning(f"Ошибка инициализации NER: {e}")
     
     def extract_fio(self, text: str) -> Optional[str]:
-        """Извлечение ФИО из текста"""
-        # Сначала пробуем NER
-        if self.names_extractor:
-            try:
-                matches = self.names_extractor(text)
-                if matches:
-                    # Берем первое найденное имя
-                    name = matches[0].fact
-                    if hasattr(name, 'first') and hasattr(name, 'last'):
-                        fio_parts = []
-                        if name.last:
-                            fio_parts.append(name.last)
-                        if name.first:
-                            fio_parts.append(name.first)
-                        if hasattr(name, 'middle') and name.middle:
-                            fio_parts.append(name.middle)
-                        return ' '.join(fio_parts)
-            except Exception as e:
-                logger.debug(f"Ошибка NER извлечения ФИО: {e}")
-        
-        # Fallback на regex
-        return self._extract_fio_regex(text)
+        """Извлечение ФИО из текста (NER, затем regex; результат кэшируется)"""
+        return self.names.extract(text)
     
     def _extract_fio_regex(self, text: str) -> Optional[str]:
         """Извлечение ФИО с помощью регулярных выражений"""
-        # Паттерны для русских имен
-        patterns = [
-            # Фамилия Имя Отчество
-            r'\b([А-ЯЁ][а-яё]+)\s+([А-ЯЁ][а-яё]+)\s+([А-ЯЁ][а-яё]+)\b',
-            # Фамилия Имя
-            r'\b([А-ЯЁ][а-яё]+)\s+([А-ЯЁ][а-яё]+)\b',
-            # Имя Фамилия (менее надежно)
-            r'\b([А-ЯЁ][а-яё]+)\s+([А-ЯЁ][а-яё]+)\b'
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, text)
-            if matches:
-                # Берем первое совпадение
-                match = matches[0]
-                if len(match) == 3:
-                    return f"{match[0]} {match[1]} {match[2]}"
-                elif len(match) == 2:
-                    return f"{match[0]} {match[1]}"
-        
-        return None
+        return self.names.extract_regex(text)
     
-    def extract_email(self, text: str, element: Tag = None) -> Optional[str]:
+    def extract_email(
+        self,
+        text: str,
+        element: Tag = None,
+        mailto_hrefs: Optional[List[str]] = None
+    ) -> Optional[str]:
         """Извлечение email адреса"""
         emails = []
         
@@ -95,11 +60,12 @@ class StaffDataExtractor:
         # Ищем в HTML элементах (mailto ссылки)
         if element:
             mailto_links = element.find_all('a', href=re.compile(r'^mailto:'))
-            for link in mailto_links:
-                href = link.get('href', '')
-                email = href.replace('mailto:', '').split('?')[0]
-                if email:
-                    emails.append(email)
+            mailto_hrefs = (mailto_hrefs or []) + [link.get('href', '') for link in mailto_links]
+        
+        for href in mailto_hrefs or []:
+            email = href.replace('mailto:', '').split('?')[0]
+            if email:
+                emails.append(email)
         
         # Возвращаем первый найденный email
         return emails[0] if emails else None
@@ -197,23 +163,4 @@ class StaffDataExtractor:
     
     def normalize_fio(self, fio: str) -> str:
         """Нормализация ФИО"""
-        if not fio:
-            return ""
-        
-        # Убираем лишние пробелы
-        fio = re.sub(r'\s+', ' ', fio.strip())
-        
-        # Убираем точки и запятые
-        fio = re.sub(r'[.,]', '', fio)
-        
-        # Приводим к правильному регистру
-        words = fio.split()
-        normalized_words = []
-        
-        for word in words:
-            if word:
-                # Первая буква заглавная, остальные строчные
-                normalized_word = word[0].upper() + word[1:].lower()
-                normalized_words.append(normalized_word)
-        
-        return ' '.join(normalized_words)
+        return self.names.normalize(fio)
@@ -0,0 +1,127 @@
+"""
+Загрузка ответов с ограничением размера: проверка заголовков и потоковое чтение тела
+"""
+
+import time
+from typing import Iterable, Optional
+from loguru import logger
+
+import requests
+
+
+# Лимит тела ответа по умолчанию
+DEFAULT_MAX_RESPONSE_BYTES = 5 * 1024 * 1024
+
+# Общее время чтения тела (медленный бесконечный chunked ответ)
+DEFAULT_READ_DEADLINE = 60.0
+
+READ_CHUNK_SIZE = 64 * 1024
+
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml', 'text/plain')
+JSON_CONTENT_TYPES = ('application/json', 'text/json', 'text/javascript', 'application/javascript', 'text/plain')
+
+
+class ResponseRejected(Exception):
+    """Ответ не загружается: неподходящий тип содержимого или слишком большой размер"""
+    
+    def __init__(self, url: str, reason: str):
+        super().__init__(f"Ответ {url} отклонен: {reason}")
+        self.url = url
+        self.reason = reason
+
+
+def media_type(content_type: Optional[str]) -> str:
+    """Тип содержимого без параметров (charset и т.п.)"""
+    return (content_type or '').split(';', 1)[0].strip().lower()
+
+
+def is_allowed_content_type(content_type: Optional[str], allowed: Iterable[str]) -> bool:
+    """Подходит ли Content-Type (отсутствующий заголовок не отклоняется)"""
+    media = media_type(content_type)
+    if not media:
+        return True
+    return media in allowed or (media.endswith('+json') and 'application/json' in allowed)
+
+
+def content_length(response: requests.Response) -> Optional[int]:
+    """Content-Length ответа, если он указан и корректен"""
+    try:
+        return int(response.headers.get('Content-Length'))
+    except (TypeError, ValueError):
+        return None
+
+
+def read_limited(
+    response: requests.Response,
+    max_bytes: int,
+    deadline: float = DEFAULT_READ_DEADLINE
+) -> bool:
+    """Чтение тела потокового ответа не больше max_bytes
+    
+    Прочитанное тело сохраняется в ответе (response.content работает как обычно).
+    Возвращает True, если тело обрезано по лимиту или по времени.
+    """
+    chunks = []
+    size = 0
+    truncated = False
+    stop_at = time.monotonic() + deadline
+    
+    try:
+        for chunk in response.iter_content(READ_CHUNK_SIZE):
+            if size + len(chunk) > max_bytes:
+                chunks.append(chunk[:max_bytes - size])
+                truncated = True
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+            if time.monotonic() > stop_at:
+                truncated = True
+                break
+    finally:
+        response.close()
+    
+    response._content = b''.join(chunks)
+    response._content_consumed = True
+    return truncated
+
+
+def fetch_limited(
+    session: requests.Session,
+    url: str,
+    max_bytes: int = DEFAULT_MAX_RESPONSE_BYTES,
+    content_types: Optional[Iterable[str]] = None,
+    allow_truncated: bool = True,
+    timeout: int = 30,
+    **kwargs
+) -> requests.Response:
+    """GET запрос с проверкой заголовков до чтения тела (блокирующий, вызывается в потоке)
+    
+    Неподходящий тип содержимого отклоняется без загрузки тела. Тело читается
+    потоково до max_bytes; если обрезка недопустима (JSON), слишком большой
+    ответ отклоняется. Признак обрезки — атрибут response.truncated.
+    """
+    response = session.get(url, timeout=timeout, stream=True, **kwargs)
+    response.truncated = False
+    
+    # Тела ошибок небольшие и нужны только для raise_for_status
+    if response.status_code >= 300:
+        read_limited(response, min(max_bytes, READ_CHUNK_SIZE))
+        return response
+    
+    if content_types is not None and not is_allowed_content_type(
+        response.headers.get('Content-Type'), content_types
+    ):
+        response.close()
+        raise ResponseRejected(url, f"тип содержимого {media_type(response.headers.get('Content-Type'))}")
+    
+    length = content_length(response)
+    if length is not None and length > max_bytes:
+        if not allow_truncated:
+            response.close()
+            raise ResponseRejected(url, f"размер {length} байт больше лимита {max_bytes}")
+        logger.info(f"Ответ {url} ({length} байт) будет обрезан до {max_bytes} байт")
+    
+    response.truncated = read_limited(response, max_bytes)
+    if response.truncated and not allow_truncated:
+        raise ResponseRejected(url, f"тело больше лимита {max_bytes} байт")
+    return response
@@ -2,142 +2,312 @@
 Основной парсер для университетов
 """
 
+import json
 import re
-from typing import List, Dict, Any
-from bs4 import BeautifulSoup, Tag
+from typing import List, Dict, Any, Optional, Tuple
+from urllib.parse import urljoin
+from bs4 import Tag
 from loguru import logger
 
+from parser.anchored import find_record_blocks
+from parser.api_capture import map_api_item
 from parser.base import BaseParser
+from parser.candidates import MIN_CANDIDATE_CONFIDENCE, count_records
+from parser.classifier import ContainerClassifier
+from parser.dom import DomDocument, as_document
 from parser.extractors import StaffDataExtractor
+from parser.tables import extract_cell_table, extract_table
 from parser.validators import DataValidator
 
 
+# Признаки ссылки на персональную страницу
+PROFILE_URL_KEYWORDS = [
+    'person', 'people', 'staff', 'employee', 'sotrudnik', 'prepodavatel',
+    'teacher', 'profile', 'user', 'persona', 'author'
+]
+
+# Общие адреса сайта, которые не принадлежат сотруднику
+GENERIC_EMAIL_PREFIXES = [
+    'info', 'office', 'priem', 'rector', 'rectorat', 'admin', 'webmaster',
+    'press', 'pr', 'support', 'noreply', 'no-reply', 'mail', 'contact', 'abiturient'
+]
+
+
 class UniversityParser(BaseParser):
     """Парсер для сайтов российских университетов"""
     
-    def __init__(self, **kwargs):
+    # Селекторы контейнеров с данными о сотрудниках
+    container_selectors = [
+        # Таблицы
+        'table tr',
+        'tbody tr',
+        
+        # Списки
+        'ul li',
+        'ol li',
+        
+        # Карточки
+        '.staff-item',
+        '.employee',
+        '.person',
+        '.teacher',
+        '.professor',
+        '.staff',
+        '.team-member',
+        '.faculty-member',
+        
+        # Div контейнеры
+        'div[class*="staff"]',
+        'div[class*="employee"]',
+        'div[class*="person"]',
+        'div[class*="teacher"]',
+        'div[class*="faculty"]',
+        
+        # Статьи
+        'article',
+        '.card',
+        '.profile',
+        
+        # Специфичные для вузов
+        '.kafedra',
+        '.department',
+        '.chair',
+        '.prepodavatel',
+        '.sotrudnik'
+    ]
+    
+    def __init__(self, email_anchored: bool = True, **kwargs):
         super().__init__(**kwargs)
         self.extractor = StaffDataExtractor()
         self.validator = DataValidator()
+        self.classifier = ContainerClassifier()
+        self.email_anchored = email_anchored
+    
+    async def _extract_staff_data(self, doc: DomDocument, url: str) -> List[Dict[str, Any]]:
+        """Извлечение данных о сотрудниках (doc — документ DOM бэкенда или BeautifulSoup)"""
+        doc = as_document(doc)
+        self._strip_boilerplate(doc, url)
+        
+        # Таблицы сотрудников разбираются по столбцам и удаляются из документа
+        table_results = self._extract_from_tables(doc, url)
+        
+        # Списки с адресами разбираются от email к блоку записи: одна запись на человека
+        results = []
+        if self.email_anchored:
+            results = await self._extract_from_containers(doc, find_record_blocks(doc), url)
+            if count_records(results):
+                self.crawl_stats['email_anchored_pages'] += 1
+        
+        # Ищем различные структуры данных (одни фрагменты без ФИО не считаются находкой)
+        if not count_records(results):
+            results = await self._extract_from_containers(doc, self._find_staff_containers(doc), url)
+        results = table_results + results
+        
+        # Если не нашли структурированные данные, пробуем извлечь из текста
+        if not count_records(results):
+            results = results + await self._extract_from_text(doc, url)
+        
+        return results
+    
+    def _extract_from_tables(self, doc: DomDocument, url: str) -> List[Dict[str, Any]]:
+        """Записи из таблиц с распознанными столбцами ФИО, должности и адреса"""
+        results = []
+        staff_tables = []
+        
+        for table in doc.select('table'):
+            rows = extract_table(doc, table)
+            if not rows:
+                continue
+            staff_tables.append(table)
+            
+            # Оценки считаются по столбцам таблицы, а не построчно
+            confidences = self.validator.calculate_confidences(
+                [(row['fio'], row['email'], row['position']) for row in rows], url
+            )
+            for row, confidence in zip(rows, confidences):
+                if confidence < MIN_CANDIDATE_CONFIDENCE:
+                    continue
+                
+                results.append({
+                    'fio': row['fio'],
+                    'position': row['position'],
+                    'email': row['email'],
+                    'source': url,
+                    'confidence': confidence,
+                    'raw_html_snippet': doc.outer_html(row['row'], 500),
+                    'profile_url': self._find_profile_url(doc.links(row['fio_cell']), row['fio'], url)
+                })
+        
+        if staff_tables:
+            doc.remove(staff_tables)
+            self.crawl_stats['staff_tables'] += len(staff_tables)
+        return results
     
-    async def _extract_staff_data(self, soup: BeautifulSoup, url: str) -> List[Dict[str, Any]]:
-        """Извлечение данных о сотрудниках"""
+    def _records_from_blocks(self, payload: Dict[str, Any], url: str) -> List[Dict[str, Any]]:
+        """Записи из компактных описаний блоков и таблиц, собранных в браузере
+        
+        Таблицы разбираются по столбцам; строки таблиц без распознанных
+        столбцов оцениваются как обычные блоки. Из вложенных блоков,
+        прошедших классификатор, остаются самые внутренние. Вместо HTML
+        фрагмента в raw_html_snippet сохраняются путь блока и его текст.
+        """
         results = []
+        blocks = list(payload.get('blocks', []))
+        
+        for grid in payload.get('tables', []):
+            rows = extract_cell_table(grid)
+            if not rows:
+                blocks.extend(self._row_blocks(grid))
+                continue
+            self.crawl_stats['staff_tables'] += 1
+            
+            confidences = self.validator.calculate_confidences(
+                [(row['fio'], row['email'], row['position']) for row in rows], url
+            )
+            for row, confidence in zip(rows, confidences):
+                if confidence < MIN_CANDIDATE_CONFIDENCE:
+                    continue
+                results.append({
+                    'fio': row['fio'],
+                    'position': row['position'],
+                    'email': row['email'],
+                    'source': url,
+                    'confidence': confidence,
+                    'raw_html_snippet': ' | '.join(cell['text'] for cell in grid[row['index']])[:500],
+                    'profile_url': self._find_profile_url(row['fio_cell'].get('links', []), row['fio'], url)
+                })
         
-        # Ищем различные структуры данных
-        staff_containers = self._find_staff_containers(soup)
+        staff = self.classifier.classify_blocks(blocks)
+        outer = set()
+        for index in staff:
+            parent = blocks[index]['parent']
+            while parent >= 0 and parent not in outer:
+                outer.add(parent)
+                parent = blocks[parent]['parent']
+        for index in staff:
+            if index in outer:
+                continue
+            block = blocks[index]
+            text = block['text']
+            email = self.extractor.extract_email(text, mailto_hrefs=block['mailtos'])
+            record = self._build_record(text, email, f"{block['path']}: {text}"[:500], url, block['links'])
+            if record:
+                results.append(record)
+        
+        return results
+    
+    @staticmethod
+    def _row_blocks(grid: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Строки таблицы без распознанных столбцов как отдельные блоки"""
+        blocks = []
+        for cells in grid:
+            # Ячейка с colspan повторяется в сетке — соседние повторы пропускаем
+            cells = [cell for i, cell in enumerate(cells) if i == 0 or cell != cells[i - 1]]
+            links = [link for cell in cells for link in cell.get('links', [])]
+            blocks.append({
+                'text': ' '.join(cell['text'] for cell in cells if cell['text']),
+                'mailtos': [href for cell in cells for href in cell.get('mailtos', [])],
+                'links': links,
+                'path': 'tr',
+                'linkChars': sum(len(link_text) for _, link_text in links),
+                'depth': 0,
+                'siblings': len(grid) - 1,
+                'parent': -1
+            })
+        return blocks
+    
+    async def _extract_from_containers(self, doc: DomDocument, containers: List[Any], url: str) -> List[Dict[str, Any]]:
+        """Записи из найденных контейнеров"""
+        results = []
         
-        for container in staff_containers:
+        for container in containers:
             try:
-                staff_data = await self._extract_from_container(container, url)
+                staff_data = await self._extract_from_container(doc, container, url)
                 if staff_data:
                     results.append(staff_data)
             except Exception as e:
                 logger.warning(f"Ошибка при извлечении данных из контейнера: {e}")
                 continue
         
-        # Если не нашли структурированные данные, пробуем извлечь из текста
-        if not results:
-            results = await self._extract_from_text(soup, url)
-        
         return results
     
-    def _find_staff_containers(self, soup: BeautifulSoup) -> List[Tag]:
-        """Поиск контейнеров с данными о сотрудниках"""
-        containers = []
+    def _find_staff_containers(self, doc: DomDocument) -> List[Any]:
+        """Поиск контейнеров с данными о сотрудниках: кандидаты оцениваются классификатором вместе"""
+        return self.classifier.classify(doc, self._collect_candidates(doc))
         
-        # Ищем различные селекторы
-        selectors = [
-            # Таблицы
-            'table tr',
-            'tbody tr',
-            
-            # Списки
-            'ul li',
-            'ol li',
-            
-            # Карточки
-            '.staff-item',
-            '.employee',
-            '.person',
-            '.teacher',
-            '.professor',
-            '.staff',
-            '.team-member',
-            '.faculty-member',
-            
-            # Div контейнеры
-            'div[class*="staff"]',
-            'div[class*="employee"]',
-            'div[class*="person"]',
-            'div[class*="teacher"]',
-            'div[class*="faculty"]',
-            
-            # Статьи
-            'article',
-            '.card',
-            '.profile',
-            
-            # Специфичные для вузов
-            '.kafedra',
-            '.department',
-            '.chair',
-            '.prepodavatel',
-            '.sotrudnik'
-        ]
+    def _collect_candidates(self, doc: DomDocument) -> List[Any]:
+        """Кандидаты по всем селекторам без повторов (например, 'table tr' и 'tbody tr' находят одни и те же строки)"""
+        candidates = []
+        seen = set()
         
-        for selector in selectors:
-            elements = soup.select(selector)
-            for element in elements:
-                if self._is_staff_container(element):
-                    containers.append(element)
+        for selector in self.container_selectors:
+            for element in doc.select(selector):
+                if id(element) not in seen:
+                    seen.add(id(element))
+                    candidates.append(element)
         
-        return containers
+        return candidates
     
     def _is_staff_container(self, element: Tag) -> bool:
         """Проверка, является ли элемент контейнером с данными о сотруднике"""
-        text = element.get_text().lower()
-        
-        # Проверяем наличие ключевых слов
-        staff_keywords = [
-            'профессор', 'доцент', 'преподаватель', 'ассистент',
-            'заведующий', 'заведующая', 'декан', 'заместитель',
-            'старший', 'младший', 'ведущий', 'главный',
-            'научный сотрудник', 'исследователь', 'лаборант',
-            'professor', 'associate', 'assistant', 'lecturer',
-            'head', 'dean', 'director', 'researcher'
-        ]
+        return self._is_staff_text(element.get_text())
         
-        # Проверяем наличие email
-        has_email = bool(re.search(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', text))
-        
-        # Проверяем наличие ФИО (русские имена)
-        has_russian_name = bool(re.search(r'\b[А-ЯЁ][а-яё]+\s+[А-ЯЁ][а-яё]+(?:\s+[А-ЯЁ][а-яё]+)?\b', text))
-        
-        return (
-            any(keyword in text for keyword in staff_keywords) or
-            (has_email and has_russian_name) or
-            (has_russian_name and len(text.split()) >= 3)
-        )
+    def _is_staff_text(self, text: str) -> bool:
+        """Проверка текста контейнера на данные о сотруднике (текст в исходном регистре)"""
+        return self.classifier.is_staff_text(text)
     
-    async def _extract_from_container(self, container: Tag, url: str) -> Dict[str, Any]:
+    async def _extract_from_container(self, doc: DomDocument, container: Any, url: str) -> Dict[str, Any]:
         """Извлечение данных из контейнера"""
         # Извлекаем текст контейнера
-        text = container.get_text(strip=True)
+        text = doc.text(container, separator=" ", strip=True)
         
         # Извлекаем HTML для raw_snippet
-        raw_html = str(container)[:500]  # Ограничиваем размер
+        raw_html = doc.outer_html(container, 500)  # Ограничиваем размер
+        
+        email = self.extractor.extract_email(text, mailto_hrefs=doc.mailtos(container))
+        return self._build_record(text, email, raw_html, url, doc.links(container))
+    
+    def _records_from_api_items(self, items: List[Dict[str, Any]], url: str) -> List[Dict[str, Any]]:
+        """Преобразование объектов JSON API в записи о сотрудниках"""
+        results = []
         
+        for item in items:
+            mapped = map_api_item(item)
+            confidence = self.validator.calculate_confidence(
+                mapped['fio'], mapped['email'], mapped['position'], url
+            )
+            if confidence < MIN_CANDIDATE_CONFIDENCE:
+                continue
+            
+            results.append({
+                'fio': mapped['fio'],
+                'position': mapped['position'],
+                'email': mapped['email'],
+                'source': url,
+                'confidence': confidence,
+                'raw_html_snippet': json.dumps(item, ensure_ascii=False)[:500]
+            })
+        
+        return results
+    
+    def _build_record(
+        self,
+        text: str,
+        email: Optional[str],
+        raw_html: str,
+        url: str,
+        links: Optional[List[Tuple[str, str]]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Построение записи о сотруднике из текста контейнера"""
         # Извлекаем данные
         fio = self.extractor.extract_fio(text)
-        email = self.extractor.extract_email(text, container)
         position = self.extractor.extract_position(text)
         
         # Валидируем данные
         confidence = self.validator.calculate_confidence(fio, email, position, url)
         
         # Проверяем, что данные достаточно качественные
-        if confidence < 0.3:
+        if confidence < MIN_CANDIDATE_CONFIDENCE:
             return None
         
         return {
@@ -146,15 +316,99 @@ class UniversityParser(BaseParser):
             'email': email,
             'source': url,
             'confidence': confidence,
-            'raw_html_snippet': raw_html
+            'raw_html_snippet': raw_html,
+            'profile_url': self._find_profile_url(links or [], fio, url)
         }
     
-    async def _extract_from_text(self, soup: BeautifulSoup, url: str) -> List[Dict[str, Any]]:
-        """Извлечение данных из текста страницы"""
-        results = []
+    def _find_profile_url(self, links: List[Tuple[str, str]], fio: Optional[str], url: str) -> Optional[str]:
+        """Ссылка на персональную страницу сотрудника внутри контейнера"""
+        surname = fio.split()[0].lower() if fio else None
+        fallback = None
         
+        for href, text in links:
+            if not href or href.startswith(('mailto:', 'tel:', 'javascript:', '#')):
+                continue
+            
+            full_url = urljoin(url, href)
+            if full_url == url or not self._is_valid_internal_url(full_url, url):
+                continue
+            
+            # Ссылка на ФИО — почти наверняка профиль
+            if surname and surname in text.lower():
+                return full_url
+            
+            if fallback is None and any(keyword in href.lower() for keyword in PROFILE_URL_KEYWORDS):
+                fallback = full_url
+        
+        return fallback
+    
+    def _enrich_from_profile(self, record: Dict[str, Any], doc: DomDocument) -> bool:
+        """Перенос email, должности и телефона со страницы профиля"""
+        doc = as_document(doc)
+        text = doc.text(separator=' ')
+        text = re.sub(r'\s+', ' ', text)
+        changed = False
+        
+        # Должность и телефон ищем рядом с ФИО, а не в меню и подвале
+        surname = record['fio'].split()[0] if record.get('fio') else None
+        position_at = text.find(surname) if surname else -1
+        nearby = text[position_at:position_at + 400] if position_at >= 0 else text
+        
+        if not record.get('email'):
+            mailtos = doc.mailtos()
+            email = self._pick_profile_email(text, mailtos, record.get('fio'))
+            if email:
+                record['email'] = email
+                changed = True
+        
+        if not record.get('position'):
+            position = self.extractor.extract_position(nearby)
+            if position:
+                record['position'] = position
+                changed = True
+        
+        if not record.get('phone'):
+            phone = self.extractor.extract_phone(nearby)
+            if phone:
+                record['phone'] = phone
+                changed = True
+        
+        if changed:
+            record['confidence'] = self.validator.calculate_confidence(
+                record.get('fio'), record.get('email'), record.get('position'), record['source']
+            )
+        
+        return changed
+    
+    def _pick_profile_email(self, text: str, mailtos: List[str], fio: Optional[str]) -> Optional[str]:
+        """Email сотрудника на странице профиля (общие адреса сайта пропускаем)"""
+        candidates = []
+        for href in mailtos:
+            candidates.append(href.replace('mailto:', '').split('?')[0])
+        candidates.extend(re.findall(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', text))
+        
+        unique = list(dict.fromkeys(email.strip().lower() for email in candidates if email))
+        
+        # Лучше всего — адрес, совпадающий с ФИО
+        if fio:
+            for email in unique:
+                if self.validator.check_email_fio_match(email, fio):
+                    return email
+        
+        personal = [
+            email for email in unique
+            if email.split('@')[0] not in GENERIC_EMAIL_PREFIXES
+        ]
+        return personal[0] if len(personal) == 1 else None
+    
+    async def _extract_from_text(self, doc: DomDocument, url: str) -> List[Dict[str, Any]]:
+        """Извлечение данных из текста страницы"""
         # Получаем весь текст страницы
-        text = soup.get_text()
+        return self._extract_from_plain_text(as_document(doc).text(), url)
+    
+    def _extract_from_plain_text(self, text: str, url: str) -> List[Dict[str, Any]]:
+        """Извлечение данных из обычного текста"""
+        results = []
         
         # Ищем паттерны ФИО + должность + email
         patterns = [
@@ -178,7 +432,7 @@ class UniversityParser(BaseParser):
                 # Валидируем данные
                 confidence = self.validator.calculate_confidence(fio, email, position, url)
                 
-                if confidence >= 0.3:
+                if confidence >= MIN_CANDIDATE_CONFIDENCE:
                     results.append({
                         'fio': fio,
                         'position': position,
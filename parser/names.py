@@ -0,0 +1,219 @@
+"""
+Общая обработка ФИО: извлечение, нормализация и проверка с кэшированием результатов
+"""
+
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+from loguru import logger
+
+try:
+    from natasha import MorphVocab, NamesExtractor
+    NATASHA_AVAILABLE = True
+except ImportError:
+    NATASHA_AVAILABLE = False
+    logger.warning("natasha not installed. Names are extracted with regex only.")
+
+try:
+    import pymorphy2
+    PYMORPHY_AVAILABLE = True
+except ImportError:
+    PYMORPHY_AVAILABLE = False
+    logger.warning("pymorphy2 not installed. Names are not converted to nominative case.")
+
+
+# Паттерны для русских имен (в порядке надежности)
+FIO_PATTERNS = [
+    # Фамилия Имя Отчество
+    re.compile(r'\b([А-ЯЁ][а-яё]+)\s+([А-ЯЁ][а-яё]+)\s+([А-ЯЁ][а-яё]+)\b'),
+    # Фамилия Имя (или Имя Фамилия, менее надежно)
+    re.compile(r'\b([А-ЯЁ][а-яё]+)\s+([А-ЯЁ][а-яё]+)\b'),
+]
+
+VALID_FIO_RE = re.compile(r'^[А-ЯЁ][а-яё]+\s+[А-ЯЁ][а-яё]+(?:\s+[А-ЯЁ][а-яё]+)?$')
+
+# Инициалы: "А.", "А.В.", "а.в"
+INITIALS_RE = re.compile(r'^(?:[A-Za-zА-ЯЁа-яё]\.)+[A-Za-zА-ЯЁа-яё]?$')
+
+# Граммемы pymorphy2 для частей ФИО
+NAME_GRAMMEMES = {'Surn', 'Name', 'Patr'}
+
+DEFAULT_CACHE_SIZE = 20000
+
+# Транслитерация для поиска по латинскому написанию ФИО и адресам
+TRANSLIT = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e', 'ж': 'zh',
+    'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o',
+    'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'kh', 'ц': 'ts',
+    'ч': 'ch', 'ш': 'sh', 'щ': 'shch', 'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu',
+    'я': 'ya',
+})
+
+
+def transliterate(text: str) -> str:
+    """Латинское написание текста в нижнем регистре ("Щукин" -> "shchukin")"""
+    return (text or '').lower().translate(TRANSLIT)
+
+
+def _capitalize(word: str) -> str:
+    """Заглавная первая буква в каждой части (двойные фамилии через дефис)"""
+    return '-'.join(part[:1].upper() + part[1:].lower() for part in word.split('-'))
+
+
+class NameService:
+    """Извлечение, нормализация и проверка ФИО с ограниченными LRU кэшами
+    
+    Одни и те же фрагменты (хлебные крошки, заведующий в шапке, контакты в
+    подвале) повторяются на всех страницах обхода, поэтому результаты NER,
+    регулярных выражений и морфологии запоминаются по тексту.
+    """
+    
+    def __init__(self, cache_size: int = DEFAULT_CACHE_SIZE, use_morphology: bool = True):
+        self.names_extractor = None
+        self.morph = None
+        
+        if NATASHA_AVAILABLE:
+            try:
+                self.names_extractor = NamesExtractor(MorphVocab())
+            except Exception as e:
+                logger.warning(f"Ошибка инициализации NER: {e}")
+        
+        if use_morphology and PYMORPHY_AVAILABLE:
+            try:
+                self.morph = pymorphy2.MorphAnalyzer()
+            except Exception as e:
+                logger.warning(f"Ошибка инициализации pymorphy2: {e}")
+        
+        # Кэши по входному тексту (каждый экземпляр со своими кэшами)
+        self._caches = {
+            'extract': lru_cache(maxsize=cache_size)(self._extract),
+            'normalize': lru_cache(maxsize=cache_size)(self._normalize),
+            'validate': lru_cache(maxsize=cache_size)(self._is_valid),
+            'morph': lru_cache(maxsize=cache_size)(self._name_parses),
+        }
+    
+    def extract(self, text: str) -> Optional[str]:
+        """ФИО из текста: NER, затем regex; косвенный падеж приводится к именительному"""
+        if not text:
+            return None
+        return self._caches['extract'](text)
+    
+    def normalize(self, fio: str) -> str:
+        """Нормализованное ФИО: пробелы, регистр, инициалы, именительный падеж"""
+        if not fio:
+            return ""
+        return self._caches['normalize'](fio)
+    
+    def is_valid(self, fio: str) -> bool:
+        """Похоже ли полное ФИО на русское имя из двух-трех слов"""
+        if not fio:
+            return False
+        return self._caches['validate'](fio)
+    
+    def extract_regex(self, text: str) -> Optional[str]:
+        """Извлечение ФИО с помощью регулярных выражений"""
+        for pattern in FIO_PATTERNS:
+            match = pattern.search(text)
+            if match:
+                return ' '.join(match.groups())
+        return None
+    
+    def nominative(self, fio: str) -> str:
+        """ФИО в именительном падеже ("Иванову Ивану" -> "Иванов Иван")
+        
+        Меняются только части, которые pymorphy2 распознает как фамилию, имя
+        или отчество, и только если ни одна из них не может стоять в
+        именительном падеже. Род берется общий для частей ФИО.
+        """
+        if not self.morph:
+            return fio
+        
+        words = fio.split()
+        parses = [self._caches['morph'](word) for word in words]
+        named = [word_parses for word_parses in parses if word_parses]
+        if not named or any(parse.tag.case == 'nomn' for word_parses in named for parse in word_parses):
+            return fio
+        
+        genders = Counter(parse.tag.gender for word_parses in named for parse in word_parses if parse.tag.gender)
+        gender = genders.most_common(1)[0][0] if genders else None
+        
+        result = []
+        for word, word_parses in zip(words, parses):
+            if word_parses:
+                preferred = [parse for parse in word_parses if parse.tag.gender == gender] or list(word_parses)
+                form = preferred[0].inflect({'nomn'})
+                if form is not None:
+                    word = _capitalize(form.word)
+            result.append(word)
+        return ' '.join(result)
+    
+    def cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Попадания в кэши: hits, misses, размер и доля попаданий"""
+        stats = {}
+        for name, cached in self._caches.items():
+            info = cached.cache_info()
+            total = info.hits + info.misses
+            stats[name] = {
+                'hits': info.hits,
+                'misses': info.misses,
+                'size': info.currsize,
+                'hit_rate': round(info.hits / total, 3) if total else 0.0,
+            }
+        return stats
+    
+    def cache_clear(self):
+        """Очистка кэшей и статистики"""
+        for cached in self._caches.values():
+            cached.cache_clear()
+    
+    def _extract(self, text: str) -> Optional[str]:
+        fio = self._extract_ner(text) or self.extract_regex(text)
+        return self.nominative(fio) if fio else None
+    
+    def _extract_ner(self, text: str) -> Optional[str]:
+        """Первое имя, найденное NER natasha"""
+        if not self.names_extractor:
+            return None
+        try:
+            match = next(iter(self.names_extractor(text)), None)
+            name = match.fact if match else None
+            if name is not None and (name.last or name.first):
+                return ' '.join(part for part in (name.last, name.first, getattr(name, 'middle', None)) if part)
+        except Exception as e:
+            logger.debug(f"Ошибка NER извлечения ФИО: {e}")
+        return None
+    
+    def _normalize(self, fio: str) -> str:
+        words = []
+        for word in fio.replace(',', ' ').split():
+            if INITIALS_RE.match(word):
+                # Инициалы сохраняют точки: "а.в." -> "А.В."
+                words.append(word.upper() if word.endswith('.') else word.upper() + '.')
+            else:
+                word = word.replace('.', '')
+                if word:
+                    words.append(_capitalize(word))
+        return self.nominative(' '.join(words))
+    
+    def _is_valid(self, fio: str) -> bool:
+        # Проверяем, что это русские имена
+        if not VALID_FIO_RE.match(fio):
+            return False
+        # Проверяем длину каждого слова (не слишком короткое и не слишком длинное)
+        return all(2 <= len(word) <= 20 for word in fio.split())
+    
+    def _name_parses(self, word: str) -> Tuple[Any, ...]:
+        """Разборы слова как фамилии, имени или отчества"""
+        return tuple(parse for parse in self.morph.parse(word) if NAME_GRAMMEMES & parse.tag.grammemes)
+
+
+_service = None
+
+
+def get_name_service() -> NameService:
+    """Общий для процесса сервис имен (кэши и модели NER/морфологии загружаются один раз)"""
+    global _service
+    if _service is None:
+        _service = NameService()
+    return _service
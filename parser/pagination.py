@@ -0,0 +1,140 @@
+"""
+Поиск страниц пагинации в списках сотрудников
+"""
+
+import re
+from typing import List, Dict, Optional, Tuple
+from urllib.parse import urljoin, urlparse, parse_qsl, urlencode, urlunparse, urldefrag
+from bs4 import BeautifulSoup
+
+
+# Ссылка: (href, текст, rel)
+Anchor = Tuple[str, str, str]
+
+# Тексты ссылок "следующая страница"
+NEXT_TEXTS = {
+    'следующая', 'следующая страница', 'далее', 'вперед', 'вперёд', 'след.',
+    'next', 'next page', '»', '›', '→', '>', '>>'
+}
+
+# Параметры запроса с номером страницы (PAGEN_1 — 1С-Битрикс)
+PAGE_PARAM_RE = re.compile(r'^(page|p|pg|pagenum|page_num|pagen_\d+|paged|start|offset)$', re.IGNORECASE)
+PAGE_PATH_RE = re.compile(r'/(page|p)/(\d+)/?$', re.IGNORECASE)
+LETTER_RE = re.compile(r'^[А-ЯЁA-Z]$')
+
+# Минимум ссылок-букв, чтобы считать их алфавитным указателем
+MIN_LETTER_LINKS = 5
+
+
+def anchors_from_soup(soup: BeautifulSoup) -> List[Anchor]:
+    """Короткие ссылки страницы, среди которых может быть пагинация"""
+    anchors = []
+    
+    for link in soup.find_all('link', rel=True, href=True):
+        if 'next' in link.get('rel', []):
+            anchors.append((link['href'], '', 'next'))
+    
+    for link in soup.find_all('a', href=True):
+        text = link.get_text(strip=True)
+        if len(text) <= 20:
+            anchors.append((link['href'], text, ' '.join(link.get('rel', []))))
+    
+    return anchors
+
+
+def find_pagination_links(anchors: List[Anchor], page_url: str, max_pages: int = 20) -> List[str]:
+    """URL соседних страниц списка: "далее", номера страниц, буквы алфавита"""
+    base, _ = urldefrag(page_url)
+    # Сама страница под другим адресом: ?PAGEN_1=1 и URL без номера — одна страница
+    current = {base, _without_page_number(base)} if _page_number(base) == 1 else {base}
+    host = urlparse(base).netloc
+    found: List[str] = []
+    numbered: Dict[str, int] = {}
+    letters: List[str] = []
+    
+    def add(url: str):
+        if url not in current and url not in found and len(found) < max_pages:
+            found.append(url)
+    
+    for href, text, rel in anchors:
+        if not href or href.startswith(('mailto:', 'tel:', 'javascript:', '#')):
+            continue
+        
+        url, _ = urldefrag(urljoin(base, href))
+        if urlparse(url).netloc != host:
+            continue
+        
+        text_lower = text.lower().strip()
+        if 'next' in rel.split() or text_lower in NEXT_TEXTS:
+            add(url)
+        elif text.isdigit() and _page_number(url) is not None:
+            numbered[url] = int(text)
+        elif LETTER_RE.match(text):
+            letters.append(url)
+    
+    # Номера страниц: пропуски вида "1 2 3 ... 12" восстанавливаем по шаблону
+    # (URL не больше, чем может пройти через add: бюджет, повторы и сама страница)
+    for url in _fill_page_gaps(numbered, max_pages + len(current)):
+        add(url)
+    
+    if len(set(letters)) >= MIN_LETTER_LINKS:
+        for url in letters:
+            add(url)
+    
+    return found
+
+
+def _page_number(url: str) -> Optional[int]:
+    """Номер страницы из параметра запроса или пути"""
+    parsed = urlparse(url)
+    for key, value in parse_qsl(parsed.query):
+        if PAGE_PARAM_RE.match(key) and value.isdigit():
+            return int(value)
+    
+    match = PAGE_PATH_RE.search(parsed.path)
+    if match:
+        return int(match.group(2))
+    
+    return None
+
+
+def _with_page_number(url: str, number: int) -> str:
+    """URL с другим номером страницы (по тому же шаблону)"""
+    parsed = urlparse(url)
+    query = parse_qsl(parsed.query, keep_blank_values=True)
+    if any(PAGE_PARAM_RE.match(key) for key, _ in query):
+        query = [(key, str(number) if PAGE_PARAM_RE.match(key) else value) for key, value in query]
+        return urlunparse(parsed._replace(query=urlencode(query)))
+    
+    path = PAGE_PATH_RE.sub(lambda m: f'/{m.group(1)}/{number}/', parsed.path)
+    return urlunparse(parsed._replace(path=path))
+
+
+def _without_page_number(url: str) -> str:
+    """URL первой страницы: без параметра или сегмента пути с номером"""
+    parsed = urlparse(url)
+    query = parse_qsl(parsed.query, keep_blank_values=True)
+    if any(PAGE_PARAM_RE.match(key) for key, _ in query):
+        query = [(key, value) for key, value in query if not PAGE_PARAM_RE.match(key)]
+        return urlunparse(parsed._replace(query=urlencode(query)))
+    
+    return urlunparse(parsed._replace(path=PAGE_PATH_RE.sub('/', parsed.path)))
+
+
+def _fill_page_gaps(numbered: Dict[str, int], limit: int) -> List[str]:
+    """Страницы от 1 до максимального видимого номера, не больше limit первых"""
+    if not numbered:
+        return list(numbered)
+    
+    template = max(numbered, key=numbered.get)
+    template_number = _page_number(template)
+    last_page = numbered[template]
+    
+    # Нумерация по offset/start идет с шагом размера страницы — не достраиваем
+    if template_number != last_page:
+        return list(numbered)
+    
+    # Первая страница списка — URL без номера (?PAGEN_1=1 и /page/1/ ведут туда же),
+    # поэтому она всегда приводится к нему и не обходится дважды
+    last_page = min(last_page, limit)
+    return [_without_page_number(template)] + [_with_page_number(template, n) for n in range(2, last_page + 1)]
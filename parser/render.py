@@ -0,0 +1,426 @@
+"""
+Настройки и вспомогательные функции JS рендеринга через Playwright
+"""
+
+import time
+from typing import Dict, Any, Iterable, List, Optional
+from urllib.parse import urlparse
+from loguru import logger
+
+
+# Типы ресурсов, не нужные для извлечения данных о сотрудниках
+DEFAULT_BLOCKED_RESOURCE_TYPES = (
+    'image', 'media', 'font', 'stylesheet', 'texttrack', 'manifest'
+)
+
+# Счетчики, аналитика и реклама, часто встречающиеся на сайтах вузов
+DEFAULT_BLOCKED_HOSTS = (
+    'google-analytics.com', 'googletagmanager.com', 'doubleclick.net',
+    'googlesyndication.com', 'mc.yandex.ru', 'an.yandex.ru', 'yandex.ru/ads',
+    'top-fwz1.mail.ru', 'top.mail.ru', 'counter.yadro.ru', 'liveinternet.ru',
+    'connect.facebook.net', 'vk.com/rtrg', 'static.addtoany.com',
+    'cdn.jivosite.com', 'code.jivo.ru', 'widget.sender.mobi'
+)
+
+# Типичные размеры ресурсов (байт) для оценки сэкономленного трафика:
+# заблокированный запрос не скачивается, поэтому точный размер неизвестен
+ESTIMATED_RESOURCE_SIZES = {
+    'image': 80_000,
+    'media': 500_000,
+    'font': 40_000,
+    'stylesheet': 30_000,
+    'script': 40_000,
+    'texttrack': 5_000,
+    'manifest': 2_000,
+}
+DEFAULT_ESTIMATED_SIZE = 10_000
+
+# Ожидание готовности DOM: страница считается готовой, когда мутации
+# затихли на quietMs (или на staffQuietMs, если уже видны email/ФИО),
+# но не позже timeoutMs
+DOM_READY_SCRIPT = r"""
+({quietMs, staffQuietMs, timeoutMs, minMatches}) => new Promise((resolve) => {
+    const started = performance.now();
+    const emailRe = /[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}/g;
+    const nameRe = /[А-ЯЁ][а-яё]+\s+[А-ЯЁ][а-яё]+\s+[А-ЯЁ][а-яё]+/g;
+    let quietTimer = null;
+    let checkTimer = null;
+    let hardTimer = null;
+    let staffSeen = false;
+    let done = false;
+    
+    const hasStaffContent = () => {
+        const text = document.body ? document.body.innerText : '';
+        const emails = (text.match(emailRe) || []).length
+            + document.querySelectorAll('a[href^="mailto:"]').length;
+        const names = (text.match(nameRe) || []).length;
+        return emails >= minMatches || names >= minMatches;
+    };
+    
+    const finish = (reason) => {
+        if (done) return;
+        done = true;
+        observer.disconnect();
+        clearTimeout(quietTimer);
+        clearTimeout(hardTimer);
+        clearInterval(checkTimer);
+        resolve({reason, elapsed_ms: Math.round(performance.now() - started), staff_seen: staffSeen});
+    };
+    
+    const armQuiet = () => {
+        clearTimeout(quietTimer);
+        quietTimer = setTimeout(() => finish(staffSeen ? 'staff_content' : 'quiet'),
+                                staffSeen ? staffQuietMs : quietMs);
+    };
+    
+    const observer = new MutationObserver(armQuiet);
+    observer.observe(document.documentElement, {childList: true, subtree: true, characterData: true});
+    
+    // Проверка содержимого не на каждую мутацию, а периодически
+    const checkStaff = () => {
+        if (!staffSeen && hasStaffContent()) {
+            staffSeen = true;
+            armQuiet();
+        }
+    };
+    checkTimer = setInterval(checkStaff, 150);
+    hardTimer = setTimeout(() => finish('timeout'), timeoutMs);
+    
+    checkStaff();
+    armQuiet();
+})
+"""
+
+
+class RenderProfile:
+    """Профиль рендеринга: какие запросы браузера блокировать"""
+    
+    def __init__(
+        self,
+        blocked_resource_types: Optional[Iterable[str]] = None,
+        blocked_hosts: Optional[Iterable[str]] = None,
+        allowed_hosts: Optional[Iterable[str]] = None,
+        enabled: bool = True
+    ):
+        self.blocked_resource_types = set(
+            DEFAULT_BLOCKED_RESOURCE_TYPES if blocked_resource_types is None else blocked_resource_types
+        )
+        self.blocked_hosts = list(DEFAULT_BLOCKED_HOSTS if blocked_hosts is None else blocked_hosts)
+        self.allowed_hosts = list(allowed_hosts or [])
+        self.enabled = enabled
+    
+    def should_block(self, resource_type: str, url: str) -> bool:
+        """Нужно ли прервать запрос (разрешающие правила важнее запрещающих)"""
+        if not self.enabled:
+            return False
+        
+        target = self._host_and_path(url)
+        if any(self._matches(target, rule) for rule in self.allowed_hosts):
+            return False
+        
+        if any(self._matches(target, rule) for rule in self.blocked_hosts):
+            return True
+        
+        return resource_type in self.blocked_resource_types
+    
+    @staticmethod
+    def estimated_size(resource_type: str) -> int:
+        """Оценка размера заблокированного ресурса"""
+        return ESTIMATED_RESOURCE_SIZES.get(resource_type, DEFAULT_ESTIMATED_SIZE)
+    
+    @staticmethod
+    def _host_and_path(url: str) -> str:
+        parsed = urlparse(url)
+        return f"{(parsed.hostname or '').lower()}{parsed.path}"
+    
+    @staticmethod
+    def _matches(target: str, rule: str) -> bool:
+        """Правило — домен (с поддоменами) и необязательный префикс пути"""
+        rule = rule.lower()
+        host, _, path = rule.partition('/')
+        target_host, _, target_path = target.partition('/')
+        
+        if target_host != host and not target_host.endswith('.' + host):
+            return False
+        return not path or target_path.startswith(path)
+
+
+# Сбор кандидатов прямо в браузере вместо передачи DOM в Python. Для каждого
+# совпадения селекторов передается компактное описание: текст без script и
+# style, адреса mailto, первые ссылки, путь из тегов и классов, признаки
+# положения для классификатора и индекс ближайшего совпавшего предка. Таблицы
+# со строками-совпадениями передаются сеткой ячеек (text, mailtos, links)
+# для разбора по столбцам. Содержимое nav пропускается.
+EXTRACT_BLOCKS_SCRIPT = r"""
+({selectors, maxBlocks, maxLinks}) => {
+    const SKIP = 'script, style, noscript, template, svg';
+    
+    const textOf = (el) => {
+        const parts = [];
+        const walker = document.createTreeWalker(el, NodeFilter.SHOW_TEXT);
+        for (let node = walker.nextNode(); node; node = walker.nextNode()) {
+            const value = node.nodeValue.trim();
+            if (value && !node.parentElement.closest(SKIP)) parts.push(value);
+        }
+        return parts.join(' ');
+    };
+    const mailtosOf = (el) => Array.from(el.querySelectorAll('a[href^="mailto:"]'), (a) => a.getAttribute('href'));
+    const linksOf = (el) => Array.from(el.querySelectorAll('a[href]'))
+        .slice(0, maxLinks)
+        .map((a) => [a.getAttribute('href'), (a.textContent || '').trim()]);
+    const stepOf = (el) => el.tagName.toLowerCase() + Array.from(el.classList, (c) => '.' + c).join('');
+    const pathOf = (el) => {
+        const steps = [];
+        for (let node = el; node && node !== document.body && steps.length < 3; node = node.parentElement) {
+            steps.unshift(stepOf(node));
+        }
+        return steps.join(' > ');
+    };
+    
+    const matched = new Set();
+    const tables = new Set();
+    for (const selector of selectors) {
+        let elements;
+        try {
+            elements = document.querySelectorAll(selector);
+        } catch (e) {
+            continue;
+        }
+        for (const el of elements) {
+            if (el.closest('nav')) continue;
+            const table = el.tagName === 'TR' ? el.closest('table') : null;
+            if (table) tables.add(table);
+            else matched.add(el);
+        }
+    }
+    
+    // Содержимое таблиц передается сеткой ячеек, а не отдельными блоками
+    const inTable = (el) => {
+        for (let table = el.closest('table'); table; table = table.parentElement && table.parentElement.closest('table')) {
+            if (tables.has(table)) return true;
+        }
+        return false;
+    };
+    const elements = Array.from(matched).filter((el) => !inTable(el));
+    elements.sort((a, b) => (a.compareDocumentPosition(b) & Node.DOCUMENT_POSITION_FOLLOWING) ? -1 : 1);
+    const kept = elements.slice(0, maxBlocks);
+    const indexes = new Map(kept.map((el, index) => [el, index]));
+    
+    const blocks = kept.map((el) => {
+        let parent = -1;
+        for (let node = el.parentElement; node; node = node.parentElement) {
+            if (indexes.has(node)) {
+                parent = indexes.get(node);
+                break;
+            }
+        }
+        let depth = 1;
+        for (let node = el.parentElement; node; node = node.parentElement) depth++;
+        const siblings = el.parentElement
+            ? Array.from(el.parentElement.children).filter((child) => child.tagName === el.tagName).length - 1
+            : 0;
+        const linkChars = Array.from(el.querySelectorAll('a[href]'))
+            .reduce((total, a) => total + textOf(a).length, 0);
+        return {
+            text: textOf(el),
+            mailtos: mailtosOf(el),
+            links: linksOf(el),
+            path: pathOf(el),
+            linkChars,
+            depth,
+            siblings,
+            parent
+        };
+    });
+    
+    const cellOf = (cell) => {
+        const data = {text: textOf(cell)};
+        const mailtos = mailtosOf(cell);
+        const links = linksOf(cell);
+        if (mailtos.length) data.mailtos = mailtos;
+        if (links.length) data.links = links;
+        return data;
+    };
+    const grids = Array.from(tables).map((table) => Array.from(table.rows, (row) => {
+        const cells = [];
+        for (const cell of row.cells) {
+            const data = cellOf(cell);
+            const span = Math.max(1, Math.min(cell.colSpan || 1, 20));
+            for (let i = 0; i < span; i++) cells.push(data);
+        }
+        return cells;
+    }));
+    
+    // Короткие ссылки для поиска пагинации
+    const anchors = Array.from(document.querySelectorAll('a[href], link[rel~="next"][href]'))
+        .map((a) => [a.getAttribute('href'), (a.textContent || '').trim(), a.getAttribute('rel') || ''])
+        .filter((a) => a[1].length <= 20);
+    
+    return {
+        blocks,
+        tables: grids,
+        anchors,
+        truncated: elements.length > maxBlocks
+    };
+}
+"""
+
+# HTML всей страницы (второй запрос, если области ничего не дали)
+PAGE_HTML_SCRIPT = '() => document.documentElement.outerHTML'
+
+# Нажатие видимой кнопки "Показать ещё" (ссылки с настоящим href не трогаем,
+# чтобы не уйти со страницы)
+LOAD_MORE_SCRIPT = r"""
+(pattern) => {
+    const re = new RegExp(pattern, 'i');
+    const candidates = document.querySelectorAll(
+        'button, a, [role="button"], input[type="button"], input[type="submit"]'
+    );
+    for (const el of candidates) {
+        const text = (el.innerText || el.value || '').trim();
+        if (!text || text.length > 40 || !re.test(text) || el.disabled) continue;
+        const href = el.tagName === 'A' ? (el.getAttribute('href') || '') : '';
+        if (href && !href.startsWith('#') && !href.startsWith('javascript')) continue;
+        const rect = el.getBoundingClientRect();
+        if (rect.width === 0 || rect.height === 0) continue;
+        el.scrollIntoView({block: 'center'});
+        el.click();
+        return true;
+    }
+    return false;
+}
+"""
+
+# Признаки бесконечной прокрутки, при которых имеет смысл прокручивать страницу
+INFINITE_SCROLL_SCRIPT = r"""
+() => {
+    const hint = document.querySelector(
+        '[class*="infinite"], [data-infinite-scroll], [class*="load-more"], [data-next-page], [class*="lazyload"]'
+    );
+    if (!hint) return false;
+    window.scrollTo(0, document.documentElement.scrollHeight);
+    return true;
+}
+"""
+
+LOAD_MORE_PATTERN = r'^(показать|загрузить) (ещ[её]|больше|всех|все)|^ещ[её]$|^(load|show) more|^more$'
+PAGE_HEIGHT_SCRIPT = '() => document.documentElement.scrollHeight'
+PAGE_GREW_SCRIPT = '(height) => document.documentElement.scrollHeight > height'
+
+
+def new_render_stats() -> Dict[str, Any]:
+    """Пустая статистика рендеринга страницы"""
+    return {
+        'blocked_requests': 0,
+        'bytes_saved': 0,
+        'loaded_requests': 0,
+        'bytes_loaded': 0,
+        'extracted_blocks': 0,
+        'transfer_chars': 0,
+    }
+
+
+async def install_request_interception(page, profile: RenderProfile, stats: Dict[str, Any]):
+    """Перехват запросов страницы: блокировка лишних ресурсов и учет трафика"""
+    
+    async def handle_route(route):
+        request = route.request
+        try:
+            if profile.should_block(request.resource_type, request.url):
+                stats['blocked_requests'] += 1
+                stats['bytes_saved'] += profile.estimated_size(request.resource_type)
+                await route.abort()
+            else:
+                await route.continue_()
+        except Exception as e:
+            logger.debug(f"Ошибка перехвата запроса {request.url}: {e}")
+    
+    def handle_response(response):
+        stats['loaded_requests'] += 1
+        try:
+            stats['bytes_loaded'] += int(response.headers.get('content-length', 0))
+        except ValueError:
+            pass
+    
+    if profile.enabled:
+        await page.route('**/*', handle_route)
+    page.on('response', handle_response)
+
+
+async def wait_for_dom_ready(
+    page,
+    timeout_ms: int,
+    quiet_ms: int = 400,
+    staff_quiet_ms: int = 100,
+    min_matches: int = 2
+) -> Dict[str, Any]:
+    """Адаптивное ожидание: DOM затих или появились данные сотрудников"""
+    if timeout_ms <= 0:
+        return {'reason': 'timeout', 'elapsed_ms': 0, 'staff_seen': False}
+    
+    try:
+        return await page.evaluate(DOM_READY_SCRIPT, {
+            'quietMs': quiet_ms,
+            'staffQuietMs': staff_quiet_ms,
+            'timeoutMs': timeout_ms,
+            'minMatches': min_matches
+        })
+    except Exception as e:
+        # Например, JS-редирект уничтожил контекст выполнения
+        logger.debug(f"Ошибка ожидания готовности DOM: {e}")
+        return {'reason': 'error', 'elapsed_ms': 0, 'staff_seen': False}
+
+
+async def extract_candidate_blocks(
+    page,
+    selectors: List[str],
+    max_blocks: int = 2000,
+    max_links: int = 10
+) -> Dict[str, Any]:
+    """Сбор компактных описаний кандидатов и таблиц в браузере"""
+    return await page.evaluate(EXTRACT_BLOCKS_SCRIPT, {
+        'selectors': selectors,
+        'maxBlocks': max_blocks,
+        'maxLinks': max_links
+    })
+
+
+def payload_chars(payload: Dict[str, Any]) -> int:
+    """Объем текста, переданного из браузера (тексты блоков и ячеек)"""
+    blocks = sum(len(block['text']) for block in payload.get('blocks', []))
+    cells = sum(len(cell['text']) for grid in payload.get('tables', []) for row in grid for cell in row)
+    return blocks + cells
+
+
+async def expand_listing(page, max_steps: int, deadline: float, step_timeout_ms: int = 5000) -> int:
+    """Раскрытие списка: кнопки "Показать ещё" и бесконечная прокрутка
+    
+    deadline — момент time.monotonic(), после которого раскрытие прекращается:
+    каждое ожидание получает не больше оставшегося до него времени.
+    """
+    steps = 0
+    
+    def remaining_ms() -> int:
+        return min(step_timeout_ms, int((deadline - time.monotonic()) * 1000))
+    
+    for _ in range(max_steps):
+        if remaining_ms() <= 0:
+            break
+        try:
+            height = await page.evaluate(PAGE_HEIGHT_SCRIPT)
+            clicked = await page.evaluate(LOAD_MORE_SCRIPT, LOAD_MORE_PATTERN)
+            if not clicked and not await page.evaluate(INFINITE_SCROLL_SCRIPT):
+                break
+            
+            # Ждем, пока подгрузится новая порция, затем пока DOM затихнет
+            timeout_ms = remaining_ms()
+            if timeout_ms <= 0:
+                break
+            await page.wait_for_function(PAGE_GREW_SCRIPT, arg=height, timeout=timeout_ms)
+            await wait_for_dom_ready(page, remaining_ms(), quiet_ms=300, staff_quiet_ms=300)
+            steps += 1
+        except Exception as e:
+            logger.debug(f"Раскрытие списка остановлено: {e}")
+            break
+    
+    return steps
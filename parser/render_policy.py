@@ -0,0 +1,143 @@
+"""
+Обучаемое решение о необходимости JS рендеринга по доменам
+"""
+
+import re
+import time
+from typing import Dict, Any, Optional
+from urllib.parse import urlparse
+from loguru import logger
+
+from utils.json_state import JsonStateFile
+
+
+# Возможные решения
+DECISION_HTML = 'html'
+DECISION_RENDER = 'render'
+
+
+class RenderDecisionStore:
+    """Статистика пользы JS рендеринга по доменам и шаблонам URL"""
+    
+    def __init__(
+        self,
+        path: str = 'data/render_decisions.json',
+        min_observations: int = 3,
+        render_ratio: float = 0.5,
+        explore_every: int = 10
+    ):
+        self.state = JsonStateFile(path)
+        self.min_observations = min_observations
+        self.render_ratio = render_ratio
+        self.explore_every = explore_every
+        self.domains = self.state.load()
+    
+    @staticmethod
+    def url_pattern(url: str) -> str:
+        """Шаблон URL: первые два сегмента пути, числа заменены на {n}"""
+        path = urlparse(url).path
+        segments = [s for s in path.split('/') if s][:2]
+        segments = [re.sub(r'\d+', '{n}', s) for s in segments]
+        return '/' + '/'.join(segments)
+    
+    def decide(self, url: str) -> Optional[str]:
+        """Решение для URL: 'html', 'render' или None, если данных мало"""
+        domain_stats = self.domains.get(urlparse(url).netloc)
+        if not domain_stats:
+            return None
+        
+        # Сначала шаблон URL, затем домен целиком
+        pattern_stats = domain_stats['patterns'].get(self.url_pattern(url))
+        for stats in (pattern_stats, domain_stats['total']):
+            decision = self._decide_from_stats(stats)
+            if decision:
+                return decision
+        
+        return None
+    
+    def should_explore(self, url: str) -> bool:
+        """Перепроверка решения: каждая N-я страница домена идет обоими путями
+        
+        Только проверка, счетчик не меняется: страница учитывается отдельно
+        через count_decided_page, когда решение действительно применено.
+        """
+        domain_stats = self.domains.get(urlparse(url).netloc)
+        if not domain_stats:
+            return True
+        
+        decided_pages = domain_stats['total'].get('decided_pages', 0)
+        return (decided_pages + 1) % self.explore_every == 0
+    
+    def count_decided_page(self, url: str):
+        """Учет страницы домена, обработанной по выученному решению или перепроверке"""
+        domain_stats = self.domains.get(urlparse(url).netloc)
+        if not domain_stats:
+            return
+        
+        total = domain_stats['total']
+        total['decided_pages'] = total.get('decided_pages', 0) + 1
+    
+    def record(self, url: str, html_count: int, render_added: int):
+        """Учет наблюдения: сколько записей дал HTML и сколько добавил рендеринг"""
+        domain = urlparse(url).netloc
+        domain_stats = self.domains.setdefault(domain, {
+            'total': self._empty_stats(),
+            'patterns': {}
+        })
+        pattern_stats = domain_stats['patterns'].setdefault(
+            self.url_pattern(url), self._empty_stats()
+        )
+        
+        for stats in (domain_stats['total'], pattern_stats):
+            stats['observations'] += 1
+            stats['html_records'] += html_count
+            if render_added > 0:
+                stats['render_helped'] += 1
+            stats['updated_at'] = time.time()
+    
+    def snapshot(self, url: str) -> Dict[str, Any]:
+        """Состояние решения для статистики обхода"""
+        domain_stats = self.domains.get(urlparse(url).netloc, {})
+        pattern = self.url_pattern(url)
+        return {
+            'pattern': pattern,
+            'decision': self.decide(url),
+            'stats': domain_stats.get('patterns', {}).get(pattern)
+        }
+    
+    def save(self):
+        """Сохранение решений на диск"""
+        self.state.save(self.domains)
+    
+    def _decide_from_stats(self, stats: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Решение по накопленной статистике"""
+        if not stats or stats['observations'] < self.min_observations:
+            return None
+        
+        helped_ratio = stats['render_helped'] / stats['observations']
+        if helped_ratio >= self.render_ratio:
+            return DECISION_RENDER
+        if stats['render_helped'] == 0:
+            return DECISION_HTML
+        
+        return None
+    
+    @staticmethod
+    def _empty_stats() -> Dict[str, Any]:
+        return {
+            'observations': 0,
+            'html_records': 0,
+            'render_helped': 0,
+            'updated_at': 0.0
+        }
+
+
+_stores: Dict[str, RenderDecisionStore] = {}
+
+
+def get_render_decision_store(path: str = 'data/render_decisions.json') -> RenderDecisionStore:
+    """Общее для процесса хранилище решений (одно на файл)"""
+    if path not in _stores:
+        _stores[path] = RenderDecisionStore(path)
+        logger.debug(f"Загружены решения о рендеринге: {len(_stores[path].domains)} доменов")
+    return _stores[path]
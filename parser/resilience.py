@@ -0,0 +1,137 @@
+"""
+Повторные попытки запросов и автоматический выключатель для недоступных хостов
+"""
+
+import random
+import time
+from typing import Dict, Any, Iterable, Optional
+from urllib.parse import urlparse
+from loguru import logger
+
+import requests
+from playwright.async_api import Error as PlaywrightError, TimeoutError as PlaywrightTimeoutError
+
+
+# Статусы, после которых имеет смысл повторить запрос
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Хост временно считается недоступным, запросы к нему не выполняются"""
+    
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f"Хост {host} недоступен, повтор через {retry_in:.0f} сек")
+        self.host = host
+        self.retry_in = retry_in
+
+
+class RetryPolicy:
+    """Повторы идемпотентных запросов с экспоненциальной задержкой и случайным разбросом"""
+    
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 10.0,
+        retry_statuses: Optional[Iterable[int]] = None
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = set(retry_statuses) if retry_statuses is not None else set(RETRY_STATUSES)
+    
+    def backoff(self, attempt: int) -> float:
+        """Пауза перед повтором номер attempt (full jitter)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+    
+    def is_retryable(self, error: Exception) -> bool:
+        """Временная ли ошибка: сбой сети, таймаут или статус перегрузки"""
+        if isinstance(error, CircuitOpenError):
+            return False
+        if isinstance(error, (requests.Timeout, requests.ConnectionError)):
+            return True
+        if isinstance(error, requests.HTTPError):
+            return error.response is not None and error.response.status_code in self.retry_statuses
+        if isinstance(error, PlaywrightTimeoutError):
+            return True
+        if isinstance(error, PlaywrightError):
+            return 'net::ERR_' in str(error)
+        return False
+
+
+class CircuitBreaker:
+    """Выключатель по хостам: после серии сбоев запросы к хосту сразу отклоняются
+    
+    Сбой — запрос, не выполненный после всех повторов (попытки одного запроса
+    считаются одним сбоем). Выключатель общий для процесса, поэтому порог
+    рассчитан на несколько задач, одновременно обходящих один хост.
+    Через reset_timeout секунд пропускается один пробный запрос: при успехе
+    хост снова доступен, при ошибке выключатель открывается заново.
+    """
+    
+    def __init__(self, failure_threshold: int = 10, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._hosts: Dict[str, Dict[str, Any]] = {}
+    
+    def _state(self, url: str) -> Dict[str, Any]:
+        host = urlparse(url).netloc
+        if host not in self._hosts:
+            self._hosts[host] = {'host': host, 'failures': 0, 'opened_at': None, 'trial_at': None}
+        return self._hosts[host]
+    
+    def _trial_allowed(self, state: Dict[str, Any]) -> bool:
+        """Можно ли пропустить пробный запрос (зависший пробный запрос не блокирует хост навсегда)"""
+        now = time.monotonic()
+        if now - state['opened_at'] < self.reset_timeout:
+            return False
+        return state['trial_at'] is None or now - state['trial_at'] >= self.reset_timeout
+    
+    def is_open(self, url: str) -> bool:
+        """Запросы к хосту сейчас отклоняются"""
+        state = self._state(url)
+        return state['opened_at'] is not None and not self._trial_allowed(state)
+    
+    def check(self, url: str):
+        """Проверка перед запросом; CircuitOpenError, если хост выключен"""
+        state = self._state(url)
+        if state['opened_at'] is None:
+            return
+        
+        if self._trial_allowed(state):
+            # Полуоткрытое состояние: один пробный запрос
+            state['trial_at'] = time.monotonic()
+            return
+        
+        retry_in = self.reset_timeout - (time.monotonic() - state['opened_at'])
+        raise CircuitOpenError(state['host'], max(0.0, retry_in))
+    
+    def record_success(self, url: str):
+        """Успешный запрос закрывает выключатель"""
+        state = self._state(url)
+        if state['opened_at'] is not None:
+            logger.info(f"Хост {state['host']} снова доступен")
+        state.update(failures=0, opened_at=None, trial_at=None)
+    
+    def record_failure(self, url: str):
+        """Сбой запроса после всех повторов; после failure_threshold подряд хост выключается"""
+        state = self._state(url)
+        state['failures'] += 1
+        if state['trial_at'] is not None or state['failures'] >= self.failure_threshold:
+            if state['opened_at'] is None:
+                logger.warning(
+                    f"Хост {state['host']} недоступен ({state['failures']} сбоев подряд), "
+                    f"запросы приостановлены на {self.reset_timeout:.0f} сек"
+                )
+            state.update(opened_at=time.monotonic(), trial_at=None)
+
+
+_breaker = None
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Общий для процесса выключатель (недоступный хост не занимает задачи других пользователей)"""
+    global _breaker
+    if _breaker is None:
+        _breaker = CircuitBreaker()
+    return _breaker
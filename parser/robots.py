@@ -0,0 +1,281 @@
+"""
+Разбор robots.txt и кэш правил по хостам
+"""
+
+import asyncio
+import contextlib
+import re
+import time
+from typing import List, Dict, Optional, Tuple
+from urllib.parse import urlparse, unquote
+from loguru import logger
+
+import requests
+
+from parser.fetch import fetch_limited
+from parser.scheduler import get_host_scheduler
+
+
+# Токен продукта, по которому выбирается группа правил
+ROBOTS_USER_AGENT = 'UniParser'
+
+# Сколько байт robots.txt разбирается (RFC 9309: не меньше 500 KiB)
+ROBOTS_MAX_BYTES = 512 * 1024
+
+# Правило: (разрешает ли, шаблон пути)
+Rule = Tuple[bool, str]
+
+
+class RobotsRules:
+    """Правила robots.txt одного хоста (RFC 9309)"""
+    
+    def __init__(self, groups: Optional[List[Dict]] = None, sitemaps: Optional[List[str]] = None):
+        # Группа: {'agents': [...], 'rules': [...], 'crawl_delay': float | None}
+        self.groups = groups or []
+        self.sitemaps = sitemaps or []
+    
+    @classmethod
+    def disallow_all(cls) -> 'RobotsRules':
+        """Полный запрет обхода (robots.txt временно недоступен)"""
+        return cls([{'agents': ['*'], 'rules': [(False, '/')], 'crawl_delay': None}])
+    
+    @classmethod
+    def parse(cls, content: str) -> 'RobotsRules':
+        """Разбор текста robots.txt"""
+        groups: List[Dict] = []
+        sitemaps: List[str] = []
+        current = None
+        in_agents = False
+        
+        for raw_line in content.splitlines():
+            line = raw_line.split('#', 1)[0].strip()
+            if ':' not in line:
+                continue
+            
+            field, value = line.split(':', 1)
+            field = field.strip().lower()
+            value = value.strip()
+            
+            if field == 'user-agent':
+                # Подряд идущие User-agent относятся к одной группе
+                if not in_agents:
+                    current = {'agents': [], 'rules': [], 'crawl_delay': None}
+                    groups.append(current)
+                    in_agents = True
+                current['agents'].append(value.lower())
+                continue
+            
+            if field == 'sitemap':
+                if value:
+                    sitemaps.append(value)
+                continue
+            
+            in_agents = False
+            if current is None:
+                continue
+            
+            if field in ('allow', 'disallow'):
+                # Пустой Disallow ничего не запрещает
+                if value:
+                    current['rules'].append((field == 'allow', value))
+            elif field == 'crawl-delay':
+                try:
+                    current['crawl_delay'] = float(value)
+                except ValueError:
+                    pass
+        
+        return cls(groups, sitemaps)
+    
+    def _matching_groups(self, user_agent: str) -> List[Dict]:
+        """Группы для агента: самое длинное совпадение токена, иначе '*'"""
+        token = user_agent.lower()
+        best_length = 0
+        best: List[Dict] = []
+        
+        for group in self.groups:
+            for agent in group['agents']:
+                if agent != '*' and agent in token:
+                    if len(agent) > best_length:
+                        best_length = len(agent)
+                        best = [group]
+                    elif len(agent) == best_length and group not in best:
+                        best.append(group)
+        
+        if best:
+            return best
+        return [group for group in self.groups if '*' in group['agents']]
+    
+    def can_fetch(self, url: str, user_agent: str = ROBOTS_USER_AGENT) -> bool:
+        """Разрешен ли URL: побеждает самое длинное совпадение, при равенстве — Allow"""
+        parsed = urlparse(url)
+        path = parsed.path or '/'
+        if parsed.query:
+            path += '?' + parsed.query
+        
+        if path == '/robots.txt':
+            return True
+        
+        path = unquote(path)
+        best: Optional[Rule] = None
+        
+        for group in self._matching_groups(user_agent):
+            for allow, pattern in group['rules']:
+                if not _path_matches(pattern, path):
+                    continue
+                if (
+                    best is None
+                    or len(pattern) > len(best[1])
+                    or (len(pattern) == len(best[1]) and allow)
+                ):
+                    best = (allow, pattern)
+        
+        return best is None or best[0]
+    
+    def crawl_delay(self, user_agent: str = ROBOTS_USER_AGENT) -> Optional[float]:
+        """Crawl-delay для агента"""
+        delays = [
+            group['crawl_delay'] for group in self._matching_groups(user_agent)
+            if group['crawl_delay'] is not None
+        ]
+        return max(delays) if delays else None
+
+
+_pattern_cache: Dict[str, re.Pattern] = {}
+
+
+def _path_matches(pattern: str, path: str) -> bool:
+    """Сопоставление пути с шаблоном robots.txt ('*' — любые символы, '$' — конец)"""
+    regex = _pattern_cache.get(pattern)
+    if regex is None:
+        anchored = pattern.endswith('$')
+        body = unquote(pattern[:-1] if anchored else pattern)
+        regex = re.compile(
+            '.*'.join(re.escape(part) for part in body.split('*')) + ('$' if anchored else '')
+        )
+        _pattern_cache[pattern] = regex
+    return regex.match(path) is not None
+
+
+class RobotsService:
+    """Асинхронная проверка robots.txt с кэшем по хостам
+    
+    Загрузка robots.txt идет через планировщик хостов, как и остальные
+    запросы к сайту: через host_limiter задачи парсинга, если он передан,
+    иначе через общий scheduler.
+    """
+    
+    def __init__(
+        self,
+        ttl: int = 24 * 3600,
+        negative_ttl: int = 3600,
+        error_ttl: int = 600,
+        timeout: int = 10,
+        user_agent: str = ROBOTS_USER_AGENT,
+        scheduler=None
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.error_ttl = error_ttl
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.scheduler = scheduler
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = f'Mozilla/5.0 (compatible; {user_agent})'
+        # Хост -> (правила, время истечения)
+        self._cache: Dict[str, Tuple[RobotsRules, float]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+    
+    async def get_rules(self, url: str, limiter=None) -> RobotsRules:
+        """Правила хоста URL (загружаются один раз на TTL)
+        
+        limiter — HostLimiter задачи, через слот которого загружается robots.txt
+        """
+        parsed = urlparse(url)
+        host = f"{parsed.scheme}://{parsed.netloc}"
+        
+        cached = self._cache.get(host)
+        if cached and cached[1] > time.time():
+            return cached[0]
+        
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            cached = self._cache.get(host)
+            if cached and cached[1] > time.time():
+                return cached[0]
+            
+            rules, ttl = await self._fetch(host, limiter)
+            self._cache[host] = (rules, time.time() + ttl)
+            return rules
+    
+    def _slot(self, url: str, limiter):
+        """Слот планировщика для запроса robots.txt"""
+        if limiter is not None:
+            return limiter.slot(url)
+        if self.scheduler is not None:
+            return self.scheduler.slot(url)
+        return contextlib.nullcontext()
+    
+    async def _fetch(self, host: str, limiter=None) -> Tuple[RobotsRules, int]:
+        """Загрузка robots.txt (RFC 9309)
+        
+        4xx — ограничений нет; 5xx, 429 и ошибки сети — сайт временно
+        недоступен, обход запрещен на error_ttl. Тело читается не больше
+        ROBOTS_MAX_BYTES, правила после лимита не учитываются.
+        """
+        robots_url = f"{host}/robots.txt"
+        reporter = limiter if limiter is not None else self.scheduler
+        
+        async with self._slot(robots_url, limiter):
+            request_start = time.monotonic()
+            try:
+                response = await asyncio.to_thread(
+                    fetch_limited, self.session, robots_url, ROBOTS_MAX_BYTES, timeout=self.timeout
+                )
+            except Exception as e:
+                if reporter is not None:
+                    reporter.report(robots_url, error=True)
+                logger.warning(f"Не удалось получить robots.txt {robots_url}: {e}")
+                return RobotsRules.disallow_all(), self.error_ttl
+            
+            if reporter is not None:
+                reporter.report(
+                    robots_url,
+                    status=response.status_code,
+                    latency=time.monotonic() - request_start,
+                    retry_after=response.headers.get('Retry-After')
+                )
+        
+        status = response.status_code
+        if status >= 500 or status == 429:
+            logger.info(f"robots.txt {robots_url}: HTTP {status}, обход хоста временно запрещен")
+            return RobotsRules.disallow_all(), self.error_ttl
+        
+        if status != 200:
+            logger.debug(f"robots.txt {robots_url}: HTTP {status}")
+            return RobotsRules(), self.negative_ttl
+        
+        if response.truncated:
+            logger.info(f"robots.txt {robots_url} больше {ROBOTS_MAX_BYTES} байт, остаток не учитывается")
+        content = response.content.decode('utf-8', errors='replace')
+        return RobotsRules.parse(content), self.ttl
+    
+    async def can_fetch(self, url: str) -> bool:
+        """Разрешен ли обход URL"""
+        rules = await self.get_rules(url)
+        return rules.can_fetch(url, self.user_agent)
+    
+    async def crawl_delay(self, url: str) -> Optional[float]:
+        """Crawl-delay хоста URL"""
+        rules = await self.get_rules(url)
+        return rules.crawl_delay(self.user_agent)
+
+
+_service = None
+
+
+def get_robots_service() -> RobotsService:
+    """Общий для процесса кэш robots.txt"""
+    global _service
+    if _service is None:
+        _service = RobotsService(scheduler=get_host_scheduler())
+    return _service
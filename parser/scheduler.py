@@ -0,0 +1,377 @@
+"""
+Вежливый доступ к хостам: ограничение параллельности и частоты запросов
+"""
+
+import asyncio
+import contextlib
+import os
+import time
+from collections import OrderedDict, deque
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional
+from urllib.parse import urlparse
+from loguru import logger
+
+from utils.json_state import JsonStateFile
+
+
+# Ответы, означающие перегрузку сайта
+CONGESTION_STATUSES = {429, 502, 503, 504}
+
+# Максимальная пауза по Retry-After, сек
+MAX_RETRY_AFTER = 300
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After в секундах (число секунд или HTTP дата)"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+# Резервирование следующего запуска к хосту, общее для всех процессов
+REDIS_RESERVE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local next_start = tonumber(redis.call('GET', KEYS[1]) or '0')
+local start = math.max(now, next_start)
+redis.call('SET', KEYS[1], tostring(start + interval), 'PX', math.ceil((start + interval - now) * 1000) + 1000)
+return tostring(start - now)
+"""
+
+
+class HostScheduler:
+    """Общий для процесса планировщик запросов к хостам
+    
+    Для каждого хоста — token bucket и лимит одновременных соединений.
+    Ожидающие запросы разных задач обслуживаются по кругу, поэтому большая
+    задача не вытесняет остальных пользователей. При заданном Redis интервал
+    между запросами к хосту соблюдается и между процессами бота.
+    
+    Частота и число соединений подстраиваются по принципу AIMD: пока ответы
+    успешны и задержка стабильна, частота растет на rate_step не чаще одного
+    раза за окно (сглаженная задержка ответа, но не меньше increase_window
+    секунд); при 429/503, таймаутах и скачках задержки уменьшается вдвое.
+    Retry-After приостанавливает запросы к хосту. Выученные параметры
+    сохраняются в state_path.
+    """
+    
+    def __init__(
+        self,
+        rate: float = 0.5,
+        burst: int = 2,
+        max_connections: int = 8,
+        initial_connections: int = 2,
+        min_rate: float = 0.05,
+        max_rate: float = 10.0,
+        rate_step: float = 0.05,
+        increase_window: float = 5.0,
+        decrease_factor: float = 0.5,
+        latency_spike: float = 2.5,
+        state_path: Optional[str] = None,
+        redis=None,
+        redis_prefix: str = 'uniparser:host:'
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_connections = max_connections
+        self.initial_connections = initial_connections
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate_step = rate_step
+        self.increase_window = increase_window
+        self.decrease_factor = decrease_factor
+        self.latency_spike = latency_spike
+        self.redis = redis
+        self.redis_prefix = redis_prefix
+        self._redis_script = None
+        self._hosts: Dict[str, Dict[str, Any]] = {}
+        self.state = JsonStateFile(state_path) if state_path else None
+        # Выученные в прошлых запусках параметры хостов
+        self._learned: Dict[str, Dict[str, Any]] = self.state.load() if self.state else {}
+    
+    def _state(self, host: str) -> Dict[str, Any]:
+        if host not in self._hosts:
+            learned = self._learned.get(host, {})
+            self._hosts[host] = {
+                'rate': learned.get('rate', self.rate),
+                'max_rate': self.max_rate,
+                'connections': learned.get('connections', min(self.initial_connections, self.max_connections)),
+                'latency': learned.get('latency'),
+                'successes': 0,
+                'increased_at': time.monotonic(),
+                'blocked_until': 0.0,
+                'tokens': float(self.burst),
+                'updated': time.monotonic(),
+                'active': 0,
+                # Очереди ожидающих запросов по задачам (порядок — круговой обход)
+                'queues': OrderedDict(),
+                'timer': None
+            }
+        return self._hosts[host]
+    
+    def seed_rate(self, url: str, rate: float):
+        """Начальная частота для хоста, о котором еще ничего не известно"""
+        host = urlparse(url).netloc
+        if host not in self._hosts and host not in self._learned:
+            self._state(host)['rate'] = min(max(rate, self.min_rate), self.max_rate)
+    
+    def set_min_interval(self, url: str, interval: float):
+        """Не чаще одного запроса в interval секунд к хосту URL (например, из Crawl-delay)"""
+        if interval <= 0:
+            return
+        state = self._state(urlparse(url).netloc)
+        state['max_rate'] = min(state['max_rate'], 1.0 / interval)
+        state['rate'] = min(state['rate'], state['max_rate'])
+    
+    def report(
+        self,
+        url: str,
+        status: Optional[int] = None,
+        latency: Optional[float] = None,
+        error: bool = False,
+        retry_after: Optional[str] = None
+    ):
+        """Результат запроса к хосту: подстройка частоты и числа соединений"""
+        host = urlparse(url).netloc
+        state = self._state(host)
+        
+        pause = parse_retry_after(retry_after)
+        if pause:
+            state['blocked_until'] = max(state['blocked_until'], time.monotonic() + min(pause, MAX_RETRY_AFTER))
+        
+        spike = (
+            latency is not None and state['latency'] is not None
+            and latency > 1.0 and latency > state['latency'] * self.latency_spike
+        )
+        
+        if error or status in CONGESTION_STATUSES or spike:
+            # Мультипликативное снижение
+            state['rate'] = max(self.min_rate, state['rate'] * self.decrease_factor)
+            state['connections'] = max(1, int(state['connections'] * self.decrease_factor))
+            state['successes'] = 0
+            state['increased_at'] = time.monotonic()
+            logger.info(
+                f"Снижаем нагрузку на {host}: {state['rate']:.2f} запр/сек, "
+                f"{state['connections']} соединений (status={status}, error={error}, latency={latency})"
+            )
+        elif status is None or status < 400:
+            # Аддитивный рост: один шаг за окно, а не за каждый ответ
+            now = time.monotonic()
+            if now - state['increased_at'] >= max(self.increase_window, state['latency'] or 0.0):
+                state['rate'] = min(state['max_rate'], state['rate'] + self.rate_step)
+                state['increased_at'] = now
+            state['successes'] += 1
+            if state['successes'] >= state['connections'] * 5 and state['connections'] < self.max_connections:
+                state['connections'] += 1
+                state['successes'] = 0
+        
+        # Задержку усредняем только по обычным ответам, чтобы скачок не стал нормой
+        if latency is not None and not error and not spike:
+            previous = state['latency']
+            state['latency'] = latency if previous is None else previous * 0.8 + latency * 0.2
+        
+        self._dispatch(host)
+    
+    def save(self):
+        """Сохранение выученных параметров хостов"""
+        if not self.state:
+            return
+        for host, state in self._hosts.items():
+            self._learned[host] = {
+                'rate': round(state['rate'], 3),
+                'connections': state['connections'],
+                'latency': state['latency'],
+                'updated_at': time.time()
+            }
+        self.state.save(self._learned)
+    
+    def queue_depth(self) -> Dict[str, Dict[str, int]]:
+        """Число ожидающих и выполняющихся запросов по хостам"""
+        depth = {}
+        for host, state in self._hosts.items():
+            queued = sum(
+                1 for queue in state['queues'].values()
+                for future in queue if not future.done()
+            )
+            if queued or state['active']:
+                depth[host] = {'queued': queued, 'active': state['active']}
+        return depth
+    
+    @contextlib.asynccontextmanager
+    async def slot(self, url: str, job_id: Any = None):
+        """Слот для запроса к хосту URL от задачи job_id"""
+        host = urlparse(url).netloc
+        state = self._state(host)
+        future = asyncio.get_running_loop().create_future()
+        state['queues'].setdefault(job_id, deque()).append(future)
+        self._dispatch(host)
+        
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Слот мог быть выдан одновременно с отменой — возвращаем его
+            if future.done() and not future.cancelled():
+                self._release(host)
+            raise
+        
+        try:
+            if self.redis is not None:
+                await self._wait_redis(host, 1.0 / state['rate'])
+            yield
+        finally:
+            self._release(host)
+    
+    def _refill(self, state: Dict[str, Any]):
+        now = time.monotonic()
+        state['tokens'] = min(self.burst, state['tokens'] + (now - state['updated']) * state['rate'])
+        state['updated'] = now
+    
+    def _dispatch(self, host: str):
+        """Выдача слотов ожидающим запросам, пока есть токены и свободные соединения"""
+        state = self._hosts[host]
+        if state['timer'] is not None:
+            state['timer'].cancel()
+            state['timer'] = None
+        
+        # Пауза по Retry-After
+        blocked = state['blocked_until'] - time.monotonic()
+        if state['queues'] and blocked > 0:
+            state['timer'] = asyncio.get_running_loop().call_later(blocked, self._dispatch, host)
+            return
+        
+        while state['queues'] and state['active'] < state['connections']:
+            self._refill(state)
+            if state['tokens'] < 1:
+                # Ждем следующий токен
+                delay = (1 - state['tokens']) / state['rate']
+                state['timer'] = asyncio.get_running_loop().call_later(delay, self._dispatch, host)
+                return
+            
+            # Круговой обход задач: одна задача — один запрос за проход
+            job_id, queue = next(iter(state['queues'].items()))
+            future = queue.popleft()
+            if queue:
+                state['queues'].move_to_end(job_id)
+            else:
+                del state['queues'][job_id]
+            
+            if future.done():
+                continue
+            
+            state['tokens'] -= 1
+            state['active'] += 1
+            future.set_result(None)
+    
+    def _release(self, host: str):
+        state = self._hosts[host]
+        state['active'] -= 1
+        self._dispatch(host)
+    
+    async def _wait_redis(self, host: str, interval: float):
+        """Резервирование времени запроса в Redis (ошибки Redis не останавливают парсинг)"""
+        try:
+            if self._redis_script is None:
+                self._redis_script = self.redis.register_script(REDIS_RESERVE_SCRIPT)
+            wait = float(await self._redis_script(
+                keys=[self.redis_prefix + host], args=[time.time(), interval]
+            ))
+        except Exception as e:
+            logger.warning(f"Redis недоступен для планировщика хостов: {e}")
+            return
+        
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class HostLimiter:
+    """Ограничение параллельных запросов и интервала между ними для каждого хоста
+    
+    Ограничения действуют в пределах одной задачи парсинга. Если передан
+    scheduler, частотой управляет общий для процесса адаптивный планировщик:
+    min_interval (rate_limit_delay пользователя) задает только начальную
+    частоту для нового хоста, а дальше она меняется в пределах min_rate и
+    max_rate планировщика. Жестким ограничением остается лишь Crawl-delay.
+    """
+    
+    def __init__(
+        self,
+        min_interval: float = 2.0,
+        max_concurrency: int = 2,
+        scheduler: Optional[HostScheduler] = None,
+        job_id: Any = None
+    ):
+        self.min_interval = min_interval
+        self.max_concurrency = max_concurrency
+        self.scheduler = scheduler
+        self.job_id = job_id
+        self._hosts: Dict[str, Dict[str, Any]] = {}
+    
+    def _state(self, host: str) -> Dict[str, Any]:
+        if host not in self._hosts:
+            if self.scheduler and self.min_interval > 0:
+                self.scheduler.seed_rate(f"//{host}", 1.0 / self.min_interval)
+            self._hosts[host] = {
+                'semaphore': asyncio.Semaphore(self.max_concurrency),
+                'lock': asyncio.Lock(),
+                'next_start': 0.0,
+                # С планировщиком интервал задачи задается только Crawl-delay
+                'interval': 0.0 if self.scheduler else self.min_interval
+            }
+        return self._hosts[host]
+    
+    def set_min_interval(self, url: str, interval: float):
+        """Интервал между запросами к хосту URL (например, из Crawl-delay)"""
+        state = self._state(urlparse(url).netloc)
+        state['interval'] = max(state['interval'], interval)
+        if self.scheduler:
+            self.scheduler.set_min_interval(url, interval)
+    
+    def report(self, url: str, **feedback):
+        """Передача результата запроса адаптивному планировщику"""
+        if self.scheduler:
+            self.scheduler.report(url, **feedback)
+    
+    @contextlib.asynccontextmanager
+    async def slot(self, url: str):
+        """Слот для запроса к хосту URL"""
+        state = self._state(urlparse(url).netloc)
+        
+        async with state['semaphore']:
+            async with state['lock']:
+                wait = state['next_start'] - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                state['next_start'] = time.monotonic() + state['interval']
+            
+            if self.scheduler:
+                async with self.scheduler.slot(url, self.job_id):
+                    yield
+            else:
+                yield
+
+
+_scheduler = None
+
+
+def get_host_scheduler() -> HostScheduler:
+    """Общий для процесса планировщик (Redis — если задан REDIS_URL, параметры хостов — в data/host_rates.json)"""
+    global _scheduler
+    if _scheduler is None:
+        redis = None
+        redis_url = os.getenv("REDIS_URL")
+        if redis_url:
+            try:
+                from redis.asyncio import Redis
+                redis = Redis.from_url(redis_url)
+                logger.info("Using Redis for host scheduling")
+            except ImportError:
+                logger.warning("Redis not installed. Host scheduling is per process")
+        _scheduler = HostScheduler(state_path='data/host_rates.json', redis=redis)
+    return _scheduler
@@ -0,0 +1,219 @@
+"""
+Поиск страниц сотрудников через robots.txt и sitemap.xml
+"""
+
+import asyncio
+import contextlib
+import gzip
+import io
+import time
+import xml.etree.ElementTree as ET
+from typing import Any, Callable, List, Dict, Iterator, Optional, Tuple
+from urllib.parse import urlparse
+from loguru import logger
+
+from utils.json_state import JsonStateFile
+
+
+# Ключевые слова в пути страниц сотрудников
+STAFF_PATH_KEYWORDS = [
+    'sotrudniki', 'sotrudnik', 'prepodavateli', 'prepodavatel', 'staff',
+    'employees', 'personnel', 'persons', 'people', 'faculty', 'team',
+    'kafedra', 'struktura', 'structure', 'rukovodstvo', 'management'
+]
+
+# Файлы, которые не являются HTML страницами
+SKIPPED_EXTENSIONS = (
+    '.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx', '.odt', '.rtf',
+    '.jpg', '.jpeg', '.png', '.gif', '.svg', '.webp', '.bmp', '.tif', '.tiff',
+    '.mp3', '.mp4', '.avi', '.mov', '.mkv', '.webm', '.wav',
+    '.zip', '.rar', '.7z', '.gz', '.tar', '.exe', '.msi', '.iso'
+)
+
+
+def staff_url_score(url: str) -> int:
+    """Число ключевых слов сотрудников в пути URL"""
+    path = urlparse(url).path.lower()
+    if path.endswith(SKIPPED_EXTENSIONS):
+        return 0
+    return sum(1 for keyword in STAFF_PATH_KEYWORDS if keyword in path)
+
+
+# Сигнатура gzip
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def _no_slot(url: str):
+    """Без планировщика хостов"""
+    return contextlib.nullcontext()
+
+
+def _local_name(tag: str) -> str:
+    """Имя тега без пространства имен"""
+    return tag.rsplit('}', 1)[-1]
+
+
+class SitemapDiscovery:
+    """Поиск страниц сотрудников в sitemap с кэшем по доменам"""
+    
+    def __init__(
+        self,
+        path: str = 'data/sitemaps.json',
+        ttl: int = 24 * 3600,
+        max_urls: int = 200,
+        max_sitemaps: int = 20,
+        max_entries: int = 500_000
+    ):
+        self.state = JsonStateFile(path)
+        self.ttl = ttl
+        self.max_urls = max_urls
+        self.max_sitemaps = max_sitemaps
+        self.max_entries = max_entries
+        self.cache: Dict[str, Dict] = self.state.load()
+    
+    async def discover(
+        self,
+        session,
+        base_url: str,
+        sitemap_urls: Optional[List[str]] = None,
+        slot: Optional[Callable[[str], Any]] = None
+    ) -> List[str]:
+        """Страницы сотрудников сайта, отсортированные по релевантности
+        
+        sitemap_urls — директивы Sitemap: из robots.txt, если он уже загружен;
+        slot — слот планировщика хостов (например, HostLimiter.slot), который
+        берется отдельно на каждый запрос, а не на весь обход sitemap.
+        """
+        domain = urlparse(base_url).netloc
+        cached = self.cache.get(domain)
+        if cached and time.time() - cached['fetched_at'] < self.ttl:
+            return cached['urls']
+        
+        try:
+            urls = await self._discover(session, base_url, sitemap_urls, slot or _no_slot)
+        except Exception as e:
+            logger.warning(f"Ошибка разбора sitemap для {domain}: {e}")
+            urls = []
+        
+        self.cache[domain] = {'fetched_at': time.time(), 'urls': urls}
+        self.state.save(self.cache)
+        return urls
+    
+    async def _discover(self, session, base_url: str, sitemap_urls: Optional[List[str]], slot) -> List[str]:
+        parsed = urlparse(base_url)
+        root = f"{parsed.scheme}://{parsed.netloc}"
+        
+        if sitemap_urls is None:
+            async with slot(f"{root}/robots.txt"):
+                sitemap_urls = await asyncio.to_thread(self._sitemaps_from_robots, session, root)
+        queue = list(sitemap_urls) or [f"{root}/sitemap.xml"]
+        visited = set()
+        scored: Dict[str, int] = {}
+        entries = 0
+        
+        while queue and len(visited) < self.max_sitemaps and entries < self.max_entries:
+            sitemap_url = queue.pop(0)
+            if sitemap_url in visited:
+                continue
+            visited.add(sitemap_url)
+            
+            async with slot(sitemap_url):
+                children, found, count = await asyncio.to_thread(
+                    self._scan_sitemap, session, sitemap_url, parsed.netloc, self.max_entries - entries
+                )
+            entries += count
+            queue.extend(children)
+            scored.update(found)
+        
+        # Сначала больше совпадений, затем более короткие пути
+        urls = sorted(scored, key=lambda u: (-scored[u], len(u)))[:self.max_urls]
+        logger.info(f"Sitemap {parsed.netloc}: просмотрено {entries} записей, найдено {len(urls)} страниц сотрудников")
+        return urls
+    
+    def _scan_sitemap(self, session, sitemap_url: str, host: str, budget: int) -> Tuple[List[str], Dict[str, int], int]:
+        """Один sitemap (блокирующий, вызывается в потоке): вложенные sitemap, оценки страниц хоста и число записей"""
+        children: List[str] = []
+        scored: Dict[str, int] = {}
+        entries = 0
+        
+        for kind, loc in self._iter_sitemap_locs(session, sitemap_url):
+            entries += 1
+            if kind == 'sitemapindex':
+                children.append(loc)
+            elif urlparse(loc).netloc == host:
+                score = staff_url_score(loc)
+                if score:
+                    scored[loc] = score
+            if entries >= budget:
+                break
+        
+        return children, scored, entries
+    
+    def _sitemaps_from_robots(self, session, root: str) -> List[str]:
+        """Адреса sitemap из директив Sitemap: в robots.txt"""
+        try:
+            response = session.get(f"{root}/robots.txt", timeout=10)
+            if response.status_code != 200:
+                return []
+            return [
+                line.split(':', 1)[1].strip()
+                for line in response.text.splitlines()
+                if line.lower().startswith('sitemap:')
+            ]
+        except Exception as e:
+            logger.debug(f"Не удалось получить robots.txt {root}: {e}")
+            return []
+    
+    def _iter_sitemap_locs(self, session, sitemap_url: str) -> Iterator[Tuple[str, str]]:
+        """Потоковый разбор sitemap: пары (тип корня, loc) без загрузки файла в память"""
+        try:
+            response = session.get(sitemap_url, timeout=30, stream=True)
+        except Exception as e:
+            logger.debug(f"Не удалось загрузить sitemap {sitemap_url}: {e}")
+            return
+        
+        try:
+            if response.status_code != 200:
+                return
+            
+            raw = response.raw
+            if hasattr(raw, 'decode_content'):
+                # Content-Encoding: gzip снимается urllib3
+                raw.decode_content = True
+            
+            # Сжатый файл (.xml.gz) распаковываем на лету — по сигнатуре, а не по
+            # расширению: после снятия Content-Encoding данные уже распакованы
+            raw = io.BufferedReader(raw)
+            if raw.peek(2)[:2] == GZIP_MAGIC:
+                raw = gzip.GzipFile(fileobj=raw)
+            
+            root = None
+            for event, element in ET.iterparse(raw, events=('start', 'end')):
+                if event == 'start':
+                    if root is None:
+                        root = element
+                    continue
+                
+                name = _local_name(element.tag)
+                if name == 'loc' and element.text:
+                    yield _local_name(root.tag), element.text.strip()
+                elif name in ('url', 'sitemap'):
+                    # Разобранные записи удаляются из корня, иначе он держит их все
+                    root.clear()
+        except ET.ParseError as e:
+            logger.debug(f"Некорректный sitemap {sitemap_url}: {e}")
+        except OSError as e:
+            logger.debug(f"Ошибка распаковки sitemap {sitemap_url}: {e}")
+        finally:
+            response.close()
+
+
+_discovery = None
+
+
+def get_sitemap_discovery() -> SitemapDiscovery:
+    """Общий для процесса кэш sitemap"""
+    global _discovery
+    if _discovery is None:
+        _discovery = SitemapDiscovery()
+    return _discovery
@@ -0,0 +1,218 @@
+"""
+Извлечение сотрудников из таблиц по столбцам (ФИО | Должность | E-mail)
+"""
+
+import re
+from typing import List, Dict, Any, Callable, Optional
+from urllib.parse import unquote
+
+from parser.classifier import EMAIL_RE, FIO_RE, KEYWORD_RE
+from parser.dom import DomDocument
+
+
+# Заголовки столбцов по ролям (сравниваются с началом текста ячейки)
+HEADER_KEYWORDS = {
+    'fio': ['фио', 'ф.и.о', 'ф. и. о', 'фамилия', 'сотрудник', 'преподаватель', 'имя', 'full name', 'name'],
+    'position': ['должность', 'занимаемая должность', 'position', 'title'],
+    'email': ['e-mail', 'email', 'эл. почта', 'электронная почта', 'почта', 'mail'],
+}
+
+# Длинный текст в ячейке — не заголовок
+MAX_HEADER_LENGTH = 40
+
+# Сколько строк смотреть при определении ролей столбцов без заголовка
+SAMPLE_ROWS = 20
+
+# Минимальная доля строк, подтверждающих роль столбца
+MIN_ROLE_SHARE = 0.5
+
+MIN_TABLE_ROWS = 2
+
+FULL_NAME_RE = re.compile(r'[А-ЯЁ][а-яё-]+(?:\s+[А-ЯЁ][а-яё-]+){1,2}')
+
+
+def table_rows(doc: DomDocument, table: Any) -> List[Any]:
+    """Строки таблицы без строк вложенных таблиц"""
+    rows = []
+    for child in doc.children(table):
+        tag = doc.tag(child)
+        if tag == 'tr':
+            rows.append(child)
+        elif tag in ('thead', 'tbody', 'tfoot'):
+            rows.extend(row for row in doc.children(child) if doc.tag(row) == 'tr')
+    return rows
+
+
+def row_cells(doc: DomDocument, row: Any) -> List[Any]:
+    """Ячейки строки с учетом colspan (объединенная ячейка повторяется)"""
+    cells = []
+    for cell in doc.children(row):
+        if doc.tag(cell) not in ('td', 'th'):
+            continue
+        try:
+            span = max(1, min(int(doc.attr(cell, 'colspan') or 1), 20))
+        except ValueError:
+            span = 1
+        cells.extend([cell] * span)
+    return cells
+
+
+def header_roles(texts: List[str]) -> Dict[int, str]:
+    """Роли столбцов по тексту строки заголовка"""
+    roles = {}
+    for index, text in enumerate(texts):
+        text = ' '.join(text.lower().split())
+        if not text or len(text) > MAX_HEADER_LENGTH:
+            continue
+        for role, keywords in HEADER_KEYWORDS.items():
+            if role not in roles.values() and any(text.startswith(keyword) for keyword in keywords):
+                roles[index] = role
+                break
+    return roles
+
+
+def name_from_cell(text: str) -> Optional[str]:
+    """ФИО из текста ячейки: вся ячейка или первое совпадение с шаблоном ФИО"""
+    text = ' '.join(text.split()).strip(' ,;')
+    if FULL_NAME_RE.fullmatch(text):
+        return text
+    match = FIO_RE.search(text)
+    return match.group(0) if match else None
+
+
+def email_from_cell(doc: DomDocument, cell: Any, text: str) -> Optional[str]:
+    """Адрес из mailto ссылки или текста ячейки"""
+    return email_from(doc.mailtos(cell), text)
+
+
+def email_from(mailtos: List[str], text: str) -> Optional[str]:
+    """Адрес из первой подходящей mailto ссылки или из текста"""
+    for href in mailtos:
+        match = EMAIL_RE.search(unquote(href))
+        if match:
+            return match.group(0)
+    match = EMAIL_RE.search(text)
+    return match.group(0) if match else None
+
+
+def infer_roles(columns: List[List[str]]) -> Dict[int, str]:
+    """Роли столбцов по образцу строк: доля адресов, ФИО и должностей в каждом столбце"""
+    checks = {
+        'email': lambda text: EMAIL_RE.search(text) is not None,
+        'fio': lambda text: name_from_cell(text) is not None,
+        'position': lambda text: KEYWORD_RE.search(text.lower()) is not None,
+    }
+    roles = {}
+    for role, check in checks.items():
+        best_index, best_share = None, MIN_ROLE_SHARE
+        for index, column in enumerate(columns):
+            if index in roles or not column:
+                continue
+            share = sum(1 for text in column if check(text)) / len(column)
+            if share >= best_share:
+                best_index, best_share = index, share
+        if best_index is not None:
+            roles[best_index] = role
+    return roles
+
+
+def extract_table(doc: DomDocument, table: Any) -> List[Dict[str, Any]]:
+    """Строки таблицы сотрудников с разделенными полями
+    
+    Роли столбцов берутся из строки заголовка по ключевым словам, иначе
+    определяются по образцу строк. Таблица без столбца ФИО или без адресов и
+    должностей не считается таблицей сотрудников (пустой список).
+    """
+    rows = table_rows(doc, table)
+    if len(rows) < MIN_TABLE_ROWS:
+        return []
+    
+    grid = [row_cells(doc, row) for row in rows]
+    texts = [[doc.text(cell, separator=' ', strip=True) for cell in cells] for cells in grid]
+    
+    def email_at(index: int, column: Optional[int]) -> Optional[str]:
+        if column is None:
+            return email_from_cell(doc, rows[index], ' '.join(texts[index]))
+        return email_from_cell(doc, grid[index][column], texts[index][column])
+    
+    return [
+        {**row, 'row': rows[row['index']], 'fio_cell': grid[row['index']][row['fio_column']]}
+        for row in rows_from_texts(texts, email_at)
+    ]
+
+
+def extract_cell_table(grid: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Строки таблицы, собранной в браузере: ячейки — словари text, mailtos, links"""
+    if len(grid) < MIN_TABLE_ROWS:
+        return []
+    
+    texts = [[cell['text'] for cell in cells] for cells in grid]
+    
+    def email_at(index: int, column: Optional[int]) -> Optional[str]:
+        cells = grid[index] if column is None else [grid[index][column]]
+        mailtos = [href for cell in cells for href in cell.get('mailtos', [])]
+        return email_from(mailtos, ' '.join(cell['text'] for cell in cells))
+    
+    return [
+        {**row, 'fio_cell': grid[row['index']][row['fio_column']]}
+        for row in rows_from_texts(texts, email_at)
+    ]
+
+
+def rows_from_texts(
+    texts: List[List[str]],
+    email_at: Callable[[int, Optional[int]], Optional[str]]
+) -> List[Dict[str, Any]]:
+    """Поля записей по тексту ячеек таблицы
+    
+    email_at(строка, столбец) — адрес из ячейки (столбец None — из всей
+    строки). Результат: номер строки в texts, столбец ФИО, ФИО, адрес и должность.
+    """
+    if len(texts) < MIN_TABLE_ROWS:
+        return []
+    
+    # Заголовок: первая строка с ключевыми словами хотя бы двух ролей
+    roles: Dict[int, str] = {}
+    body_start = 0
+    for index, row_texts in enumerate(texts[:3]):
+        found = header_roles(row_texts)
+        if len(found) >= 2:
+            roles, body_start = found, index + 1
+            break
+    
+    # Строки другой ширины (подзаголовки разделов, итоги) пропускаются
+    width = max(len(row_texts) for row_texts in texts)
+    body = [
+        (index, row_texts) for index, row_texts in enumerate(texts)
+        if index >= body_start and len(row_texts) == width
+    ]
+    if len(body) < MIN_TABLE_ROWS:
+        return []
+    
+    if not roles:
+        sample = body[:SAMPLE_ROWS]
+        roles = infer_roles([[row_texts[i] for _, row_texts in sample] for i in range(width)])
+    
+    columns = {role: index for index, role in roles.items()}
+    if 'fio' not in columns or not ({'email', 'position'} & set(columns)):
+        return []
+    
+    # Столбцы обрабатываются целиком: ФИО, затем адреса и должности
+    fio_index = columns['fio']
+    names = [name_from_cell(row_texts[fio_index]) for _, row_texts in body]
+    if sum(1 for name in names if name) / len(names) < MIN_ROLE_SHARE:
+        return []
+    
+    email_index = columns.get('email')
+    emails = [email_at(index, email_index) for index, _ in body]
+    
+    if 'position' in columns:
+        positions = [row_texts[columns['position']] or None for _, row_texts in body]
+    else:
+        positions = [None] * len(body)
+    
+    return [
+        {'index': index, 'fio_column': fio_index, 'fio': name, 'email': email, 'position': position}
+        for (index, _), name, email, position in zip(body, names, emails, positions)
+        if name
+    ]
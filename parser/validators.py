@@ -3,16 +3,64 @@
 """
 
 import re
-from typing import Optional
+from functools import lru_cache
+from typing import Any, Callable, List, Optional, Tuple
 from urllib.parse import urlparse
 from email_validator import validate_email, EmailNotValidError
 from loguru import logger
 
+from parser.deliverability import get_deliverability_cache
+from parser.names import get_name_service
+
+
+EMAIL_FALLBACK_RE = re.compile(r'^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}$')
+
+
+def _is_deliverable(email: str) -> bool:
+    """Принимает ли домен адреса почту (результат кэшируется по домену)"""
+    return get_deliverability_cache().is_deliverable(email)
+
+
+@lru_cache(maxsize=20000)
+def _is_valid_syntax(email: str) -> bool:
+    """Синтаксическая проверка email-validator (общая для проверок с DNS и без)"""
+    try:
+        validate_email(email, check_deliverability=False)
+        return True
+    except EmailNotValidError:
+        return False
+
+
+def _check_email(email: str, check_deliverability: bool = True) -> bool:
+    """Проверка адреса: синтаксис кэшируется по адресу, DNS — по домену
+    
+    Без check_deliverability DNS не запрашивается: используется уже известный
+    результат для домена, неизвестный домен считается принимающим почту.
+    """
+    # Используем email-validator для строгой проверки (DNS домена проверяется один раз)
+    if _is_valid_syntax(email):
+        if check_deliverability:
+            deliverable = _is_deliverable(email)
+        else:
+            known = get_deliverability_cache().get(email.rsplit('@', 1)[1])
+            deliverable = True if known is None else known
+        if deliverable:
+            return True
+    
+    # Fallback на простую regex проверку
+    return bool(EMAIL_FALLBACK_RE.match(email))
+
 
 class DataValidator:
     """Класс для валидации извлеченных данных"""
     
-    def __init__(self):
+    def __init__(self, check_deliverability: bool = True):
+        # Проверка домена адреса через DNS (отключается для локального пересчета оценок)
+        self.check_deliverability = check_deliverability
+        
+        # Проверка и нормализация ФИО (общий кэш процесса)
+        self.names = get_name_service()
+        
         # Ключевые слова для должностей
         self.position_keywords = [
             'профессор', 'доцент', 'преподаватель', 'ассистент',
@@ -50,73 +98,77 @@ class DataValidator:
         source_url: str
     ) -> float:
         """Расчет confidence score для записи"""
-        confidence = 0.0
+        return self.calculate_confidences([(fio, email, position)], source_url)[0]
         
-        # Проверка email (+0.4 если валидный)
-        if email and self.validate_email(email):
-            confidence += 0.4
+    def calculate_confidences(
+        self,
+        rows: List[Tuple[Optional[str], Optional[str], Optional[str]]],
+        source_url: str
+    ) -> List[float]:
+        """Confidence score записей одного источника (fio, email, position), например строк таблицы
             
-            # Дополнительные бонусы/штрафы за домен
-            domain = email.split('@')[1].lower()
-            if any(ed in domain for ed in self.education_domains):
-                confidence += 0.1  # Образовательный домен
-            elif domain in self.common_email_domains:
-                confidence -= 0.2  # Общий домен
+        Каждый столбец проверяется одним проходом, одинаковые значения
+        (повторяющиеся должности, адреса) — один раз, источник — один раз на все записи.
+        """
+        email_scores = self._column(self._email_score, [email for _, email, _ in rows])
+        fio_valid = self._column(lambda fio: bool(fio) and self.validate_fio(fio), [fio for fio, _, _ in rows])
+        position_valid = self._column(self.validate_position, [position for _, _, position in rows])
+        # Проверка источника (-0.3 если сомнительный)
+        source_valid = self.validate_source(source_url)
         
-        # Проверка ФИО (+0.3 если валидное)
-        if fio and self.validate_fio(fio):
-            confidence += 0.3
+        confidences = []
+        for (fio, email, _), confidence, fio_ok, position_ok in zip(rows, email_scores, fio_valid, position_valid):
+            # Проверка ФИО (+0.3 если валидное)
+            if fio_ok:
+                confidence += 0.3
             
-            # Проверка соответствия email и ФИО
-            if email and self.check_email_fio_match(email, fio):
-                confidence += 0.1
+                # Проверка соответствия email и ФИО
+                if email and self.check_email_fio_match(email, fio):
+                    confidence += 0.1
         
-        # Проверка должности (+0.2 если найдена)
-        if position and self.validate_position(position):
-            confidence += 0.2
+            # Проверка должности (+0.2 если найдена)
+            if position_ok:
+                confidence += 0.2
         
-        # Проверка источника (-0.3 если сомнительный)
-        if not self.validate_source(source_url):
-            confidence -= 0.3
+            if not source_valid:
+                confidence -= 0.3
+        
+            # Ограничиваем результат [0, 1]
+            confidences.append(max(0.0, min(1.0, confidence)))
         
-        # Ограничиваем результат [0, 1]
-        return max(0.0, min(1.0, confidence))
+        return confidences
+    
+    @staticmethod
+    def _column(check: Callable[[Any], Any], values: List[Any]) -> List[Any]:
+        """Результаты проверки столбца: каждое различное значение проверяется один раз"""
+        results = {}
+        for value in values:
+            if value not in results:
+                results[value] = check(value)
+        return [results[value] for value in values]
+    
+    def _email_score(self, email: Optional[str]) -> float:
+        """Вклад адреса в confidence: +0.4 за валидный адрес, бонус/штраф за домен"""
+        if not email or not self.validate_email(email):
+            return 0.0
+        
+        score = 0.4
+        domain = email.split('@')[1].lower()
+        if any(ed in domain for ed in self.education_domains):
+            score += 0.1  # Образовательный домен
+        elif domain in self.common_email_domains:
+            score -= 0.2  # Общий домен
+        return score
     
     def validate_email(self, email: str) -> bool:
         """Валидация email адреса"""
         if not email:
             return False
-        
-        try:
-            # Используем email-validator для строгой проверки
-            validate_email(email)
-            return True
-        except EmailNotValidError:
-            # Fallback на простую regex проверку
-            pattern = r'^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}$'
-            return bool(re.match(pattern, email))
+        return _check_email(email, self.check_deliverability)
     
     def validate_fio(self, fio: str) -> bool:
         """Валидация ФИО"""
-        if not fio:
-            return False
-        
-        # Проверяем, что это русские имена
-        pattern = r'^[А-ЯЁ][а-яё]+\s+[А-ЯЁ][а-яё]+(?:\s+[А-ЯЁ][а-яё]+)?$'
-        if not re.match(pattern, fio):
-            return False
-        
-        # Проверяем длину (не слишком короткое и не слишком длинное)
-        words = fio.split()
-        if len(words) < 2 or len(words) > 3:
-            return False
-        
-        # Проверяем длину каждого слова
-        for word in words:
-            if len(word) < 2 or len(word) > 20:
-                return False
-        
-        return True
+        return self.names.is_valid(fio)
     
     def validate_position(self, position: str) -> bool:
         """Валидация должности"""
@@ -226,23 +278,7 @@ class DataValidator:
     
     def normalize_fio(self, fio: str) -> str:
         """Нормализация ФИО"""
-        if not fio:
-            return ""
-        
-        # Убираем лишние пробелы и символы
-        fio = re.sub(r'\s+', ' ', fio.strip())
-        fio = re.sub(r'[.,]', '', fio)
-        
-        # Приводим к правильному регистру
-        words = fio.split()
-        normalized_words = []
-        
-        for word in words:
-            if word:
-                normalized_word = word[0].upper() + word[1:].lower()
-                normalized_words.append(normalized_word)
-        
-        return ' '.join(normalized_words)
+        return self.names.normalize(fio)
     
     def normalize_position(self, position: str) -> str:
         """Нормализация должности"""
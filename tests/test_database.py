@@ -0,0 +1,231 @@
+"""
+Тесты для хранилища результатов
+"""
+
+import asyncio
+import json
+import pytest
+import pytest_asyncio
+
+from database.store import ResultStore
+
+
+RECORDS = [
+    {
+        'fio': 'Иванов Иван Иванович', 'position': 'профессор', 'email': 'Ivanov@University.ru',
+        'source': 'https://university.ru/staff', 'confidence': 0.9,
+        'profile_url': 'https://university.ru/staff/ivanov'
+    },
+    {
+        'fio': 'Петрова Анна Сергеевна', 'position': 'доцент', 'email': None,
+        'source': 'https://university.ru/staff?page=2', 'confidence': 0.5
+    },
+]
+
+
+@pytest_asyncio.fixture
+async def store(tmp_path):
+    store = ResultStore(str(tmp_path / 'results.db'), batch_size=1, flush_interval=60)
+    await store.open()
+    yield store
+    await store.close()
+
+
+class TestResultStore:
+    """Тесты для сохранения и чтения результатов парсинга"""
+    
+    @pytest.mark.asyncio
+    async def test_save_and_read(self, store):
+        """Записи доступны сразу после сохранения, хотя пишутся в фоне"""
+        parsing_id = await store.save_parsing(1, 'https://university.ru/staff', RECORDS, {'pages_parsed': 2})
+        
+        parsing = await store.get_parsing(parsing_id, user_id=1)
+        records = await store.get_records(parsing_id)
+        
+        assert parsing['domain'] == 'university.ru'
+        assert parsing['stats'] == {'pages_parsed': 2}
+        assert [r['fio'] for r in records] == ['Иванов Иван Иванович', 'Петрова Анна Сергеевна']
+        assert records[0]['email'] == 'ivanov@university.ru'
+        assert records[0]['source_url'] == 'https://university.ru/staff'
+        assert await store.get_parsing(parsing_id, user_id=2) is None
+    
+    @pytest.mark.asyncio
+    async def test_wal_and_indexes(self, store):
+        """База в режиме WAL, индексы по пользователю, заданию, домену и адресу"""
+        cursor = await store._db.execute("PRAGMA journal_mode")
+        assert (await cursor.fetchone())[0] == 'wal'
+        
+        cursor = await store._db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+        indexes = {row[0] for row in await cursor.fetchall()}
+        assert {
+            'idx_staff_records_user', 'idx_staff_records_parsing',
+            'idx_staff_records_domain', 'idx_staff_records_email'
+        } <= indexes
+    
+    @pytest.mark.asyncio
+    async def test_pages_and_history(self, store):
+        """Постраничное чтение записей и история пользователя, новые задания первыми"""
+        first = await store.save_parsing(1, 'https://university.ru/staff', RECORDS)
+        second = await store.save_parsing(1, 'https://institute.ru/people', RECORDS * 3)
+        await store.save_parsing(2, 'https://other.ru/', RECORDS)
+        
+        assert [p['id'] for p in await store.get_parsings(1)] == [second, first]
+        assert await store.count_records(second) == 6
+        assert len(await store.get_records(second, limit=4, offset=4)) == 2
+        assert len([r async for r in store.iter_records(1, batch_size=2)]) == 8
+        assert len([r async for r in store.iter_records(1, parsing_id=first, batch_size=1)]) == 2
+    
+    @pytest.mark.asyncio
+    async def test_validation(self, store):
+        """Отметка проверки и переход к следующей непроверенной записи"""
+        parsing_id = await store.save_parsing(1, 'https://university.ru/staff', RECORDS)
+        first = await store.next_unvalidated(parsing_id)
+        
+        assert not await store.set_validation(first['id'], 2, True)
+        assert await store.set_validation(first['id'], 1, False)
+        
+        record = await store.get_record(first['id'])
+        assert (record['is_validated'], record['is_correct']) == (1, 0)
+        assert (await store.next_unvalidated(parsing_id))['fio'] == 'Петрова Анна Сергеевна'
+    
+    @pytest.mark.asyncio
+    async def test_clear_history(self, store):
+        """Очистка удаляет только задания пользователя"""
+        parsing_id = await store.save_parsing(1, 'https://university.ru/staff', RECORDS)
+        other_id = await store.save_parsing(2, 'https://other.ru/', RECORDS)
+        
+        assert await store.clear_history(1) == 1
+        assert await store.get_records(parsing_id) == []
+        assert await store.count_records(other_id) == 2
+    
+    @pytest.mark.asyncio
+    async def test_refilter(self, store):
+        """Новый порог применяется к сохраненным кандидатам, отметки проверки сохраняются"""
+        candidates = RECORDS + [{
+            'fio': 'Сидоров Петр', 'position': None, 'email': None,
+            'source': 'https://university.ru/staff', 'confidence': 0.3
+        }]
+        parsing_id = await store.save_parsing(
+            1, 'https://university.ru/staff', RECORDS[:1], candidates=candidates, threshold=0.6
+        )
+        record = (await store.get_records(parsing_id))[0]
+        await store.set_validation(record['id'], 1, False)
+        
+        assert await store.refilter_parsing(parsing_id, 1, 0.3) == 3
+        records = await store.get_records(parsing_id)
+        assert [r['fio'] for r in records] == [c['fio'] for c in candidates]
+        assert (records[0]['is_validated'], records[0]['is_correct']) == (1, 0)
+        assert (await store.get_parsing(parsing_id))['records_count'] == 3
+        
+        assert await store.refilter_parsing(parsing_id, 1, 0.95) == 0
+        assert await store.refilter_parsing(parsing_id, 2, 0.3) is None
+        
+        unsaved_id = await store.save_parsing(1, 'https://university.ru/staff', RECORDS)
+        assert await store.refilter_parsing(unsaved_id, 1, 0.3) is None
+    
+    @pytest.mark.asyncio
+    async def test_refilter_rescore(self, store):
+        """Пересчет оценок текущим валидатором сохраняется вместе с кандидатами"""
+        candidates = [dict(record, confidence=0.0) for record in RECORDS]
+        parsing_id = await store.save_parsing(1, 'https://university.ru/staff', [], candidates=candidates)
+        
+        assert await store.refilter_parsing(parsing_id, 1, 0.5) == 0
+        assert await store.refilter_parsing(parsing_id, 1, 0.5, rescore=True) == 2
+        assert all(c['confidence'] >= 0.5 for c in await store.get_candidates(parsing_id))
+    
+    @pytest.mark.asyncio
+    async def test_user_settings(self, store):
+        """Настройки пользователя дополняются значениями по умолчанию"""
+        assert (await store.get_user_settings(1))['confidence_threshold'] == 0.6
+        # Загрузка страниц профилей — только по выбору пользователя
+        assert (await store.get_user_settings(1))['enrich_profiles'] is False
+        
+        await store.update_user_settings(1, confidence_threshold=0.4)
+        
+        settings = await store.get_user_settings(1)
+        assert settings['confidence_threshold'] == 0.4
+        assert settings['max_depth'] == 2
+        assert (await store.get_user_settings(2))['confidence_threshold'] == 0.6
+    
+    @pytest.mark.asyncio
+    async def test_background_flush(self, tmp_path):
+        """Очередь записей пишется фоновой задачей без обращений к чтению"""
+        store = ResultStore(str(tmp_path / 'results.db'), batch_size=100, flush_interval=0.01)
+        await store.open()
+        try:
+            await store.save_parsing(1, 'https://university.ru/staff', RECORDS)
+            assert len(store._pending) == 2
+            
+            await asyncio.sleep(0.1)
+            
+            assert store._pending == []
+        finally:
+            await store.close()
+
+
+    @pytest.mark.asyncio
+    async def test_bad_row_quarantined(self, tmp_path):
+        """Ошибочная строка не блокирует пакет: остальные записаны, она — в карантине"""
+        store = ResultStore(str(tmp_path / 'results.db'), batch_size=100, flush_interval=60)
+        await store.open()
+        try:
+            parsing_id = await store.save_parsing(1, 'https://university.ru/staff', RECORDS)
+            # Задания 999 нет — нарушение внешнего ключа
+            store._pending.insert(1, (999, 1, 'university.ru', 'Сидоров', None, None, None, None, None, None, 0.5))
+            
+            records = await store.get_records(parsing_id)
+            
+            assert [r['fio'] for r in records] == ['Иванов Иван Иванович', 'Петрова Анна Сергеевна']
+            assert store._pending == []
+            assert store.quarantined == 1
+            with open(store.quarantine_path, encoding='utf-8') as f:
+                assert json.loads(f.readline())['record']['parsing_id'] == 999
+        finally:
+            await store.close()
+
+
+class TestSearch:
+    """Тесты для поиска по сохраненным записям"""
+    
+    PEOPLE = RECORDS + [
+        {
+            'fio': 'Щукин Юрий Павлович', 'position': 'ассистент', 'email': None,
+            'source': 'https://institute.ru/people', 'confidence': 0.6
+        },
+    ]
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('query, fio', [
+        ('Иванов', 'Иванов Иван Иванович'),
+        ('петро', 'Петрова Анна Сергеевна'),
+        ('shchukin yuriy', 'Щукин Юрий Павлович'),
+        ('IVANOV@university', 'Иванов Иван Иванович'),
+        ('ивонов', 'Иванов Иван Иванович'),
+        ('Щукен', 'Щукин Юрий Павлович'),
+    ])
+    async def test_find(self, store, query, fio):
+        """Подстрока, транслит, адрес и одна опечатка"""
+        await store.save_parsing(1, 'https://university.ru/staff', self.PEOPLE)
+        
+        assert [r['fio'] for r in await store.search(query)] == [fio]
+    
+    @pytest.mark.asyncio
+    async def test_one_result_per_person(self, store):
+        """Человек из нескольких обходов возвращается один раз, последней записью"""
+        await store.save_parsing(1, 'https://university.ru/staff', self.PEOPLE)
+        latest = await store.save_parsing(2, 'https://university.ru/staff', RECORDS[:1])
+        
+        found = await store.search('ivanov')
+        
+        assert len(found) == 1
+        assert found[0]['parsing_id'] == latest
+    
+    @pytest.mark.asyncio
+    async def test_index_follows_records(self, store):
+        """Короткий запрос не ищется, удаленные записи пропадают из индекса"""
+        await store.save_parsing(1, 'https://university.ru/staff', self.PEOPLE)
+        assert await store.search('Юр') == []
+        
+        await store.clear_history(1)
+        
+        assert await store.search('Иванов') == []
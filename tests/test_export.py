@@ -0,0 +1,81 @@
+"""
+Тесты для потоковой выгрузки
+"""
+
+import csv
+import json
+import os
+import pytest
+
+from utils.export import ExportError, PYARROW_AVAILABLE, export_records
+
+
+RECORDS = [
+    {
+        'fio': 'Иванов Иван Иванович', 'position': 'профессор', 'email': 'ivanov@university.ru',
+        'source': 'https://university.ru/staff', 'confidence': 0.9
+    },
+    {
+        'fio': 'Петрова Анна Сергеевна', 'position': 'доцент', 'email': None,
+        'source_url': 'https://university.ru/staff', 'confidence': 0.5, 'is_validated': 1, 'is_correct': 0
+    },
+    {
+        'fio': 'Сидоров Петр Николаевич', 'position': None, 'email': 'sidorov@university.ru',
+        'source': 'https://university.ru/staff', 'confidence': 0.7
+    },
+]
+
+
+async def _records():
+    for record in RECORDS:
+        yield record
+
+
+class TestExport:
+    """Тесты для выгрузки записей во временный файл"""
+    
+    @pytest.mark.asyncio
+    async def test_csv_with_bom(self, tmp_path):
+        """CSV в UTF-8 с BOM из асинхронного итератора, запись порциями"""
+        path, count = await export_records(_records(), 'csv', chunk_size=2, directory=str(tmp_path))
+        
+        with open(path, 'rb') as f:
+            assert f.read(3) == b'\xef\xbb\xbf'
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            rows = list(csv.DictReader(f))
+        
+        assert count == 3
+        assert [row['fio'] for row in rows] == [r['fio'] for r in RECORDS]
+        assert rows[0]['source_url'] == 'https://university.ru/staff'
+        assert (rows[0]['is_correct'], rows[1]['is_correct']) == ('', 'False')
+    
+    @pytest.mark.asyncio
+    async def test_jsonl(self, tmp_path):
+        """JSONL: одна запись на строку"""
+        path, count = await export_records(RECORDS, 'jsonl', directory=str(tmp_path))
+        
+        with open(path, encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f]
+        
+        assert count == 3
+        assert rows[1]['email'] is None
+        assert (rows[1]['is_validated'], rows[1]['is_correct']) == (True, False)
+    
+    @pytest.mark.asyncio
+    @pytest.mark.skipif(not PYARROW_AVAILABLE, reason="pyarrow not installed")
+    async def test_parquet_row_groups(self, tmp_path):
+        """Parquet: каждая порция — отдельная группа строк"""
+        import pyarrow.parquet as pq
+        
+        path, count = await export_records(_records(), 'parquet', chunk_size=2, directory=str(tmp_path))
+        
+        parquet = pq.ParquetFile(path)
+        assert parquet.metadata.num_row_groups == 2
+        assert parquet.read().column('fio').to_pylist() == [r['fio'] for r in RECORDS]
+    
+    @pytest.mark.asyncio
+    async def test_unknown_format(self, tmp_path):
+        """Неизвестный формат отклоняется без временного файла"""
+        with pytest.raises(ExportError):
+            await export_records(RECORDS, 'xlsx', directory=str(tmp_path))
+        assert os.listdir(tmp_path) == []
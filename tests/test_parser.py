@@ -2,13 +2,38 @@
 Тесты для парсера
 """
 
+import asyncio
+import contextlib
+import io
+import json
+import time
+import numpy as np
 import pytest
-from unittest.mock import Mock, patch
+import requests
+from unittest.mock import AsyncMock, Mock, patch
 from bs4 import BeautifulSoup
 
 from parser.extractors import StaffDataExtractor
 from parser.validators import DataValidator
 from parser.main import UniversityParser
+from parser.anchored import find_record_blocks
+from parser.api_capture import ApiEndpointStore, find_people_lists, map_api_item
+from parser.candidates import filter_candidates, pack_candidates, rescore_candidates, unpack_candidates
+from parser.boilerplate import TemplateDetector, strip_non_content
+from parser.charset import CharsetDetector, detect_charset, sniff_meta_charset
+from parser.classifier import ContainerClassifier, DEFAULT_BIAS, DEFAULT_WEIGHTS, TUNED_FEATURES, text_features
+from parser.dom import css_to_xpath, get_dom_backend
+from parser.fetch import ResponseRejected
+from parser.names import NameService
+from parser import pagination
+from parser.pagination import anchors_from_soup, find_pagination_links
+from parser.render import RenderProfile, expand_listing, wait_for_dom_ready
+from parser.render_policy import RenderDecisionStore, DECISION_HTML, DECISION_RENDER
+from parser.resilience import CircuitBreaker, CircuitOpenError, RetryPolicy
+from parser.robots import RobotsRules, RobotsService, ROBOTS_MAX_BYTES
+from parser.scheduler import HostLimiter, HostScheduler
+from parser.sitemap import SitemapDiscovery
+from parser.tables import extract_table
 
 
 class TestStaffDataExtractor:
@@ -236,3 +261,1745 @@ async def test_parser_integration():
         assert result['position'], "Position should be present"
         assert result['email'], "Email should be present"
         assert result['confidence'] > 0.5, "Confidence should be reasonable"
+
+
+class TestSpeculativeRender:
+    """Тесты для спекулятивного JS рендеринга"""
+    
+    def setup_method(self):
+        self.parser = UniversityParser(respect_robots=False)
+    
+    def test_looks_js_driven(self):
+        """Тест эвристик JS-страницы"""
+        spa_html = '<html><body><div id="root"></div><script src="app.js"></script></body></html>'
+        static_html = "<html><body>" + "".join(
+            f"<p>Иванов Иван Иванович {i}, профессор кафедры, ivanov{i}@university.ru</p>"
+            for i in range(20)
+        ) + "</body></html>"
+        
+        assert self.parser._looks_js_driven(BeautifulSoup(spa_html, 'html.parser'))
+        assert not self.parser._looks_js_driven(BeautifulSoup(static_html, 'html.parser'))
+    
+    def test_merge_page_results(self):
+        """Тест объединения результатов HTML и JS"""
+        html_results = [{'fio': 'Иванов Иван', 'email': 'ivanov@university.ru', 'confidence': 0.5}]
+        js_results = [
+            {'fio': 'Иванов Иван', 'email': 'IVANOV@university.ru', 'confidence': 0.9},
+            {'fio': 'Петров Петр', 'email': 'petrov@university.ru', 'confidence': 0.8},
+        ]
+        
+        merged = self.parser._merge_page_results(html_results, js_results)
+        
+        assert len(merged) == 2
+        assert merged[0]['confidence'] == 0.9
+    
+    @pytest.mark.asyncio
+    async def test_render_cancelled_when_html_is_good(self):
+        """Рендеринг отменяется, если HTML результат проходит порог качества"""
+        good = [
+            {'fio': f'Иванов Иван {i}', 'email': f'i{i}@university.ru', 'confidence': 0.9}
+            for i in range(3)
+        ]
+        render_started = asyncio.Event()
+        render_cancelled = asyncio.Event()
+        
+        async def slow_render(url):
+            render_started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                render_cancelled.set()
+                raise
+            return []
+        
+        async def fetch(url):
+            return b'<html><body><div id="app"></div></body></html>'
+        
+        async def extract(soup, url):
+            await render_started.wait()
+            return good
+        
+        self.parser._fetch_html = fetch
+        self.parser._parse_js_page = slow_render
+        self.parser._extract_staff_data = extract
+        
+        results = await self.parser._parse_page("https://university.ru/staff")
+        
+        assert results == good
+        assert render_cancelled.is_set()
+    
+    @pytest.mark.asyncio
+    async def test_fragments_do_not_count_as_page_results(self):
+        """Фрагменты без ФИО не отменяют JS рендеринг и не учитываются в решении"""
+        fragments = [
+            {'fio': None, 'position': 'Профессор', 'email': None, 'confidence': 0.2}
+            for _ in range(5)
+        ]
+        people = [
+            {'fio': f'Иванов Иван {i}', 'email': f'i{i}@university.ru', 'confidence': 0.9}
+            for i in range(3)
+        ]
+        observed = []
+        
+        async def html_page(url):
+            return fragments
+        
+        async def js_page(url):
+            return people
+        
+        self.parser.speculative_render = False
+        self.parser._parse_known_api = lambda url: asyncio.sleep(0, [])
+        self.parser._get_render_decision = lambda url: None
+        self.parser._parse_html_page = html_page
+        self.parser._parse_js_page = js_page
+        self.parser.render_decisions = type('Store', (), {
+            'record': lambda self, url, html_count, render_added: observed.append((html_count, render_added))
+        })()
+        
+        results = await self.parser._parse_page_content("https://university.ru/staff")
+        
+        assert people[0] in results
+        assert observed == [(0, 3)]
+
+
+class TestRenderDecisionStore:
+    """Тесты для обучаемого решения о рендеринге"""
+    
+    def test_url_pattern(self):
+        """Тест шаблона URL"""
+        assert RenderDecisionStore.url_pattern("https://u.ru/staff/123/card") == "/staff/{n}"
+        assert RenderDecisionStore.url_pattern("https://u.ru/") == "/"
+    
+    def test_decisions_are_learned_and_persisted(self, tmp_path):
+        """Решение выучивается по наблюдениям и сохраняется на диск"""
+        path = str(tmp_path / "decisions.json")
+        store = RenderDecisionStore(path)
+        
+        assert store.decide("https://spa.ru/people") is None
+        
+        for _ in range(3):
+            store.record("https://spa.ru/people", html_count=0, render_added=5)
+            store.record("https://small.ru/kafedra", html_count=2, render_added=0)
+        store.save()
+        
+        reloaded = RenderDecisionStore(path)
+        assert reloaded.decide("https://spa.ru/people") == DECISION_RENDER
+        assert reloaded.decide("https://small.ru/kafedra") == DECISION_HTML
+        # Решение домена применяется к новым шаблонам URL
+        assert reloaded.decide("https://small.ru/other") == DECISION_HTML
+    
+    def test_explore_check_does_not_count(self, tmp_path):
+        """Проверка перепроверки не меняет счетчик, страницы учитываются отдельно"""
+        store = RenderDecisionStore(str(tmp_path / "decisions.json"), explore_every=3)
+        for _ in range(3):
+            store.record("https://small.ru/kafedra", html_count=2, render_added=0)
+        url = "https://small.ru/kafedra"
+        
+        # Повторные проверки одной страницы дают один и тот же ответ
+        assert [store.should_explore(url) for _ in range(5)] == [False] * 5
+        
+        explored = []
+        for _ in range(6):
+            explored.append(store.should_explore(url))
+            store.count_decided_page(url)
+        assert explored == [False, False, True, False, False, True]
+        
+        store.save()
+        reloaded = RenderDecisionStore(str(tmp_path / "decisions.json"), explore_every=3)
+        assert reloaded.domains["small.ru"]["total"]["decided_pages"] == 6
+
+
+class TestRenderProfile:
+    """Тесты для профиля блокировки ресурсов"""
+    
+    def test_should_block(self):
+        """Тест правил блокировки запросов"""
+        profile = RenderProfile(allowed_hosts=['cdn.university.ru'])
+        
+        test_cases = [
+            ('image', 'https://university.ru/banner.jpg', True),
+            ('font', 'https://fonts.example.com/a.woff2', True),
+            ('document', 'https://university.ru/staff', False),
+            ('xhr', 'https://university.ru/api/people', False),
+            ('script', 'https://mc.yandex.ru/metrika/tag.js', True),
+            ('script', 'https://www.google-analytics.com/analytics.js', True),
+            ('script', 'https://university.ru/app.js', False),
+            ('image', 'https://cdn.university.ru/photo.jpg', False),
+        ]
+        
+        for resource_type, url, expected in test_cases:
+            result = profile.should_block(resource_type, url)
+            assert result == expected, f"Failed for {resource_type} {url}"
+    
+    def test_disabled_profile(self):
+        """Отключенный профиль ничего не блокирует"""
+        profile = RenderProfile(enabled=False)
+        assert not profile.should_block('image', 'https://university.ru/a.png')
+
+
+class TestDomReadyWait:
+    """Тесты для адаптивного ожидания готовности DOM"""
+    
+    @pytest.mark.asyncio
+    async def test_passes_budget_to_page_script(self):
+        """Оставшийся бюджет времени передается в скрипт ожидания"""
+        page = Mock()
+        
+        async def evaluate(script, args):
+            assert 'MutationObserver' in script
+            return {'reason': 'quiet', 'elapsed_ms': 420, 'staff_seen': False, 'args': args}
+        
+        page.evaluate = evaluate
+        readiness = await wait_for_dom_ready(page, 5000)
+        
+        assert readiness['reason'] == 'quiet'
+        assert readiness['args']['timeoutMs'] == 5000
+    
+    @pytest.mark.asyncio
+    async def test_exhausted_budget_and_errors(self):
+        """Исчерпанный бюджет и ошибки скрипта не прерывают рендеринг"""
+        page = Mock()
+        
+        async def evaluate(script, args):
+            raise RuntimeError("Execution context was destroyed")
+        
+        page.evaluate = evaluate
+        
+        assert (await wait_for_dom_ready(page, 0))['reason'] == 'timeout'
+        assert (await wait_for_dom_ready(page, 1000))['reason'] == 'error'
+    
+    @pytest.mark.asyncio
+    async def test_expand_listing_stops_at_deadline(self):
+        """Раскрытие списка укладывается в общий срок, а не в срок на каждый шаг"""
+        page = Mock()
+        timeouts = []
+        
+        async def evaluate(script, *args):
+            if 'timeoutMs' in (args[0] if args and isinstance(args[0], dict) else {}):
+                await asyncio.sleep(args[0]['timeoutMs'] / 1000)
+                return {'reason': 'timeout', 'elapsed_ms': args[0]['timeoutMs'], 'staff_seen': False}
+            return True
+        
+        async def wait_for_function(script, arg=None, timeout=None):
+            timeouts.append(timeout)
+            await asyncio.sleep(0.02)
+        
+        page.evaluate = evaluate
+        page.wait_for_function = wait_for_function
+        
+        started = time.monotonic()
+        steps = await expand_listing(page, 100, started + 0.3, step_timeout_ms=5000)
+        
+        assert time.monotonic() - started < 0.5
+        assert 0 < steps < 100
+        assert all(0 < timeout <= 300 for timeout in timeouts)
+
+
+class TestInBrowserExtraction:
+    """Тесты для извлечения из областей, собранных в браузере"""
+    
+    HTML = """
+    <html><body>
+    <nav><ul><li><a href="/">Главная</a></li><li><a href="/staff">Сотрудники</a></li></ul></nav>
+    <div class="staff-list">
+        <div class="staff-item">
+            <h3>Иванов Иван Иванович</h3><p>профессор</p>
+            <a href="mailto:ivanov@university.ru">написать</a><script>track()</script>
+        </div>
+        <div class="staff-item">
+            <h3>Петров Петр Петрович</h3><p>доцент</p>
+            <a href="mailto:petrov@university.ru">написать</a>
+        </div>
+    </div>
+    <table>
+        <tr><th>ФИО</th><th>Должность</th><th>E-mail</th></tr>
+        <tr><td>Сидорова Анна Сергеевна</td><td>ассистент</td><td>sidorova@university.ru</td></tr>
+        <tr><td>Козлов Олег Павлович</td><td>старший преподаватель</td><td>kozlov@university.ru</td></tr>
+    </table>
+    </body></html>
+    """
+    
+    @staticmethod
+    def browser_payload(html, selectors):
+        """Имитация EXTRACT_BLOCKS_SCRIPT: компактные описания совпадений и сетки таблиц"""
+        soup = BeautifulSoup(html, 'html.parser')
+        for node in soup.select('script, style, noscript, template, svg'):
+            node.decompose()
+        
+        def text(el):
+            return el.get_text(' ', strip=True)
+        
+        def links(el):
+            return [[a['href'], a.get_text(strip=True)] for a in el.find_all('a', href=True)][:10]
+        
+        def mailtos(el):
+            return [a['href'] for a in el.select('a[href^="mailto:"]')]
+        
+        matched, tables = set(), set()
+        for selector in selectors:
+            for el in soup.select(selector):
+                if el.find_parent('nav'):
+                    continue
+                table = el.find_parent('table') if el.name == 'tr' else None
+                if table:
+                    tables.add(id(table))
+                else:
+                    matched.add(id(el))
+        
+        elements = [
+            el for el in soup.find_all(True)
+            if id(el) in matched and not any(id(parent) in tables for parent in el.parents)
+        ]
+        index = {id(el): i for i, el in enumerate(elements)}
+        blocks = [{
+            'text': text(el),
+            'mailtos': mailtos(el),
+            'links': links(el),
+            'path': el.name,
+            'linkChars': sum(len(text(a)) for a in el.find_all('a', href=True)),
+            'depth': len(list(el.parents)),
+            'siblings': 0,
+            'parent': next((index[id(parent)] for parent in el.parents if id(parent) in index), -1)
+        } for el in elements]
+        grids = [
+            [[{'text': text(cell), 'mailtos': mailtos(cell), 'links': links(cell)} for cell in row.find_all(['td', 'th'])]
+             for row in table.find_all('tr')]
+            for table in soup.find_all('table') if id(table) in tables
+        ]
+        return {'blocks': blocks, 'tables': grids, 'anchors': [], 'truncated': False}
+    
+    @pytest.mark.asyncio
+    async def test_blocks_match_html_pipeline(self):
+        """Записи из компактных блоков совпадают с разбором полного HTML"""
+        parser = UniversityParser()
+        payload = self.browser_payload(self.HTML, parser.container_selectors)
+        fetch_html = AsyncMock(return_value=self.HTML)
+        
+        from_blocks = await parser._extract_staff_from_blocks(payload, "https://university.ru/staff", fetch_html)
+        staff_tables = parser.crawl_stats['staff_tables']
+        from_html = await UniversityParser()._extract_staff_data(
+            BeautifulSoup(self.HTML, 'html.parser'), "https://university.ru/staff"
+        )
+        
+        def key(records):
+            return {(r['fio'], r['email']) for r in records}
+        
+        assert key(from_blocks) == key(from_html)
+        assert len(from_blocks) == 4
+        assert {r['email'] for r in from_blocks} == {
+            'ivanov@university.ru', 'petrov@university.ru', 'sidorova@university.ru', 'kozlov@university.ru'
+        }
+        assert staff_tables == 1
+        fetch_html.assert_not_called()
+    
+    def test_payload_is_compact(self):
+        """Из браузера передаются текст, адреса и путь без разметки; nav и скрипты пропускаются"""
+        payload = self.browser_payload(self.HTML, UniversityParser.container_selectors)
+        
+        sent = json.dumps(payload, ensure_ascii=False)
+        assert '<' not in sent
+        assert 'track()' not in sent
+        assert 'Главная' not in sent
+        assert [len(row) for row in payload['tables'][0]] == [3, 3, 3]
+        
+        # Карточки ссылаются на общий список как на ближайший совпавший предок
+        items = [block for block in payload['blocks'] if block['parent'] >= 0]
+        assert len(items) == 2
+        assert items[0]['mailtos'] == ['mailto:ivanov@university.ru']
+    
+    def test_unrecognised_table_rows_become_blocks(self):
+        """Строки таблицы без столбцов ФИО и адреса оцениваются как обычные блоки"""
+        parser = UniversityParser()
+        grid = [
+            [{'text': 'Иванов Иван Иванович, профессор'}, {'text': 'ivanov@university.ru'}],
+            [{'text': 'Расписание'}, {'text': 'Корпус 1'}],
+            [{'text': 'Контакты'}, {'text': 'Корпус 2'}],
+        ]
+        
+        results = parser._records_from_blocks({'blocks': [], 'tables': [grid]}, "https://university.ru/staff")
+        
+        assert [r['email'] for r in results] == ['ivanov@university.ru']
+        assert parser.crawl_stats['staff_tables'] == 0
+    
+    @pytest.mark.asyncio
+    async def test_page_html_only_when_blocks_empty(self):
+        """HTML страницы запрашивается вторым вызовом, только если области ничего не дали"""
+        parser = UniversityParser()
+        text_page = "<html><body><p>Иванов Иван Иванович - профессор - ivanov@university.ru</p></body></html>"
+        fetch_html = AsyncMock(return_value=text_page)
+        
+        results = await parser._extract_staff_from_blocks(
+            {'blocks': [], 'tables': [], 'anchors': []}, "https://university.ru/staff", fetch_html
+        )
+        
+        fetch_html.assert_awaited_once()
+        assert [r['email'] for r in results] == ['ivanov@university.ru']
+
+
+class TestApiCapture:
+    """Тесты для извлечения сотрудников из JSON API"""
+    
+    API_RESPONSE = {
+        'status': 'ok',
+        'data': {
+            'total': 2,
+            'items': [
+                {'last_name': 'Иванов', 'first_name': 'Иван', 'middle_name': 'Иванович',
+                 'email': 'ivanov@university.ru', 'position': 'профессор'},
+                {'last_name': 'Петров', 'first_name': 'Петр', 'middle_name': 'Петрович',
+                 'email': 'petrov@university.ru', 'position': 'доцент'},
+            ]
+        },
+        'menu': [{'name': 'Главная', 'url': '/'}, {'name': 'Контакты', 'url': '/contacts'}]
+    }
+    
+    def test_find_people_lists(self):
+        """Находится только список людей, меню пропускается"""
+        lists = find_people_lists(self.API_RESPONSE)
+        
+        assert len(lists) == 1
+        assert map_api_item(lists[0][0]) == {
+            'fio': 'Иванов Иван Иванович',
+            'email': 'ivanov@university.ru',
+            'position': 'профессор',
+            'phone': None
+        }
+    
+    @pytest.mark.asyncio
+    async def test_captured_endpoint_is_reused_without_browser(self, tmp_path):
+        """Endpoint из рендеринга запоминается и затем вызывается напрямую"""
+        parser = UniversityParser(respect_robots=False)
+        parser.api_endpoints = ApiEndpointStore(str(tmp_path / "api.json"))
+        page_url = "https://university.ru/staff"
+        endpoint = "https://university.ru/api/staff?page=1"
+        
+        captured = [(endpoint, 'GET', self.API_RESPONSE)]
+        results = parser._records_from_captured_api(captured, page_url)
+        
+        assert {r['email'] for r in results} == {'ivanov@university.ru', 'petrov@university.ru'}
+        assert parser.api_endpoints.lookup(page_url) == [endpoint]
+        
+        response = requests.Response()
+        response.status_code = 200
+        response.headers['Content-Type'] = 'application/json; charset=utf-8'
+        response.raw = io.BytesIO(json.dumps(self.API_RESPONSE).encode('utf-8'))
+        parser.session.get = Mock(return_value=response)
+        
+        direct = await parser._parse_known_api(page_url)
+        
+        parser.session.get.assert_called_once()
+        assert len(direct) == 2
+    
+    def _json_response(self, data):
+        response = requests.Response()
+        response.status_code = 200
+        response.headers['Content-Type'] = 'application/json'
+        response.raw = io.BytesIO(json.dumps(data).encode('utf-8'))
+        return response
+    
+    def _page(self, surname, email):
+        return {'items': [{'last_name': surname, 'first_name': 'Иван', 'email': email, 'position': 'доцент'}] * 2}
+    
+    @pytest.mark.asyncio
+    async def test_all_paginated_endpoints_replayed(self, tmp_path):
+        """Все страницы списка из XHR запоминаются и запрашиваются напрямую"""
+        parser = UniversityParser(respect_robots=False)
+        parser.api_endpoints = ApiEndpointStore(str(tmp_path / "api.json"))
+        page_url = "https://university.ru/staff"
+        pages = {
+            "https://university.ru/api/staff?page=1": self._page('Иванов', 'ivanov@university.ru'),
+            "https://university.ru/api/staff?page=2": self._page('Петров', 'petrov@university.ru'),
+        }
+        
+        parser._records_from_captured_api([(url, 'GET', data) for url, data in pages.items()], page_url)
+        assert parser.api_endpoints.lookup(page_url) == list(pages)
+        
+        parser.session.get = Mock(side_effect=lambda url, **kwargs: self._json_response(pages[url]))
+        direct = await parser._parse_known_api(page_url)
+        
+        assert parser.session.get.call_count == 2
+        assert {r['email'] for r in direct} == {'ivanov@university.ru', 'petrov@university.ru'}
+    
+    @pytest.mark.asyncio
+    async def test_direct_api_respects_robots_and_post(self, tmp_path):
+        """Без прямого запроса: endpoint запрещен robots.txt или часть людей пришла из POST"""
+        parser = UniversityParser()
+        parser.api_endpoints = ApiEndpointStore(str(tmp_path / "api.json"))
+        page_url = "https://university.ru/staff"
+        endpoint = "https://university.ru/api/staff"
+        parser._records_from_captured_api([(endpoint, 'GET', self.API_RESPONSE)], page_url)
+        
+        rules = Mock(can_fetch=Mock(return_value=False), crawl_delay=Mock(return_value=None))
+        parser.robots = Mock(get_rules=AsyncMock(return_value=rules), user_agent='*')
+        parser.session.get = Mock()
+        
+        assert await parser._parse_known_api(page_url) == []
+        parser.session.get.assert_not_called()
+        
+        parser._records_from_captured_api(
+            [(endpoint, 'GET', self.API_RESPONSE), ("https://university.ru/api/search", 'POST', self.API_RESPONSE)],
+            page_url
+        )
+        assert parser.api_endpoints.lookup(page_url) == []
+
+
+class TestPagination:
+    """Тесты для поиска страниц пагинации"""
+    
+    def test_numbered_pages_and_next(self):
+        """Номера страниц достраиваются до последней, ссылка "далее" учитывается"""
+        html = """
+        <div class="pager">
+            <a href="?PAGEN_1=2">2</a><a href="?PAGEN_1=3">3</a>
+            <span>...</span><a href="?PAGEN_1=6">6</a>
+            <a href="?PAGEN_1=2">Далее</a>
+        </div>
+        <a href="/about">О кафедре</a>
+        """
+        soup = BeautifulSoup(html, 'html.parser')
+        links = find_pagination_links(anchors_from_soup(soup), "https://university.ru/staff/")
+        
+        assert links == [f"https://university.ru/staff/?PAGEN_1={n}" for n in range(2, 7)]
+    
+    def test_first_page_normalized_to_base(self):
+        """Первая страница приводится к URL без номера и не обходится дважды"""
+        anchors = [("?PAGEN_1=1", "1", ""), ("?PAGEN_1=2", "2", ""), ("?PAGEN_1=4", "4", "")]
+        
+        from_base = find_pagination_links(anchors, "https://university.ru/staff/")
+        assert from_base == [f"https://university.ru/staff/?PAGEN_1={n}" for n in range(2, 5)]
+        
+        from_third = find_pagination_links(anchors, "https://university.ru/staff/?PAGEN_1=3")
+        assert from_third[0] == "https://university.ru/staff/"
+        assert "https://university.ru/staff/?PAGEN_1=1" not in from_third
+        assert "https://university.ru/staff/?PAGEN_1=3" not in from_third
+        
+        from_first = find_pagination_links(anchors, "https://university.ru/staff/?PAGEN_1=1")
+        assert "https://university.ru/staff/" not in from_first
+        
+        path_links = find_pagination_links([("/staff/page/1/", "1", ""), ("/staff/page/3/", "3", "")],
+                                           "https://university.ru/staff/page/2/")
+        assert path_links == ["https://university.ru/staff/", "https://university.ru/staff/page/3/"]
+    
+    def test_letter_index(self):
+        """Алфавитный указатель распознается только при достаточном числе букв"""
+        letters = "АБВГДЕ"
+        html = "".join(f'<a href="/staff?letter={c}">{c}</a>' for c in letters)
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        links = find_pagination_links(anchors_from_soup(soup), "https://university.ru/staff")
+        assert len(links) == len(letters)
+        
+        few = BeautifulSoup('<a href="/a">А</a><a href="/b">Б</a>', 'html.parser')
+        assert find_pagination_links(anchors_from_soup(few), "https://university.ru/staff") == []
+    
+    def test_page_budget(self):
+        """Число найденных страниц ограничено бюджетом"""
+        anchors = [(f"/staff/page/{n}/", str(n), '') for n in range(2, 100)]
+        links = find_pagination_links(anchors, "https://university.ru/staff/", max_pages=5)
+        assert len(links) == 5
+    
+    def test_huge_page_number_clamped(self):
+        """Ссылка на огромный номер страницы не порождает URL сверх бюджета"""
+        anchors = [("?page=2", "2", ""), ("?page=100000", "100000", "")]
+        
+        with patch('parser.pagination._with_page_number', wraps=pagination._with_page_number) as build:
+            links = find_pagination_links(anchors, "https://university.ru/staff/?page=3", max_pages=5)
+        
+        assert links == [
+            "https://university.ru/staff/", "https://university.ru/staff/?page=2",
+            "https://university.ru/staff/?page=4", "https://university.ru/staff/?page=5",
+            "https://university.ru/staff/?page=6",
+        ]
+        assert build.call_count <= 6
+    
+    @pytest.mark.asyncio
+    async def test_crawl_follows_pagination(self):
+        """Обход догружает найденные страницы списка в рамках бюджета"""
+        parser = UniversityParser(max_pagination_pages=2)
+        parsed = []
+        
+        async def parse_page(url):
+            parsed.append(url)
+            if url.endswith('/staff'):
+                parser._pagination_links[url] = [f"{url}?page={n}" for n in range(2, 6)]
+            return [{'fio': url, 'email': '', 'confidence': 1.0}]
+        
+        parser._parse_page = parse_page
+        results = await parser._crawl(["https://university.ru/staff"], time.time())
+        
+        assert len(parsed) == 3
+        assert len(results) == 3
+        assert parser.crawl_stats['pagination_pages'] == 2
+
+
+class TestProfileEnrichment:
+    """Тесты для дозаполнения записей со страниц профилей"""
+    
+    def setup_method(self):
+        self.parser = UniversityParser(respect_robots=False)
+    
+    def test_find_profile_url(self):
+        """Ссылка с фамилией сотрудника считается профилем"""
+        links = [
+            ('mailto:ivanov@university.ru', 'ivanov@university.ru'),
+            ('https://other.ru/ivanov', 'Иванов И.И.'),
+            ('/staff/ivanov', 'Иванов Иван Иванович'),
+        ]
+        
+        url = self.parser._find_profile_url(links, 'Иванов Иван Иванович', "https://university.ru/kafedra")
+        
+        assert url == "https://university.ru/staff/ivanov"
+    
+    @pytest.mark.asyncio
+    async def test_enrich_records_from_profiles(self):
+        """Email и телефон переносятся со страницы профиля, общий адрес пропускается"""
+        profile_html = """
+        <html><body>
+            <nav>Ректорат</nav>
+            <h1>Иванов Иван Иванович</h1>
+            <p>профессор кафедры, тел. +7 (495) 123-45-67</p>
+            <a href="mailto:ivanov@university.ru">ivanov@university.ru</a>
+            <footer>info@university.ru</footer>
+        </body></html>
+        """
+        
+        async def fetch(url):
+            return profile_html.encode('utf-8')
+        
+        self.parser._fetch_html = fetch
+        record = {
+            'fio': 'Иванов Иван Иванович',
+            'position': None,
+            'email': None,
+            'source': "https://university.ru/kafedra",
+            'confidence': 0.3,
+            'profile_url': "https://university.ru/staff/ivanov"
+        }
+        
+        await self.parser._enrich_records([record], time.time())
+        
+        assert record['email'] == 'ivanov@university.ru'
+        assert 'профессор' in record['position']
+        assert record['phone'] == '+7 (495) 123-45-67'
+        assert record['confidence'] > 0.3
+        assert self.parser.crawl_stats['profiles_enriched'] == 1
+
+
+class TestSitemapDiscovery:
+    """Тесты для поиска страниц сотрудников в sitemap"""
+    
+    INDEX = b"""<?xml version="1.0" encoding="UTF-8"?>
+    <sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+        <sitemap><loc>https://university.ru/sitemap-pages.xml.gz</loc></sitemap>
+    </sitemapindex>"""
+    
+    PAGES = b"""<?xml version="1.0" encoding="UTF-8"?>
+    <urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+        <url><loc>https://university.ru/news/2024/01</loc></url>
+        <url><loc>https://university.ru/kafedra/fizika/sotrudniki</loc></url>
+        <url><loc>https://university.ru/staff</loc></url>
+        <url><loc>https://university.ru/staff/plan.pdf</loc></url>
+        <url><loc>https://other.ru/staff</loc></url>
+    </urlset>"""
+    
+    def make_session(self):
+        import gzip
+        import io
+        
+        bodies = {
+            'https://university.ru/robots.txt': b"User-agent: *\nSitemap: https://university.ru/sitemap-index.xml\n",
+            'https://university.ru/sitemap-index.xml': self.INDEX,
+            'https://university.ru/sitemap-pages.xml.gz': gzip.compress(self.PAGES),
+        }
+        
+        def get(url, **kwargs):
+            response = Mock()
+            body = bodies.get(url)
+            response.status_code = 200 if body is not None else 404
+            response.text = (body or b'').decode('utf-8', 'ignore')
+            response.raw = io.BytesIO(body or b'')
+            response.headers = {}
+            return response
+        
+        session = Mock()
+        session.get = Mock(side_effect=get)
+        return session
+    
+    @pytest.mark.asyncio
+    async def test_discover_from_gzipped_index(self, tmp_path):
+        """Страницы сотрудников находятся через индекс и сжатый sitemap"""
+        discovery = SitemapDiscovery(str(tmp_path / 'sitemaps.json'))
+        session = self.make_session()
+        
+        urls = await discovery.discover(session, "https://university.ru/")
+        
+        assert urls == [
+            "https://university.ru/kafedra/fizika/sotrudniki",
+            "https://university.ru/staff",
+        ]
+    
+    @pytest.mark.asyncio
+    async def test_cache_per_domain(self, tmp_path):
+        """Повторный запрос в пределах TTL не загружает sitemap"""
+        path = str(tmp_path / 'sitemaps.json')
+        session = self.make_session()
+        await SitemapDiscovery(path).discover(session, "https://university.ru/")
+        calls = session.get.call_count
+        
+        urls = await SitemapDiscovery(path).discover(session, "https://university.ru/")
+        
+        assert session.get.call_count == calls
+        assert "https://university.ru/staff" in urls
+    
+    @pytest.mark.asyncio
+    async def test_each_sitemap_takes_own_slot(self, tmp_path):
+        """Слот хоста берется на каждый запрос, а не на весь обход"""
+        discovery = SitemapDiscovery(str(tmp_path / 'sitemaps.json'))
+        slots = []
+        
+        @contextlib.asynccontextmanager
+        async def slot(url):
+            slots.append(url)
+            yield
+        
+        await discovery.discover(self.make_session(), "https://university.ru/", slot=slot)
+        
+        assert slots == [
+            "https://university.ru/robots.txt",
+            "https://university.ru/sitemap-index.xml",
+            "https://university.ru/sitemap-pages.xml.gz",
+        ]
+    
+    def test_gzip_detected_by_magic_bytes(self, tmp_path):
+        """.xml.gz, уже распакованный по Content-Encoding, не распаковывается второй раз"""
+        discovery = SitemapDiscovery(str(tmp_path / 'sitemaps.json'))
+        session = self.make_session()
+        plain = session.get.side_effect
+        
+        def get(url, **kwargs):
+            response = plain(url, **kwargs)
+            if url.endswith('.gz'):
+                response.raw = io.BytesIO(self.PAGES)
+                response.headers = {'content-encoding': 'gzip'}
+            return response
+        
+        session.get = Mock(side_effect=get)
+        
+        locs = list(discovery._iter_sitemap_locs(session, 'https://university.ru/sitemap-pages.xml.gz'))
+        
+        assert ('urlset', 'https://university.ru/staff') in locs
+        assert len(locs) == 5
+
+
+class TestRobotsRules:
+    """Тесты для разбора robots.txt"""
+    
+    ROBOTS = """
+    User-agent: *
+    Disallow: /admin/
+    Disallow: /*.php$
+    Allow: /admin/staff/
+    Crawl-delay: 5
+    
+    User-agent: BadBot
+    User-agent: UniParser-Old
+    Disallow: /
+    
+    Sitemap: https://university.ru/sitemap.xml
+    """
+    
+    def test_longest_match_wins(self):
+        """Самое длинное совпадение определяет результат, шаблоны с * и $"""
+        rules = RobotsRules.parse(self.ROBOTS)
+        
+        assert rules.can_fetch("https://university.ru/kafedra/staff")
+        assert not rules.can_fetch("https://university.ru/admin/settings")
+        assert rules.can_fetch("https://university.ru/admin/staff/list")
+        assert not rules.can_fetch("https://university.ru/search/index.php")
+        assert rules.can_fetch("https://university.ru/search/index.php?q=1")
+        assert rules.sitemaps == ["https://university.ru/sitemap.xml"]
+    
+    def test_user_agent_groups(self):
+        """Группа выбирается по токену агента, а не по первому "Disallow: /" в файле"""
+        rules = RobotsRules.parse(self.ROBOTS)
+        
+        assert rules.can_fetch("https://university.ru/staff", "UniParser")
+        assert not rules.can_fetch("https://university.ru/staff", "BadBot/1.0")
+        assert rules.crawl_delay("UniParser") == 5
+        assert rules.crawl_delay("BadBot") is None
+    
+    @pytest.mark.asyncio
+    async def test_crawl_delay_feeds_host_limiter(self):
+        """Crawl-delay увеличивает интервал между запросами к хосту"""
+        parser = UniversityParser(rate_limit_delay=1.0)
+        rules = RobotsRules.parse(self.ROBOTS)
+        
+        async def get_rules(url, limiter=None):
+            return rules
+        
+        parser.robots = Mock(user_agent='UniParser', get_rules=get_rules)
+        
+        assert await parser._allowed_by_robots("https://university.ru/staff")
+        assert not await parser._allowed_by_robots("https://university.ru/admin/")
+        assert parser.host_limiter._state('university.ru')['interval'] == 5
+        assert parser.crawl_stats['robots_blocked'] == 1
+    
+    @staticmethod
+    def robots_service(status, body=b''):
+        service = RobotsService()
+        
+        def get(url, **kwargs):
+            response = requests.Response()
+            response.status_code = status
+            response.raw = io.BytesIO(body)
+            response.url = url
+            return response
+        
+        service.session.get = Mock(side_effect=get)
+        return service
+    
+    @pytest.mark.asyncio
+    async def test_server_error_disallows_temporarily(self):
+        """5xx и 429 — полный запрет на короткий срок, 404 — ограничений нет"""
+        for status in (503, 429):
+            service = self.robots_service(status)
+            assert not await service.can_fetch("https://university.ru/staff")
+            expires = service._cache['https://university.ru'][1]
+            assert expires - time.time() <= service.error_ttl
+        
+        service = self.robots_service(404)
+        assert await service.can_fetch("https://university.ru/staff")
+    
+    @pytest.mark.asyncio
+    async def test_fetch_uses_host_slot_and_size_limit(self):
+        """robots.txt загружается в слоте хоста и читается не больше лимита"""
+        body = b"User-agent: *\nDisallow: /admin/\n" + b"#" * (ROBOTS_MAX_BYTES * 2) + b"\nDisallow: /\n"
+        service = self.robots_service(200, body)
+        limiter = HostLimiter(min_interval=0)
+        limiter.report = Mock()
+        
+        rules = await service.get_rules("https://university.ru/staff", limiter)
+        
+        assert rules.can_fetch("https://university.ru/staff")
+        assert not rules.can_fetch("https://university.ru/admin/")
+        assert 'university.ru' in limiter._hosts
+        assert limiter.report.call_args.kwargs['status'] == 200
+
+
+class TestHostScheduler:
+    """Тесты для общего планировщика запросов к хостам"""
+    
+    @pytest.mark.asyncio
+    async def test_jobs_served_fairly(self):
+        """Запросы разных задач к одному хосту чередуются"""
+        scheduler = HostScheduler(rate=1000, burst=1, max_connections=1)
+        order = []
+        
+        async def fetch(job_id, n):
+            async with scheduler.slot("https://university.ru/staff", job_id):
+                order.append((job_id, n))
+                await asyncio.sleep(0.001)
+        
+        tasks = [asyncio.create_task(fetch('a', n)) for n in range(3)]
+        tasks += [asyncio.create_task(fetch('b', n)) for n in range(2)]
+        await asyncio.gather(*tasks)
+        
+        assert [job for job, _ in order] == ['a', 'a', 'b', 'a', 'b']
+    
+    @pytest.mark.asyncio
+    async def test_connection_limit_and_queue_depth(self):
+        """Не больше max_connections одновременных запросов, очередь видна по хосту"""
+        scheduler = HostScheduler(rate=1000, burst=10, max_connections=2)
+        release = asyncio.Event()
+        
+        async def fetch():
+            async with scheduler.slot("https://university.ru/staff", 'job'):
+                await release.wait()
+        
+        tasks = [asyncio.create_task(fetch()) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        
+        assert scheduler.queue_depth() == {'university.ru': {'queued': 3, 'active': 2}}
+        
+        release.set()
+        await asyncio.gather(*tasks)
+        assert scheduler.queue_depth() == {}
+    
+    @pytest.mark.asyncio
+    async def test_token_bucket_rate(self):
+        """После исчерпания burst запросы идут не чаще rate в секунду"""
+        scheduler = HostScheduler(rate=20, burst=1, max_connections=4)
+        started = []
+        
+        async def fetch():
+            async with scheduler.slot("https://university.ru/staff"):
+                started.append(time.monotonic())
+        
+        await asyncio.gather(*[fetch() for _ in range(4)])
+        
+        assert started[-1] - started[0] >= 0.14
+    
+    @pytest.mark.asyncio
+    async def test_aimd_rate_control(self, tmp_path):
+        """Рост частоты раз в окно, снижение вдвое на 429 и сохранение между запусками"""
+        path = str(tmp_path / 'host_rates.json')
+        scheduler = HostScheduler(rate=1.0, rate_step=0.5, increase_window=5.0, state_path=path)
+        url = "https://university.ru/staff"
+        state = scheduler._state('university.ru')
+        
+        # Ответы внутри одного окна частоту не повышают
+        for _ in range(8):
+            scheduler.report(url, status=200, latency=0.2)
+        assert state['rate'] == 1.0
+        
+        for _ in range(4):
+            state['increased_at'] -= 5.0
+            scheduler.report(url, status=200, latency=0.2)
+        assert state['rate'] == 3.0
+        
+        scheduler.report(url, status=429, latency=0.2, retry_after='2')
+        assert state['rate'] == 1.5
+        assert state['connections'] == 1
+        assert state['blocked_until'] > time.monotonic() + 1
+        
+        # Скачок задержки — тоже признак перегрузки
+        scheduler.report(url, status=200, latency=5.0)
+        assert state['rate'] == 0.75
+        
+        scheduler.save()
+        restored = HostScheduler(state_path=path)
+        assert restored._state('university.ru')['rate'] == 0.75
+    
+    @pytest.mark.asyncio
+    async def test_user_delay_seeds_adaptive_rate(self):
+        """rate_limit_delay задает начальную частоту, дальше ее меняет планировщик"""
+        scheduler = HostScheduler(rate=1.0, burst=10, rate_step=5.0)
+        limiter = HostLimiter(min_interval=0.5, scheduler=scheduler)
+        url = "https://university.ru/staff"
+        started = []
+        
+        async with limiter.slot(url):
+            started.append(time.monotonic())
+        state = scheduler._state('university.ru')
+        assert state['rate'] == 2.0
+        
+        # Здоровый хост: частота растет выше 1 / rate_limit_delay
+        state['increased_at'] -= scheduler.increase_window
+        scheduler.report(url, status=200, latency=0.1)
+        assert state['rate'] == 7.0
+        
+        for _ in range(3):
+            async with limiter.slot(url):
+                started.append(time.monotonic())
+        assert started[-1] - started[0] < 0.5
+        
+        # Crawl-delay остается жестким интервалом задачи
+        limiter.set_min_interval(url, 0.05)
+        for _ in range(2):
+            async with limiter.slot(url):
+                started.append(time.monotonic())
+        assert started[-1] - started[-2] >= 0.045
+    
+    @pytest.mark.asyncio
+    async def test_crawl_delay_caps_adaptive_rate(self):
+        """Crawl-delay ограничивает рост частоты сверху"""
+        scheduler = HostScheduler(rate=0.1, rate_step=1.0)
+        url = "https://university.ru/staff"
+        scheduler.set_min_interval(url, 5)
+        state = scheduler._state('university.ru')
+        
+        for _ in range(3):
+            state['increased_at'] -= scheduler.increase_window
+            scheduler.report(url, status=200, latency=0.2)
+        
+        assert state['rate'] == 0.2
+
+
+class TestResilience:
+    """Тесты для повторов запросов и выключателя недоступных хостов"""
+    
+    def make_parser(self, responses):
+        parser = UniversityParser(rate_limit_delay=0, shared_scheduler=False, respect_robots=False)
+        parser.retry_policy = RetryPolicy(max_attempts=3, base_delay=0.001)
+        parser.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+        
+        def get(url, **kwargs):
+            result = responses.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            response = requests.Response()
+            response.status_code = result
+            response.raw = io.BytesIO(b'<html></html>')
+            response.url = url
+            return response
+        
+        parser.session.get = Mock(side_effect=get)
+        return parser
+    
+    @pytest.mark.asyncio
+    async def test_transient_errors_are_retried(self):
+        """Сброс соединения и 503 повторяются, страница загружается"""
+        parser = self.make_parser([requests.ConnectionError("reset"), 503, 200])
+        
+        content = await parser._fetch_html("https://university.ru/staff")
+        
+        assert content == '<html></html>'
+        assert parser.session.get.call_count == 3
+        assert parser.crawl_stats['retries'] == 2
+    
+    @pytest.mark.asyncio
+    async def test_open_circuit_fails_fast(self):
+        """После серии неудачных запросов остальные страницы хоста не запрашиваются"""
+        parser = self.make_parser([requests.Timeout("timeout")] * 9)
+        
+        # Повторы одного запроса — один сбой, хост остается доступным
+        for page in ("staff", "kafedra", "news"):
+            with pytest.raises(requests.Timeout):
+                await parser._fetch_html(f"https://university.ru/{page}")
+        with pytest.raises(CircuitOpenError):
+            await parser._fetch_html("https://university.ru/contacts")
+        
+        assert parser.session.get.call_count == 9
+    
+    @pytest.mark.asyncio
+    async def test_failed_pages_reported(self):
+        """Страницы недоступного хоста попадают в отчет о неполном результате"""
+        parser = self.make_parser([])
+        parser.speculative_render = False
+        parser.render_decisions = None
+        parser.breaker.failure_threshold = 1
+        parser.breaker.record_failure("https://university.ru/")
+        
+        results = await parser._parse_page("https://university.ru/staff")
+        
+        assert results == []
+        assert "https://university.ru/staff" in parser.crawl_stats['failed_pages']
+        assert parser.crawl_stats['circuit_open_hosts'] == ['university.ru']
+        parser.session.get.assert_not_called()
+
+
+class TestResponseLimits:
+    """Тесты для ограничения размера и типа загружаемых ответов"""
+    
+    def make_parser(self, body, content_type='text/html', content_length=None, max_bytes=1024, raw=None):
+        parser = UniversityParser(
+            rate_limit_delay=0, shared_scheduler=False, respect_robots=False, max_response_bytes=max_bytes
+        )
+        raw = raw or io.BytesIO(body)
+        
+        def get(url, **kwargs):
+            assert kwargs['stream'] is True
+            response = requests.Response()
+            response.status_code = 200
+            response.headers['Content-Type'] = content_type
+            if content_length is not None:
+                response.headers['Content-Length'] = str(content_length)
+            response.raw = raw
+            response.url = url
+            return response
+        
+        parser.session.get = Mock(side_effect=get)
+        return parser, raw
+    
+    @pytest.mark.asyncio
+    async def test_large_page_is_truncated_and_parsed(self):
+        """Большая страница читается до лимита и все равно разбирается"""
+        card = TestDomBackends.PAGES['table']
+        body = (card + '<p>' + 'x' * 10000 + '</p>').encode('utf-8')
+        parser, _ = self.make_parser(body, content_length=len(body))
+        
+        content = await parser._fetch_html("https://university.ru/staff")
+        
+        assert len(content.encode('utf-8')) <= 1024
+        assert parser.crawl_stats['truncated_pages'] == 1
+        records = await parser._extract_staff_data(parser.dom.parse(content), "https://university.ru/staff")
+        assert [r['email'] for r in records] == ['sidorov@university.ru']
+    
+    @pytest.mark.asyncio
+    async def test_non_html_rejected_before_body(self):
+        """Медиафайл отклоняется по Content-Type без чтения тела"""
+        parser, raw = self.make_parser(b'', content_type='video/mp4', raw=Mock())
+        
+        with pytest.raises(ResponseRejected):
+            await parser._fetch_html("https://university.ru/lecture")
+        
+        raw.read.assert_not_called()
+        raw.stream.assert_not_called()
+        assert parser.crawl_stats['rejected_responses'] == 1
+        assert parser.session.get.call_count == 1
+    
+    @pytest.mark.asyncio
+    async def test_oversized_json_rejected(self):
+        """Обрезанный JSON бесполезен: ответ API больше лимита отклоняется"""
+        parser, raw = self.make_parser(b'[' + b'1,' * 1000 + b'1]', content_type='application/json')
+        
+        with pytest.raises(ResponseRejected):
+            await parser._http_get(
+                "https://university.ru/api/staff", content_types=('application/json',), allow_truncated=False
+            )
+    
+    def test_binary_links_skipped(self):
+        """Ссылки на файлы не считаются страницами"""
+        parser = UniversityParser()
+        base = "https://university.ru/"
+        
+        assert parser._is_valid_internal_url("https://university.ru/documents/staff", base)
+        assert not parser._is_valid_internal_url("https://university.ru/media/lecture.MP4", base)
+        assert not parser._is_valid_internal_url("https://university.ru/files/report.pdf?download=1", base)
+
+
+class TestBoilerplate:
+    """Тесты для удаления шаблона сайта"""
+    
+    TEMPLATE = """
+        <header><ul class="menu">
+            <li><a href="/dekanat">Деканат: декан факультета Смирнов Олег Петрович</a></li>
+            <li><a href="/director">Директор института Кузнецов Игорь Ильич</a></li>
+        </ul></header>
+        <nav><a href="/">Главная</a> <a href="/staff">Сотрудники</a></nav>
+        <footer><p>Ректор университета Орлов Андрей Викторович, rector@university.ru</p></footer>
+    """
+    
+    def page(self, content):
+        return f"<html><body>{self.TEMPLATE}<main>{content}</main><script>var a = 1;</script></body></html>"
+    
+    def test_repeated_blocks_removed_after_first_page(self):
+        """Общие для страниц блоки удаляются на всех страницах, кроме первой"""
+        parser = UniversityParser()
+        first = parser.dom.parse(self.page("<table><tr><td>Иванов Иван Иванович, профессор</td></tr></table>"))
+        second_html = self.page("<table><tr><td>Петров Петр Петрович, доцент</td></tr></table>")
+        
+        assert parser.templates.strip(first, "https://university.ru/kafedra1") == 0
+        
+        before = len(parser._find_staff_containers(parser.dom.parse(second_html)))
+        second = parser.dom.parse(second_html)
+        assert parser.templates.strip(second, "https://university.ru/kafedra2") > 0
+        after = parser._find_staff_containers(second)
+        
+        assert 0 < len(after) < before
+        text = second.text(separator=' ')
+        assert 'Петров' in text
+        assert 'Смирнов' not in text and 'Орлов' not in text
+    
+    def test_same_page_counted_once(self):
+        """Повторный разбор той же страницы (HTML и рендер) не делает ее блоки шаблоном"""
+        detector = TemplateDetector()
+        for _ in range(2):
+            doc = get_dom_backend('lxml').parse(self.page("<p>Иванов Иван Иванович, профессор кафедры</p>"))
+            assert detector.strip(doc, "https://university.ru/staff") == 0
+    
+    @pytest.mark.parametrize('backend', ['soup', 'lxml'])
+    def test_strip_non_content(self, backend):
+        """script, style и nav удаляются вместе с содержимым"""
+        doc = get_dom_backend(backend).parse(self.page("<p>Иванов Иван Иванович</p>"))
+        
+        assert strip_non_content(doc) == 2
+        text = doc.text(separator=' ')
+        assert 'Главная' not in text and 'var a' not in text
+        assert 'Иванов' in text
+    
+    @pytest.mark.asyncio
+    async def test_extraction_skips_template(self):
+        """Записи из меню и подвала извлекаются только на первой странице"""
+        parser = UniversityParser()
+        await parser._extract_staff_data(
+            parser.dom.parse(self.page("<p>Сайт кафедры</p>")), "https://university.ru/"
+        )
+        
+        records = await parser._extract_staff_data(
+            parser.dom.parse(self.page(TestDomBackends.PAGES['table'])), "https://university.ru/staff"
+        )
+        
+        assert [r['email'] for r in records] == ['sidorov@university.ru']
+        assert parser.crawl_stats['template_blocks_removed'] > 0
+
+    @pytest.mark.parametrize('backend', ['soup', 'lxml'])
+    def test_table_header_row_kept(self, backend):
+        """Строка заголовка таблицы повторяется на страницах, но не удаляется как шаблон"""
+        def table(rows):
+            body = ''.join(f"<tr><td>{fio}</td><td>{position}</td><td>{phone}</td></tr>" for fio, position, phone in rows)
+            return f"<table><tr><th>ФИО сотрудника</th><th>Должность</th><th>Телефон</th></tr>{body}</table>"
+        
+        detector = TemplateDetector()
+        dom = get_dom_backend(backend)
+        first = dom.parse(self.page(table([
+            ("Иванов Иван Иванович", "методист", "+7 (495) 111-11-11"),
+            ("Петров Петр Петрович", "инженер", "+7 (495) 222-22-22"),
+        ])))
+        detector.strip(first, "https://university.ru/kafedra1")
+        
+        second = dom.parse(self.page(table([
+            ("Сидоров Сидор Сидорович", "методист", "+7 (495) 333-33-33"),
+            ("Козлов Олег Павлович", "инженер", "+7 (495) 444-44-44"),
+        ])))
+        assert detector.strip(second, "https://university.ru/kafedra2") > 0
+        
+        # Без заголовка столбец должностей не распознать: ключевых слов и адресов в строках нет
+        rows = extract_table(second, second.select('table')[0])
+        assert [(row['fio'], row['position']) for row in rows] == [
+            ("Сидоров Сидор Сидорович", "методист"), ("Козлов Олег Павлович", "инженер")
+        ]
+    
+    def test_fingerprints_same_for_both_backends(self):
+        """Отпечатки блоков не зависят от DOM бэкенда и учитывают текст и вложенность"""
+        html = self.page("<div><p>Иванов Иван Иванович, профессор</p></div><div><p><b>Иванов Иван Иванович, профессор</b></p></div>")
+        detector = TemplateDetector()
+        
+        digests = {
+            backend: [digest for _, digest in detector._fingerprints(get_dom_backend(backend).parse(html))]
+            for backend in ('soup', 'lxml')
+        }
+        
+        assert digests['soup'] == digests['lxml']
+        assert len(set(digests['soup'])) == len(digests['soup'])
+
+
+class TestContainerClassifier:
+    """Тесты для классификатора контейнеров"""
+    
+    PAGE = """
+    <html><body>
+        <ul class="menu">
+            <li><a href="/library">Научная Библиотека Университета</a></li>
+            <li><a href="/science">Научная Деятельность Института</a></li>
+            <li><a href="/museum">Музей Истории Университета</a></li>
+        </ul>
+        <ul class="staff">
+            <li>Петрова Анна Сергеевна, petrova@university.ru</li>
+            <li>Сидоров Петр Николаевич, sidorov@university.ru</li>
+            <li><a href="/staff/orlov">Орлов А. В.</a>, доцент кафедры</li>
+        </ul>
+        <p>Новости: открыт набор на подготовительные курсы</p>
+    </body></html>
+    """
+    
+    # Размеченные блоки: data-label="staff" — запись о сотруднике, "other" — прочее;
+    # списки записей целиком не размечены
+    LABELLED_PAGES = [
+        """
+        <html><body>
+            <ul class="menu">
+                <li data-label="other"><a href="/library">Научная Библиотека Университета</a></li>
+                <li data-label="other"><a href="/science">Научная Деятельность Института</a></li>
+                <li data-label="other"><a href="/museum">Музей Истории Университета</a></li>
+                <li data-label="other"><a href="/about">О Университете</a></li>
+            </ul>
+            <ul class="staff">
+                <li data-label="staff">Петрова Анна Сергеевна, petrova@university.ru</li>
+                <li data-label="staff">Сидоров Петр Николаевич, sidorov@university.ru</li>
+                <li data-label="staff"><a href="/staff/orlov">Орлов А. В.</a>, доцент кафедры</li>
+            </ul>
+        </body></html>
+        """,
+        """
+        <html><body>
+            <div class="staff-item" data-label="staff">
+                <h3>Иванов Иван Иванович</h3><p>профессор кафедры истории</p>
+                <a href="mailto:ivanov@university.ru">ivanov@university.ru</a>
+                <a href="/staff/ivanov">Профиль</a>
+            </div>
+            <div class="staff-item" data-label="staff">
+                <h3>Кузнецова Мария Олеговна</h3><p>старший преподаватель</p>
+            </div>
+            <div data-label="other" class="card">
+                <h3>День открытых дверей</h3>
+                <p>Приглашаем абитуриентов и родителей познакомиться с Университетом и Факультетами</p>
+            </div>
+            <div data-label="other" class="card">
+                <a href="/news/1">Студенты Института Победили В Олимпиаде По Программированию</a>
+            </div>
+        </body></html>
+        """,
+        """
+        <html><body>
+            <table>
+                <tr data-label="other"><td>Приемная комиссия</td><td>priem@university.ru</td></tr>
+                <tr data-label="other"><td>Общежитие</td><td>Улица Ленина, дом 5</td></tr>
+                <tr data-label="staff"><td>Смирнов Олег Петрович</td><td>заведующий кафедрой</td><td>smirnov@university.ru</td></tr>
+                <tr data-label="staff"><td>Белова Е. А.</td><td>доцент</td><td>belova@university.ru</td></tr>
+            </table>
+            <ol class="docs">
+                <li data-label="other"><a href="/docs/ustav.pdf">Устав Университета</a></li>
+                <li data-label="other"><a href="/docs/license.pdf">Лицензия На Образовательную Деятельность</a></li>
+            </ol>
+        </body></html>
+        """,
+        """
+        <html><body>
+            <div data-label="other" class="kafedra">
+                <p>Кафедра основана в 1965 году. За это время на кафедре работали известные ученые,
+                профессора и доценты, подготовлены сотни специалистов для предприятий региона.
+                Кафедра ведет подготовку бакалавров и магистров по направлениям Информатика и
+                Прикладная Математика, сотрудничает с Институтами Российской Академии Наук и
+                зарубежными университетами. Студенты проходят практику на ведущих предприятиях
+                Города, а выпускники работают в Крупнейших Компаниях Страны и продолжают обучение
+                в аспирантуре. Заведующий кафедрой — профессор, доктор технических наук.</p>
+            </div>
+            <div class="person" data-label="staff">
+                <p>John Smith</p><p>Associate Professor</p><p>jsmith@university.edu</p>
+            </div>
+            <div class="person" data-label="staff">
+                <a href="/people/volkov">Волков Дмитрий Андреевич</a><span>ведущий научный сотрудник</span>
+            </div>
+            <ul class="footer">
+                <li data-label="other">Телефон: +7 (495) 123-45-67</li>
+                <li data-label="other">Адрес: Москва, Университетская Площадь, 1</li>
+                <li data-label="other"><a href="mailto:info@university.ru">info@university.ru</a></li>
+            </ul>
+        </body></html>
+        """,
+    ]
+    
+    def labelled_features(self, backend):
+        classifier = ContainerClassifier()
+        features, labels = [], []
+        for page in self.LABELLED_PAGES:
+            doc = get_dom_backend(backend).parse(page)
+            nodes = [
+                node for node in UniversityParser()._collect_candidates(doc)
+                if doc.attr(node, 'data-label')
+            ]
+            features.append(classifier.features(doc, nodes))
+            labels += [doc.attr(node, 'data-label') == 'staff' for node in nodes]
+        return np.vstack(features), labels
+    
+    def test_capitalized_names_detected(self):
+        """Имя с заглавной буквы учитывается (раньше текст приводился к нижнему регистру)"""
+        classifier = ContainerClassifier()
+        
+        assert classifier.is_staff_text("Петрова Анна Сергеевна petrova@university.ru")
+        assert not classifier.is_staff_text("петрова анна сергеевна")
+        assert not classifier.is_staff_text("Random text without staff info")
+    
+    @pytest.mark.parametrize('backend', ['soup', 'lxml'])
+    def test_page_candidates_scored_together(self, backend):
+        """Пункты меню отсеиваются, строки со списком сотрудников остаются"""
+        parser = UniversityParser()
+        doc = get_dom_backend(backend).parse(self.PAGE)
+        
+        containers = parser._find_staff_containers(doc)
+        texts = [doc.text(node, strip=True) for node in containers]
+        
+        assert 'Петрова Анна Сергеевна, petrova@university.ru' in texts
+        assert 'Орлов А. В., доцент кафедры' in texts
+        assert all('Научная' not in text and 'Музей' not in text for text in texts)
+    
+    def test_candidates_not_duplicated(self):
+        """Элемент, найденный несколькими селекторами, оценивается один раз"""
+        parser = UniversityParser()
+        doc = get_dom_backend('lxml').parse(TestDomBackends.PAGES['cards'])
+        
+        containers = parser._find_staff_containers(doc)
+        
+        assert len(containers) == len({id(node) for node in containers}) == 2
+    
+    def test_fit_on_labelled_blocks(self):
+        """Веса подбираются по размеченным блокам"""
+        doc = get_dom_backend('lxml').parse(self.PAGE)
+        nodes = doc.select('li, p')
+        labels = ['@' in doc.text(node) or 'доцент' in doc.text(node) for node in nodes]
+        
+        classifier = ContainerClassifier()
+        features = classifier.features(doc, nodes)
+        classifier.fit(features, labels)
+        
+        assert features.shape == (len(nodes), len(classifier.weights))
+        assert classifier.predict(features).tolist() == labels
+        assert set(classifier.to_dict()['weights']) == set(DEFAULT_WEIGHTS)
+    
+    def test_default_weights_fitted_on_labelled_pages(self):
+        """Веса по умолчанию — результат fit на размеченных страницах и верно их классифицируют"""
+        soup_features, labels = self.labelled_features('soup')
+        lxml_features, _ = self.labelled_features('lxml')
+        features = np.vstack([soup_features, lxml_features])
+        
+        assert ContainerClassifier().predict(features).tolist() == labels * 2
+        
+        fitted = ContainerClassifier().fit(features, labels * 2, columns=TUNED_FEATURES).to_dict()
+        for name, weight in DEFAULT_WEIGHTS.items():
+            assert fitted['weights'][name] == pytest.approx(weight, abs=0.01)
+        assert fitted['bias'] == pytest.approx(DEFAULT_BIAS, abs=0.01)
+    
+    @pytest.mark.parametrize('backend', ['soup', 'lxml'])
+    def test_features_match_per_node_text(self, backend):
+        """Признаки из одного обхода страницы совпадают с подсчетом по тексту каждого узла"""
+        for page in self.LABELLED_PAGES + [TestDomBackends.PAGES['noise']]:
+            doc = get_dom_backend(backend).parse(page)
+            nodes = doc.select('body, div, ul, li, tr, a, p')
+            
+            expected = [
+                text_features(doc.text(node, separator=' ')) + [doc.link_text_length(node), *doc.position(node)]
+                for node in nodes
+            ]
+            
+            assert ContainerClassifier.raw_features(doc, nodes).tolist() == expected
+
+
+class TestEmailAnchoredExtraction:
+    """Тесты для поиска записей от адресов email"""
+    
+    PAGE = """
+    <html><body><div class="content"><div class="list">
+        <div class="card"><div class="info">
+            <h3>Иванов Иван Иванович</h3><p>профессор</p>
+            <p><a href="mailto:ivanov@university.ru">написать</a></p>
+        </div></div>
+        <div class="card"><div class="info">
+            <h3>Петрова Анна Сергеевна</h3><p>доцент</p>
+            <p>petrova@university.ru</p>
+        </div></div>
+        <div class="card"><div class="info">
+            <h3>Сидоров Петр Николаевич</h3><p>старший преподаватель</p>
+        </div></div>
+        <div class="banner">Приемная комиссия: Орлов А. В.</div>
+    </div></div></body></html>
+    """
+    
+    @pytest.mark.parametrize('backend', ['soup', 'lxml'])
+    def test_blocks_from_emails_and_siblings(self, backend):
+        """Блок записи — наименьший предок с одним ФИО, однотипные соседи без адреса добавляются"""
+        doc = get_dom_backend(backend).parse(self.PAGE)
+        
+        blocks = find_record_blocks(doc)
+        
+        assert [doc.attr(block, 'class') for block in blocks] == ['card', 'card', 'card']
+        assert 'Сидоров' in doc.text(blocks[2])
+    
+    @pytest.mark.parametrize('backend', ['soup', 'lxml'])
+    def test_personal_and_shared_addresses(self, backend):
+        """Карточка с личным адресом и адресом кафедры — одна запись, общий адрес не теряет людей"""
+        page = """
+        <html><body><div class="list">
+            <div class="card"><h3>Иванов Иван Иванович</h3>
+                <a href="mailto:ivanov@university.ru">ivanov@university.ru</a>
+                <p>Кафедра: <a href="mailto:math@university.ru">math@university.ru</a></p></div>
+            <div class="card"><h3>Петрова Анна Сергеевна</h3>
+                <p>Кафедра: <a href="mailto:math@university.ru">math@university.ru</a></p></div>
+            <div class="card"><h3>Сидоров Петр Николаевич</h3>
+                <p>Кафедра: <a href="mailto:math@university.ru">math@university.ru</a></p></div>
+        </div></body></html>
+        """
+        doc = get_dom_backend(backend).parse(page)
+        
+        blocks = find_record_blocks(doc)
+        
+        assert [doc.attr(block, 'class') for block in blocks] == ['card', 'card', 'card']
+        assert ['Иванов' in doc.text(blocks[0]), 'Петрова' in doc.text(blocks[1])] == [True, True]
+    
+    def test_table_rows(self):
+        """ФИО и адрес в разных ячейках: записью становится строка"""
+        doc = get_dom_backend('lxml').parse(TestDomBackends.PAGES['table'].replace(
+            '</table>',
+            '<tr><td>Кузнецов Олег Игоревич</td><td>доцент</td><td>kuznetsov@university.ru</td></tr></table>'
+        ))
+        
+        blocks = find_record_blocks(doc)
+        
+        assert [doc.tag(block) for block in blocks] == ['tr', 'tr']
+    
+    def test_single_email_falls_back(self):
+        """Страница с одним адресом разбирается обычным поиском контейнеров"""
+        doc = get_dom_backend('lxml').parse(TestDomBackends.PAGES['table'])
+        assert find_record_blocks(doc) == []
+    
+    @pytest.mark.asyncio
+    async def test_one_record_per_person(self):
+        """Вложенные контейнеры не дают повторных записей"""
+        parser = UniversityParser()
+        
+        records = await parser._extract_staff_data(parser.dom.parse(self.PAGE), "https://university.ru/staff")
+        
+        assert len(records) == 3
+        assert {r['email'] for r in records} == {'ivanov@university.ru', 'petrova@university.ru', None}
+        assert parser.crawl_stats['email_anchored_pages'] == 1
+
+
+class TestNameService:
+    """Тесты для общего сервиса обработки ФИО"""
+    
+    def test_cache_hit_rates(self):
+        """Повторяющиеся фрагменты берутся из кэша, доля попаданий доступна"""
+        names = NameService(cache_size=2)
+        
+        for _ in range(3):
+            assert names.extract("Заведующий кафедрой Иванов Иван Иванович") == "Иванов Иван Иванович"
+        
+        stats = names.cache_stats()['extract']
+        assert (stats['hits'], stats['misses'], stats['size']) == (2, 1, 1)
+        assert stats['hit_rate'] == 0.667
+    
+    def test_shared_normalization(self):
+        """Извлекатель и валидатор нормализуют ФИО одинаково"""
+        extractor, validator = StaffDataExtractor(), DataValidator()
+        
+        for fio in ["сидоров а.в.", "  КОЗЛОВ   алексей,", "римский-корсаков николай"]:
+            assert extractor.normalize_fio(fio) == validator.normalize_fio(fio)
+        assert validator.normalize_fio("римский-корсаков николай") == "Римский-Корсаков Николай"
+    
+    def test_nominative(self):
+        """Косвенный падеж приводится к именительному с общим родом"""
+        def parse(case, gender, grammeme, nominative):
+            tag = Mock(case=case, gender=gender, grammemes={grammeme, case, gender})
+            return Mock(tag=tag, inflect=Mock(return_value=Mock(word=nominative)))
+        
+        forms = {
+            'Иванову': [parse('datv', 'masc', 'Surn', 'иванов')],
+            'Ивану': [parse('datv', 'masc', 'Name', 'иван')],
+            'Петрова': [parse('nomn', 'femn', 'Surn', 'петрова')],
+            'Анна': [parse('nomn', 'femn', 'Name', 'анна')],
+        }
+        names = NameService(use_morphology=False)
+        names.morph = Mock(parse=lambda word: forms.get(word, []))
+        
+        assert names.normalize("Иванову Ивану") == "Иванов Иван"
+        assert names.normalize("Петрова Анна") == "Петрова Анна"
+
+
+class TestTableExtraction:
+    """Тесты для извлечения сотрудников из таблиц по столбцам"""
+    
+    PAGE = """
+    <html><body><table class="staff">
+        <thead><tr><th>ФИО</th><th>Должность</th><th>E-mail</th></tr></thead>
+        <tbody>
+            <tr><td colspan="3">Кафедра физики</td></tr>
+            <tr><td><a href="/staff/ivanov">Иванов Иван Иванович</a></td><td>доцент кафедры физики</td>
+                <td><a href="mailto:ivanov@university.ru">написать</a></td></tr>
+            <tr><td>Петрова Анна Сергеевна</td><td>профессор</td><td>petrova@university.ru</td></tr>
+            <tr><td>Сидоров Петр Николаевич</td><td>ассистент</td><td></td></tr>
+        </tbody>
+    </table></body></html>
+    """
+    
+    @staticmethod
+    def _rows(html, backend='lxml'):
+        doc = get_dom_backend(backend).parse(html)
+        return [
+            {key: row[key] for key in ('fio', 'position', 'email')}
+            for row in extract_table(doc, doc.select('table')[0])
+        ]
+    
+    @pytest.mark.parametrize('backend', ['soup', 'lxml'])
+    def test_header_columns(self, backend):
+        """Роли столбцов по заголовку, строка раздела с colspan пропускается"""
+        assert self._rows(self.PAGE, backend) == [
+            {'fio': 'Иванов Иван Иванович', 'position': 'доцент кафедры физики', 'email': 'ivanov@university.ru'},
+            {'fio': 'Петрова Анна Сергеевна', 'position': 'профессор', 'email': 'petrova@university.ru'},
+            {'fio': 'Сидоров Петр Николаевич', 'position': 'ассистент', 'email': None},
+        ]
+    
+    def test_roles_without_header(self):
+        """Без заголовка роли определяются по содержимому столбцов"""
+        html = """
+        <table>
+            <tr><td>ivanov@university.ru</td><td>Иванов Иван Иванович</td><td>доцент</td></tr>
+            <tr><td>petrova@university.ru</td><td>Петрова Анна Сергеевна</td><td>профессор</td></tr>
+        </table>
+        """
+        
+        rows = self._rows(html)
+        
+        assert [row['fio'] for row in rows] == ['Иванов Иван Иванович', 'Петрова Анна Сергеевна']
+        assert [row['email'] for row in rows] == ['ivanov@university.ru', 'petrova@university.ru']
+        assert rows[1]['position'] == 'профессор'
+    
+    def test_non_staff_table(self):
+        """Таблица без столбца ФИО не считается таблицей сотрудников"""
+        html = """
+        <table>
+            <tr><th>Дата</th><th>Событие</th></tr>
+            <tr><td>01.09.2024</td><td>Начало учебного года</td></tr>
+            <tr><td>25.01.2025</td><td>День студента</td></tr>
+        </table>
+        """
+        assert self._rows(html) == []
+    
+    @pytest.mark.asyncio
+    async def test_table_records(self):
+        """Записи таблицы с профилем и раздельными полями, строки не разбираются повторно"""
+        parser = UniversityParser()
+        
+        records = await parser._extract_staff_data(parser.dom.parse(self.PAGE), "https://university.ru/staff")
+        
+        assert [r['fio'] for r in records] == ['Иванов Иван Иванович', 'Петрова Анна Сергеевна', 'Сидоров Петр Николаевич']
+        assert records[0]['position'] == 'доцент кафедры физики'
+        assert records[0]['profile_url'] == 'https://university.ru/staff/ivanov'
+        assert parser.crawl_stats['staff_tables'] == 1
+
+
+class TestCharsetDetection:
+    """Тесты для определения кодировки страниц"""
+    
+    TEXT = "<html><body><p>Иванов Иван Иванович, заведующий кафедрой высшей математики</p></body></html>"
+    
+    def test_statistical_detection(self):
+        """windows-1251 и KOI8-R без заголовков различаются статистически"""
+        assert detect_charset(self.TEXT.encode('cp1251')) == 'cp1251'
+        assert detect_charset(self.TEXT.encode('koi8-r')) == 'koi8-r'
+        assert detect_charset(self.TEXT.encode('utf-8')) == 'utf-8'
+    
+    def test_meta_sniff(self):
+        """Кодировка берется из <meta> в начале документа"""
+        html = b'<html><head><meta http-equiv="Content-Type" content="text/html; charset=windows-1251">'
+        assert sniff_meta_charset(html) == 'cp1251'
+        assert sniff_meta_charset(b'<meta charset="utf-8">') == 'utf-8'
+    
+    def test_decode_order_and_host_cache(self):
+        """Неверный заголовок пропускается, найденная кодировка кэшируется для хоста"""
+        detector = CharsetDetector()
+        data = self.TEXT.encode('cp1251')
+        
+        text, encoding = detector.decode("https://old.university.ru/staff", data, 'text/html; charset=utf-8')
+        assert encoding == 'cp1251'
+        assert 'Иванов' in text
+        
+        text, encoding = detector.decode("https://old.university.ru/kafedra", data, 'text/html')
+        assert 'Иванов' in text
+        assert detector.stats['detected'] == 1
+        assert detector.stats['host_cache'] == 1
+
+    def test_mixed_encoding_host(self):
+        """Кэш хоста с cp1251 не портит страницы того же хоста в UTF-8"""
+        detector = CharsetDetector()
+        detector.decode("https://university.ru/old", self.TEXT.encode('cp1251'))
+        
+        text, encoding = detector.decode("https://university.ru/new", "петров петр".encode('utf-8'))
+        assert (text, encoding) == ("петров петр", 'utf-8')
+        
+        text, encoding = detector.decode("https://university.ru/old2", self.TEXT.encode('cp1251'))
+        assert encoding == 'cp1251'
+        assert 'Иванов' in text
+        assert (detector.stats['utf8'], detector.stats['host_cache'], detector.stats['detected']) == (1, 1, 1)
+
+
+class TestDomBackends:
+    """Тесты одинакового результата BeautifulSoup и lxml бэкендов"""
+    
+    PAGES = {
+        'cards': """
+        <html><body>
+            <div class="staff-item">
+                <h3>Иванов Иван Иванович</h3><p>профессор кафедры</p>
+                <a href="mailto:ivanov@university.ru">ivanov@university.ru</a>
+                <a href="/staff/ivanov">Профиль</a>
+            </div>
+            <div class="staff-item">
+                <h3>Петрова Анна Сергеевна</h3><p>доцент</p>
+                <span>petrova@university.ru</span>
+            </div>
+        </body></html>
+        """,
+        'table': """
+        <html><body><table class="staff-table">
+            <tr><td>Сидоров Петр Николаевич</td><td>заведующий кафедрой</td>
+                <td><a href="mailto:sidorov@university.ru">почта</a></td></tr>
+        </table></body></html>
+        """,
+        'noise': """
+        <html><body>
+            <script>var email = "fake@university.ru";</script>
+            <style>.staff-item { color: red }</style>
+            <!-- Кузнецов Олег Игоревич kuznetsov@university.ru -->
+            <div class="staff-item"><p>Смирнова Елена Викторовна, старший преподаватель</p>
+            <p>smirnova@university.ru</p></div>
+        </body></html>
+        """,
+    }
+    
+    @staticmethod
+    async def _records(parser, backend, html, url="https://university.ru/staff"):
+        records = await parser._extract_staff_data(get_dom_backend(backend).parse(html), url)
+        return sorted(
+            (r.get('fio'), r.get('email'), r.get('position'), r.get('profile_url'))
+            for r in records
+        )
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('page', ['cards', 'table', 'noise'])
+    async def test_extraction_parity(self, page):
+        """Оба бэкенда извлекают одинаковые записи"""
+        parser = UniversityParser()
+        soup_records = await self._records(parser, 'soup', self.PAGES[page])
+        assert soup_records
+        assert await self._records(parser, 'lxml', self.PAGES[page]) == soup_records
+    
+    def test_text_skips_script_and_comments(self):
+        """Текст без script, style и комментариев"""
+        for backend in ('soup', 'lxml'):
+            text = get_dom_backend(backend).parse(self.PAGES['noise']).text(separator=' ')
+            assert 'Смирнова' in text
+            assert 'fake@' not in text
+            assert 'kuznetsov' not in text
+    
+    def test_anchors_and_links_parity(self):
+        """Ссылки пагинации и ссылки контейнеров совпадают"""
+        html = """
+        <html><head><link rel="next" href="?page=2"></head><body>
+            <a href="?page=2" rel="next">2</a>
+            <a href="/staff/ivanov">Иванов Иван Иванович — профессор кафедры</a>
+        </body></html>
+        """
+        soup_doc = get_dom_backend('soup').parse(html)
+        lxml_doc = get_dom_backend('lxml').parse(html)
+        
+        assert lxml_doc.page_anchors() == soup_doc.page_anchors()
+        assert lxml_doc.links() == soup_doc.links()
+    
+    def test_css_to_xpath(self):
+        """Селекторы переводятся в XPath и находят те же элементы"""
+        assert css_to_xpath('div.staff > a[href^="mailto:"]') == (
+            "//div[contains(concat(' ', normalize-space(@class), ' '), ' staff ')]"
+            "/a[starts-with(@href, 'mailto:')]"
+        )
+        
+        html = '<div class="a b" id="x"><a href="mailto:q@u.ru">q</a><span><a href="/p">p</a></span></div>'
+        for selector in ['.b a', '#x > a', 'a[href$=".ru"]', 'div span a, [href*="/p"]']:
+            soup_found = [str(a.get('href')) for a in get_dom_backend('soup').parse(html).select(selector)]
+            lxml_found = [a.get('href') for a in get_dom_backend('lxml').parse(html).select(selector)]
+            assert lxml_found == soup_found, selector
+    
+    def test_unknown_backend(self):
+        """Неизвестное имя бэкенда — ошибка"""
+        with pytest.raises(ValueError):
+            get_dom_backend('html5')
+
+
+class TestCandidates:
+    """Тесты для кандидатов обхода до фильтрации по порогу"""
+    
+    RECORDS = [
+        {
+            'fio': 'Иванов Иван Иванович', 'position': 'профессор', 'email': 'ivanov@university.ru',
+            'source': 'https://university.ru/staff', 'confidence': 0.9, 'raw_html_snippet': '<div>' * 100
+        },
+        {
+            'fio': None, 'position': 'доцент', 'email': None,
+            'source': 'https://university.ru/staff', 'confidence': 0.2, 'raw_html_snippet': '<li>доцент</li>'
+        },
+    ]
+    
+    def test_pack_roundtrip(self):
+        """Компактная форма хранит поля записи без HTML фрагментов"""
+        data = pack_candidates(self.RECORDS * 50)
+        candidates = unpack_candidates(data)
+        
+        assert len(candidates) == 100
+        assert 'raw_html_snippet' not in candidates[0]
+        assert candidates[1]['position'] == 'доцент'
+        assert len(data) < len(json.dumps(self.RECORDS * 50))
+    
+    def test_filter_matches_parser(self):
+        """Фильтр кандидатов совпадает с фильтром в конце обхода"""
+        for threshold in (0.1, 0.5, 0.95):
+            parser = UniversityParser(confidence_threshold=threshold)
+            assert filter_candidates(self.RECORDS, threshold) == parser._filter_by_confidence(self.RECORDS)
+    
+    def test_rescore_offline(self):
+        """Пересчет оценок не проверяет домены через DNS"""
+        with patch('parser.validators._is_deliverable', side_effect=AssertionError("DNS")):
+            candidates = rescore_candidates([dict(record, email='petrov@institute.ru') for record in self.RECORDS])
+        
+        assert candidates[0]['confidence'] == DataValidator(check_deliverability=False).calculate_confidence(
+            'Иванов Иван Иванович', 'petrov@institute.ru', 'профессор', 'https://university.ru/staff'
+        )
+        assert candidates[0]['confidence'] >= 0.9
@@ -3,6 +3,10 @@
 """
 
 import pytest
+from unittest.mock import patch
+from email_validator import EmailNotValidError
+
+from parser.deliverability import DeliverabilityCache
 from parser.validators import DataValidator
 
 
@@ -273,3 +277,52 @@ class TestDataValidator:
             )
             # Общие домены должны снижать confidence
             assert confidence < 0.8, f"Common email {email} should have lower confidence"
+
+
+    def test_column_confidences(self):
+        """Оценки по столбцам совпадают с построчными, повторяющиеся значения проверяются один раз"""
+        validator = DataValidator(check_deliverability=False)
+        rows = [
+            ("Иванов Иван Иванович", "ivanov@university.ru", "доцент"),
+            ("Петрова Анна Сергеевна", None, "доцент"),
+            ("Сидоров Петр Николаевич", "sidorov@gmail.com", "доцент"),
+            (None, "info@university.ru", None),
+        ]
+        url = "https://university.ru/staff"
+        expected = [validator.calculate_confidence(*row, url) for row in rows]
+        
+        with patch.object(validator, 'validate_position', wraps=validator.validate_position) as position, \
+                patch.object(validator, 'validate_source', wraps=validator.validate_source) as source:
+            assert validator.calculate_confidences(rows, url) == expected
+        
+        assert position.call_count == 2
+        assert source.call_count == 1
+
+
+class TestDeliverabilityCache:
+    """Тесты для кэша DNS проверки доменов"""
+    
+    def test_one_lookup_per_domain_and_bounded(self):
+        """DNS запрашивается один раз на домен, старые домены вытесняются"""
+        cache = DeliverabilityCache(max_domains=2)
+        
+        with patch('parser.deliverability.validate_email') as lookup:
+            assert cache.is_deliverable("ivanov@university.ru")
+            assert cache.is_deliverable("petrov@University.ru")
+            assert lookup.call_count == 1
+            
+            cache.is_deliverable("a@msu.ru")
+            cache.is_deliverable("b@spbu.ru")
+        
+        assert len(cache) == 2
+        assert cache.get("university.ru") is None
+        assert cache.get("spbu.ru") is True
+    
+    def test_negative_result_expires(self):
+        """Отрицательный результат живет negative_ttl, а не до конца процесса"""
+        cache = DeliverabilityCache(negative_ttl=0)
+        
+        with patch('parser.deliverability.validate_email', side_effect=EmailNotValidError("no MX")):
+            assert not cache.is_deliverable("ivanov@university.ru")
+        
+        assert cache.get("university.ru") is None
@@ -0,0 +1,175 @@
+"""
+Потоковая выгрузка записей в файл: CSV, JSONL и Parquet
+"""
+
+import csv
+import json
+import os
+import tempfile
+from typing import Any, AsyncIterable, Dict, Iterable, List, Optional, Tuple, Union
+from loguru import logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+    logger.warning("pyarrow not installed. Parquet export unavailable.")
+
+
+# Столбцы выгрузки в порядке вывода
+EXPORT_FIELDS = [
+    'fio', 'position', 'email', 'phone', 'department',
+    'source_url', 'profile_url', 'confidence', 'is_validated', 'is_correct'
+]
+
+# Записей в одной порции записи (и в одной группе строк Parquet)
+EXPORT_CHUNK_SIZE = 1000
+
+EXPORT_FORMATS = {
+    'csv': '.csv',
+    'jsonl': '.jsonl',
+    'parquet': '.parquet',
+}
+
+Records = Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]]
+
+
+class ExportError(Exception):
+    """Выгрузка в запрошенном формате невозможна"""
+
+
+def export_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Поля записи для выгрузки (запись парсера или строка хранилища)"""
+    is_correct = record.get('is_correct')
+    return {
+        'fio': record.get('fio'),
+        'position': record.get('position'),
+        'email': record.get('email'),
+        'phone': record.get('phone'),
+        'department': record.get('department'),
+        'source_url': record.get('source_url') or record.get('source'),
+        'profile_url': record.get('profile_url'),
+        'confidence': float(record.get('confidence') or 0.0),
+        'is_validated': bool(record.get('is_validated')),
+        'is_correct': None if is_correct is None else bool(is_correct),
+    }
+
+
+async def _chunks(records: Records, size: int):
+    """Порции строк выгрузки из обычного или асинхронного итератора записей"""
+    chunk = []
+    if hasattr(records, '__aiter__'):
+        async for record in records:
+            chunk.append(export_row(record))
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    else:
+        for record in records:
+            chunk.append(export_row(record))
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+class _CsvWriter:
+    """CSV в UTF-8 с BOM (Excel определяет кодировку)"""
+    
+    def __init__(self, path: str):
+        self.file = open(path, 'w', encoding='utf-8-sig', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=EXPORT_FIELDS)
+        self.writer.writeheader()
+    
+    def write(self, rows: List[Dict[str, Any]]):
+        self.writer.writerows(
+            {**row, 'is_correct': '' if row['is_correct'] is None else row['is_correct']} for row in rows
+        )
+    
+    def close(self):
+        self.file.close()
+
+
+class _JsonlWriter:
+    """Одна JSON запись на строку"""
+    
+    def __init__(self, path: str):
+        self.file = open(path, 'w', encoding='utf-8')
+    
+    def write(self, rows: List[Dict[str, Any]]):
+        self.file.writelines(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+    
+    def close(self):
+        self.file.close()
+
+
+class _ParquetWriter:
+    """Parquet: каждая порция записывается отдельной группой строк"""
+    
+    def __init__(self, path: str):
+        self.schema = pa.schema([
+            ('fio', pa.string()),
+            ('position', pa.string()),
+            ('email', pa.string()),
+            ('phone', pa.string()),
+            ('department', pa.string()),
+            ('source_url', pa.string()),
+            ('profile_url', pa.string()),
+            ('confidence', pa.float64()),
+            ('is_validated', pa.bool_()),
+            ('is_correct', pa.bool_()),
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+    
+    def write(self, rows: List[Dict[str, Any]]):
+        self.writer.write_table(pa.Table.from_pylist(rows, schema=self.schema))
+    
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {
+    'csv': _CsvWriter,
+    'jsonl': _JsonlWriter,
+    'parquet': _ParquetWriter,
+}
+
+
+async def export_records(
+    records: Records,
+    export_format: str = 'csv',
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+    directory: Optional[str] = None
+) -> Tuple[str, int]:
+    """Запись записей во временный файл порциями; возвращает путь и число записей
+    
+    В памяти одновременно находится не больше chunk_size строк, поэтому
+    выгрузка любого размера не требует копии всех данных. Файл удаляет
+    вызывающий код после отправки.
+    """
+    if export_format not in WRITERS:
+        raise ExportError(f"Неизвестный формат выгрузки: {export_format}")
+    if export_format == 'parquet' and not PYARROW_AVAILABLE:
+        raise ExportError("Выгрузка в Parquet недоступна: pyarrow не установлен")
+    
+    fd, path = tempfile.mkstemp(prefix='staff_', suffix=EXPORT_FORMATS[export_format], dir=directory)
+    os.close(fd)
+    
+    count = 0
+    try:
+        writer = WRITERS[export_format](path)
+        try:
+            async for rows in _chunks(records, chunk_size):
+                writer.write(rows)
+                count += len(rows)
+        finally:
+            writer.close()
+    except Exception:
+        os.remove(path)
+        raise
+    
+    logger.debug(f"Выгружено {count} записей в {path}")
+    return path, count
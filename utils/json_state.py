@@ -0,0 +1,41 @@
+"""
+Хранение небольших JSON-состояний между запусками
+"""
+
+import json
+import os
+import tempfile
+from typing import Any, Dict
+from loguru import logger
+
+
+class JsonStateFile:
+    """JSON-файл состояния с атомарной записью"""
+    
+    def __init__(self, path: str):
+        self.path = path
+    
+    def load(self) -> Dict[str, Any]:
+        """Загрузка состояния (пустой словарь, если файла нет или он поврежден)"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Не удалось прочитать состояние {self.path}: {e}")
+            return {}
+    
+    def save(self, data: Dict[str, Any]):
+        """Атомарная запись состояния через временный файл"""
+        try:
+            directory = os.path.dirname(self.path) or '.'
+            os.makedirs(directory, exist_ok=True)
+            
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить состояние {self.path}: {e}")